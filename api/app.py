@@ -1,13 +1,30 @@
+import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
-from .routes import reviews
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+from .routes import reviews, system
 from .core import database
+from .core.agent.utils import probe_llm
+from .core.middleware import CancelOnDisconnectMiddleware
+from .core.services import get_job_runner
+from .core.settings import settings
 from fastapi.middleware.cors import CORSMiddleware
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await database.init_db()
+
+    # Модель проверяется в фоне: дашборд не ждёт провайдера LLM
+    llm_probe = asyncio.create_task(probe_llm()) if settings.LLM_PROBE_ON_STARTUP else None
+
+    # Фоновые задачи классификации, в том числе прерванные прошлым запуском
+    job_runner = get_job_runner()
+    job_runner.start()
     yield
+    await job_runner.stop()
+    if llm_probe is not None:
+        llm_probe.cancel()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -21,5 +38,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Аналитические запросы отменяются, если клиент закрыл вкладку
+app.add_middleware(
+    CancelOnDisconnectMiddleware,
+    path_prefixes=("/api/reviews", "/api/dashboard", "/api/topics"),
+)
+
+
+@app.exception_handler(DBAPIError)
+@app.exception_handler(PoolTimeoutError)
+async def database_error_handler(request: Request, exc: Exception) -> JSONResponse:
+    if database.is_database_timeout(exc):
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "База данных не успела обработать запрос, попробуйте сузить интервал или повторить позже"},
+            headers={"Retry-After": str(settings.DB_TIMEOUT_RETRY_AFTER_SECONDS)},
+        )
+    return JSONResponse(status_code=500, content={"detail": "Internal server error"})
+
 # app.include_router(shop.router, tags=['shop'])
-app.include_router(reviews.router, tags=['reviews'])
\ No newline at end of file
+app.include_router(reviews.router, tags=['reviews'])
+app.include_router(system.router, tags=['system'])
\ No newline at end of file
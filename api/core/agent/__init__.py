@@ -1,3 +1,13 @@
-from .graph import classification_agent
+from .graph import (
+    classification_agent,
+    combined_classification_agent,
+    get_classification_agent,
+    pipelined_classification_agent,
+)
 
-__all__ = ["classification_agent"]
+__all__ = [
+    "classification_agent",
+    "combined_classification_agent",
+    "get_classification_agent",
+    "pipelined_classification_agent",
+]
@@ -1,19 +1,180 @@
 """Граф агента для классификации отзывов."""
 
+import asyncio
+from functools import partial
+from typing import Callable, TypeVar
+
+from langchain_core.messages import AIMessage
 from langgraph.graph import END, START, StateGraph
 
 from api.core.agent.prompts import (
+    CLASSIFY_CATEGORY_MULTIPLE_REVIEWS_COMPACT_PROMPT,
     CLASSIFY_CATEGORY_MULTIPLE_REVIEWS_PROMPT,
+    CLASSIFY_COMBINED_MULTIPLE_REVIEWS_COMPACT_PROMPT,
+    CLASSIFY_COMBINED_MULTIPLE_REVIEWS_PROMPT,
+    CLASSIFY_SENTIMENT_MULTIPLE_REVIEWS_COMPACT_PROMPT,
     CLASSIFY_SENTIMENT_MULTIPLE_REVIEWS_PROMPT,
 )
 from api.core.agent.state import ClassificationState
 from api.core.agent.utils import (
+    IncrementalCompactParser,
+    IncrementalReviewsParser,
+    category_numbers,
+    chunk_text,
+    format_categories_numbered,
     format_reviews,
     format_reviews_with_categories,
-    llm,
+    get_llm,
+    normalize_categories,
+    parse_compact_categories,
+    parse_compact_combined,
+    parse_compact_sentiments,
     parse_review_categories,
+    parse_review_combined,
     parse_review_sentiments,
 )
+from api.core.settings import settings
+
+T = TypeVar("T")
+
+
+async def ask_by_id(
+    count: int,
+    build_prompt: Callable[[list[int]], str],
+    parse: Callable[[AIMessage], dict[int, T]],
+    hedge: bool = False,
+) -> list[T]:
+    """Запросить ответы для отзывов и сопоставить их по review_id
+
+    Отзывы нумеруются в промпте с 1. Если модель пропустила часть
+    review_id, отдельным вызовом переспрашиваются только пропущенные
+    отзывы (не более MISSING_REVIEWS_REASK_ATTEMPTS раз). Лишние
+    review_id игнорируются.
+
+    Args:
+        count (int): Количество отзывов
+        build_prompt (Callable[[list[int]], str]): Промпт для подмножества отзывов по их индексам
+        parse (Callable[[AIMessage], dict[int, T]]): Разбор ответа в словарь по review_id
+        hedge (bool): Дублировать медленный вызов на другой бэкенд
+
+    Returns:
+        list[T]: Ответ для каждого отзыва в исходном порядке
+
+    Raises:
+        ValueError: Ответ не удалось разобрать или модель так и не ответила на все отзывы
+    """
+    results: dict[int, T] = {}
+    remaining = list(range(count))
+
+    for attempt in range(1 + settings.MISSING_REVIEWS_REASK_ATTEMPTS):
+        response = await get_llm().ainvoke(build_prompt(remaining), hedge=hedge)
+        parsed = parse(response)
+
+        extra = sorted(set(parsed) - set(range(1, len(remaining) + 1)))
+        if extra:
+            print(f"Модель вернула лишние review_id: {extra}")
+
+        missing = []
+        for review_id, index in enumerate(remaining, 1):
+            if review_id in parsed:
+                results[index] = parsed[review_id]
+            else:
+                missing.append(index)
+
+        if not missing:
+            return [results[index] for index in range(count)]
+
+        print(f"Модель пропустила {len(missing)} из {len(remaining)} отзывов, переспрашиваем только их")
+        remaining = missing
+
+    raise ValueError(f"Модель не вернула ответ для {len(remaining)} отзывов")
+
+
+def _compact_output() -> bool:
+    return settings.LLM_OUTPUT_FORMAT == "compact"
+
+
+def build_category_prompt(reviews: list[str], available_categories: list[str]) -> str:
+    """Промпт категорий в формате ответа LLM_OUTPUT_FORMAT
+
+    Args:
+        reviews (list[str]): Тексты отзывов
+        available_categories (list[str]): Доступные категории
+
+    Returns:
+        str: Промпт
+    """
+    if _compact_output():
+        return CLASSIFY_CATEGORY_MULTIPLE_REVIEWS_COMPACT_PROMPT.format(
+            reviews=format_reviews(reviews),
+            available_categories=format_categories_numbered(available_categories),
+        )
+    return CLASSIFY_CATEGORY_MULTIPLE_REVIEWS_PROMPT.format(
+        reviews=format_reviews(reviews),
+        available_categories=", ".join(available_categories),
+    )
+
+
+def build_sentiment_prompt(reviews: list[str], categories: list[list[str]], available_categories: list[str]) -> str:
+    """Промпт тональностей в формате ответа LLM_OUTPUT_FORMAT
+
+    Args:
+        reviews (list[str]): Тексты отзывов
+        categories (list[list[str]]): Категории каждого отзыва
+        available_categories (list[str]): Доступные категории
+
+    Returns:
+        str: Промпт
+    """
+    if _compact_output():
+        return CLASSIFY_SENTIMENT_MULTIPLE_REVIEWS_COMPACT_PROMPT.format(
+            reviews_with_categories=format_reviews_with_categories(
+                reviews, [category_numbers(cats, available_categories) for cats in categories]
+            ),
+            available_categories=format_categories_numbered(available_categories),
+        )
+    return CLASSIFY_SENTIMENT_MULTIPLE_REVIEWS_PROMPT.format(
+        reviews_with_categories=format_reviews_with_categories(reviews, categories)
+    )
+
+
+def build_combined_prompt(reviews: list[str], available_categories: list[str]) -> str:
+    """Промпт категорий и тональностей за один вызов в формате ответа LLM_OUTPUT_FORMAT
+
+    Args:
+        reviews (list[str]): Тексты отзывов
+        available_categories (list[str]): Доступные категории
+
+    Returns:
+        str: Промпт
+    """
+    if _compact_output():
+        return CLASSIFY_COMBINED_MULTIPLE_REVIEWS_COMPACT_PROMPT.format(
+            reviews=format_reviews(reviews),
+            available_categories=format_categories_numbered(available_categories),
+        )
+    return CLASSIFY_COMBINED_MULTIPLE_REVIEWS_PROMPT.format(
+        reviews=format_reviews(reviews),
+        available_categories=", ".join(available_categories),
+    )
+
+
+def output_parsers(available_categories: list[str]) -> tuple[Callable, Callable, Callable]:
+    """Разбор ответов модели в формате LLM_OUTPUT_FORMAT
+
+    Args:
+        available_categories (list[str]): Категории в порядке нумерации промпта
+
+    Returns:
+        tuple[Callable, Callable, Callable]: Разбор категорий, тональностей и комбинированного ответа
+    """
+    if _compact_output():
+        return (
+            partial(parse_compact_categories, available_categories=available_categories),
+            partial(parse_compact_sentiments, available_categories=available_categories),
+            partial(parse_compact_combined, available_categories=available_categories),
+        )
+    return parse_review_categories, parse_review_sentiments, parse_review_combined
 
 
 async def classify_category(state: ClassificationState) -> ClassificationState:
@@ -26,17 +187,14 @@ async def classify_category(state: ClassificationState) -> ClassificationState:
         ClassificationState: Обновленное состояние с категориями
     """
     reviews = state["reviews"]
-    formatted_reviews = format_reviews(reviews)
     available_categories = state["available_categories"]
-    formatted_available_categories = ", ".join(available_categories)
+    hedge = state.get("hedge", False)
+    parse_categories, _, _ = output_parsers(available_categories)
 
-    prompt = CLASSIFY_CATEGORY_MULTIPLE_REVIEWS_PROMPT.format(
-        reviews=formatted_reviews,
-        available_categories=formatted_available_categories,
-    )
+    def build_prompt(indices: list[int]) -> str:
+        return build_category_prompt([reviews[i] for i in indices], available_categories)
 
-    response = await llm.ainvoke(prompt)
-    categories = parse_review_categories(response)
+    categories = await ask_by_id(len(reviews), build_prompt, parse_categories, hedge=hedge)
 
     return {"categories": categories}
 
@@ -44,6 +202,9 @@ async def classify_category(state: ClassificationState) -> ClassificationState:
 async def classify_sentiments(state: ClassificationState) -> ClassificationState:
     """Классификация тональности для каждой категории в каждом отзыве
 
+    Однотемные отзывы с оценкой из rating_sentiments получают тональность
+    по оценке; в модель отправляются только остальные.
+
     Args:
         state (ClassificationState): Состояние агента
 
@@ -52,14 +213,149 @@ async def classify_sentiments(state: ClassificationState) -> ClassificationState
     """
     reviews = state["reviews"]
     categories = state["categories"]
-    reviews_with_categories = format_reviews_with_categories(reviews, categories)
+    ratings = state.get("ratings") or [None] * len(reviews)
+    rating_sentiments = state.get("rating_sentiments") or {}
+    hedge = state.get("hedge", False)
+    available_categories = state["available_categories"]
+    _, parse_sentiments, _ = output_parsers(available_categories)
 
-    prompt = CLASSIFY_SENTIMENT_MULTIPLE_REVIEWS_PROMPT.format(reviews_with_categories=reviews_with_categories)
+    sentiments: list[dict[str, str] | None] = [None] * len(reviews)
+    ambiguous = []
+    for i, (cats, rating) in enumerate(zip(categories, ratings)):
+        if len(cats) == 1 and rating in rating_sentiments:
+            sentiments[i] = {cats[0]: rating_sentiments[rating]}
+        else:
+            ambiguous.append(i)
 
-    response = await llm.ainvoke(prompt)
-    sentiments = parse_review_sentiments(response)
+    if ambiguous:
 
-    return {"sentiments": sentiments}
+        def build_prompt(indices: list[int]) -> str:
+            selected = [ambiguous[i] for i in indices]
+            return build_sentiment_prompt(
+                [reviews[i] for i in selected], [categories[i] for i in selected], available_categories
+            )
+
+        answers = await ask_by_id(len(ambiguous), build_prompt, parse_sentiments, hedge=hedge)
+        for i, review_sentiments in zip(ambiguous, answers):
+            sentiments[i] = review_sentiments
+
+    return {"sentiments": [review_sentiments or {} for review_sentiments in sentiments]}
+
+
+async def classify_combined(state: ClassificationState) -> ClassificationState:
+    """Классификация категорий и тональностей одним вызовом модели
+
+    Args:
+        state (ClassificationState): Состояние агента
+
+    Returns:
+        ClassificationState: Обновленное состояние с категориями и тональностями
+    """
+    reviews = state["reviews"]
+    available_categories = state["available_categories"]
+    hedge = state.get("hedge", False)
+    _, _, parse_combined = output_parsers(available_categories)
+
+    def build_prompt(indices: list[int]) -> str:
+        return build_combined_prompt([reviews[i] for i in indices], available_categories)
+
+    answers = await ask_by_id(len(reviews), build_prompt, parse_combined, hedge=hedge)
+
+    return {
+        "categories": [categories for categories, _ in answers],
+        "sentiments": [sentiments for _, sentiments in answers],
+    }
+
+
+async def classify_pipelined(state: ClassificationState) -> ClassificationState:
+    """Категории стримом и тональности по мере их появления
+
+    Ответ с категориями разбирается инкрементально. Как только категории
+    получены для PIPELINE_SENTIMENT_CHUNK_SIZE отзывов, для них запускается
+    вызов тональности, не дожидаясь конца ответа с категориями. Пропущенные
+    в стриме отзывы переспрашиваются, как в двухэтапном графе.
+
+    Args:
+        state (ClassificationState): Состояние агента
+
+    Returns:
+        ClassificationState: Обновленное состояние с категориями и тональностями
+    """
+    reviews = state["reviews"]
+    ratings = state.get("ratings") or [None] * len(reviews)
+    rating_sentiments = state.get("rating_sentiments") or {}
+    available_categories = state["available_categories"]
+    hedge = state.get("hedge", False)
+    parse_categories, parse_sentiments, _ = output_parsers(available_categories)
+
+    categories: dict[int, list[str]] = {}
+    sentiments: list[dict[str, str] | None] = [None] * len(reviews)
+    ready: list[int] = []
+    tasks: list[asyncio.Task] = []
+
+    def build_categories_prompt(indices: list[int]) -> str:
+        return build_category_prompt([reviews[i] for i in indices], available_categories)
+
+    async def classify_chunk(indices: list[int]) -> None:
+        def build_prompt(subset: list[int]) -> str:
+            selected = [indices[i] for i in subset]
+            return build_sentiment_prompt(
+                [reviews[i] for i in selected], [categories[i] for i in selected], available_categories
+            )
+
+        answers = await ask_by_id(len(indices), build_prompt, parse_sentiments, hedge=hedge)
+        for i, review_sentiments in zip(indices, answers):
+            sentiments[i] = review_sentiments
+
+    def flush() -> None:
+        if ready:
+            tasks.append(asyncio.create_task(classify_chunk(ready.copy())))
+            ready.clear()
+
+    def accept(index: int, review_categories: list[str]) -> None:
+        categories[index] = review_categories
+        if len(review_categories) == 1 and ratings[index] in rating_sentiments:
+            sentiments[index] = {review_categories[0]: rating_sentiments[ratings[index]]}
+            return
+        ready.append(index)
+        if len(ready) >= settings.PIPELINE_SENTIMENT_CHUNK_SIZE:
+            flush()
+
+    def take(parsed_reviews: list[dict]) -> None:
+        for review in parsed_reviews:
+            index = review["review_id"] - 1
+            if 0 <= index < len(reviews) and index not in categories:
+                accept(index, normalize_categories(review["categories"]))
+
+    try:
+        parser = IncrementalCompactParser(available_categories) if _compact_output() else IncrementalReviewsParser()
+        async for chunk in get_llm().astream(build_categories_prompt(list(range(len(reviews))))):
+            take(parser.feed(chunk_text(chunk)))
+        take(parser.close())
+
+        missing = [i for i in range(len(reviews)) if i not in categories]
+        if missing:
+            print(f"В стриме категорий пропущено {len(missing)} отзывов, переспрашиваем только их")
+            answers = await ask_by_id(
+                len(missing),
+                lambda subset: build_categories_prompt([missing[i] for i in subset]),
+                parse_categories,
+                hedge=hedge,
+            )
+            for index, review_categories in zip(missing, answers):
+                accept(index, review_categories)
+
+        flush()
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    return {
+        "categories": [categories[i] for i in range(len(reviews))],
+        "sentiments": [review_sentiments or {} for review_sentiments in sentiments],
+    }
 
 
 workflow = StateGraph(ClassificationState)
@@ -72,3 +368,39 @@ workflow.add_edge("classify_category", "classify_sentiments")
 workflow.add_edge("classify_sentiments", END)
 
 classification_agent = workflow.compile()
+
+combined_workflow = StateGraph(ClassificationState)
+
+combined_workflow.add_node("classify_combined", classify_combined)
+
+combined_workflow.add_edge(START, "classify_combined")
+combined_workflow.add_edge("classify_combined", END)
+
+combined_classification_agent = combined_workflow.compile()
+
+pipelined_workflow = StateGraph(ClassificationState)
+
+pipelined_workflow.add_node("classify_pipelined", classify_pipelined)
+
+pipelined_workflow.add_edge(START, "classify_pipelined")
+pipelined_workflow.add_edge("classify_pipelined", END)
+
+pipelined_classification_agent = pipelined_workflow.compile()
+
+CLASSIFICATION_AGENTS = {
+    "two_stage": classification_agent,
+    "combined": combined_classification_agent,
+    "pipelined": pipelined_classification_agent,
+}
+
+
+def get_classification_agent(mode: str | None = None):
+    """Получить граф классификации для режима
+
+    Args:
+        mode (str | None): "two_stage", "combined" или "pipelined" (по умолчанию CLASSIFICATION_MODE)
+
+    Returns:
+        CompiledStateGraph: Скомпилированный граф
+    """
+    return CLASSIFICATION_AGENTS[mode or settings.CLASSIFICATION_MODE]
@@ -1,21 +1,16 @@
+import hashlib
+
 CLASSIFY_CATEGORY_MULTIPLE_REVIEWS_PROMPT = """Ты — эксперт по анализу отзывов о банковских продуктах и услугах.
 
 Твоя задача: классифицировать отзывы клиентов по категориям банковских продуктов и услуг.
 
-Доступные категории продуктов/услуг:
-{available_categories}
-
 Правила:
 1. Определяй категории для каждого отзыва отдельно
 2. Если отзыв касается нескольких продуктов/услуг, укажи все релевантные категории
-3. Используй только категории из списка выше
+3. Используй только категории из списка ниже
 4. Если отзыв не подходит ни под одну категорию — используй категорию "Прочее"
-5. Ответ должен быть строго в формате JSON без дополнительных комментариев
-
-Отзывы для анализа:
-<reviews>
-{reviews}
-</reviews>
+5. review_id — номер отзыва в квадратных скобках в начале его строки
+6. Ответ должен быть строго в формате JSON без дополнительных комментариев
 
 Верни результат в формате JSON:
 {{
@@ -29,7 +24,15 @@ CLASSIFY_CATEGORY_MULTIPLE_REVIEWS_PROMPT = """Ты — эксперт по ан
       "categories": ["категория1"]
     }}
   ]
-}}"""
+}}
+
+Доступные категории продуктов/услуг:
+{available_categories}
+
+Отзывы для анализа (по одному на строку):
+<reviews>
+{reviews}
+</reviews>"""
 
 CLASSIFY_SENTIMENT_MULTIPLE_REVIEWS_PROMPT = """Ты — эксперт по анализу тональности отзывов о банковских продуктах и услугах.
 
@@ -45,12 +48,8 @@ CLASSIFY_SENTIMENT_MULTIPLE_REVIEWS_PROMPT = """Ты — эксперт по а
 2. Анализируй тональность для каждой категории отдельно
 3. Один отзыв может содержать разную тональность для разных категорий
 4. Используй только тональности из списка выше
-5. Ответ должен быть строго в формате JSON без дополнительных комментариев
-
-Отзывы с уже определенными категориями:
-<reviews_with_categories>
-{reviews_with_categories}
-</reviews_with_categories>
+5. Каждый отзыв — строка вида "[review_id] (категории через ;) текст"
+6. Ответ должен быть строго в формате JSON без дополнительных комментариев
 
 Верни результат в формате JSON:
 {{
@@ -73,7 +72,12 @@ CLASSIFY_SENTIMENT_MULTIPLE_REVIEWS_PROMPT = """Ты — эксперт по а
       }}
     }},
   ]
-}}"""
+}}
+
+Отзывы с уже определенными категориями:
+<reviews_with_categories>
+{reviews_with_categories}
+</reviews_with_categories>"""
 
 CLASSIFY_CATEGORY_SINGLE_REVIEW_PROMPT = """Ты — эксперт по анализу отзывов о банковских продуктах и услугах.
 
@@ -127,3 +131,165 @@ CLASSIFY_SENTIMENT_SINGLE_REVIEW_PROMPT = """Ты — эксперт по ана
     "категорияN": "сентиментN"
   }}
 }}"""
+
+
+CLASSIFY_COMBINED_MULTIPLE_REVIEWS_PROMPT = """Ты — эксперт по анализу отзывов о банковских продуктах и услугах.
+
+Твоя задача: для каждого отзыва определить категории банковских продуктов и услуг и тональность отзыва по каждой из них.
+
+Доступные тональности:
+- положительно — клиент доволен, хвалит, выражает благодарность, рекомендует
+- нейтрально — объективное описание без ярко выраженных эмоций, констатация фактов
+- отрицательно — клиент недоволен, жалуется, критикует, выражает разочарование
+
+Правила:
+1. Анализируй каждый отзыв отдельно
+2. Если отзыв касается нескольких продуктов/услуг, укажи все релевантные категории
+3. Используй только категории из списка ниже и тональности из списка выше
+4. Если отзыв не подходит ни под одну категорию — используй категорию "Прочее"
+5. Один отзыв может содержать разную тональность для разных категорий
+6. review_id — номер отзыва в квадратных скобках в начале его строки
+7. Ответ должен быть строго в формате JSON без дополнительных комментариев
+
+Верни результат в формате JSON:
+{{
+  "reviews": [
+    {{
+      "review_id": 1,
+      "sentiments": {{
+        "категория1": "сентимент1",
+        "категория2": "сентимент2"
+      }}
+    }},
+    {{
+      "review_id": 2,
+      "sentiments": {{
+        "категория1": "сентимент1"
+      }}
+    }}
+  ]
+}}
+
+Доступные категории продуктов/услуг:
+{available_categories}
+
+Отзывы для анализа (по одному на строку):
+<reviews>
+{reviews}
+</reviews>"""
+
+
+CLASSIFY_CATEGORY_MULTIPLE_REVIEWS_COMPACT_PROMPT = """Ты — эксперт по анализу отзывов о банковских продуктах и услугах.
+
+Твоя задача: классифицировать отзывы клиентов по категориям банковских продуктов и услуг.
+
+Правила:
+1. Определяй категории для каждого отзыва отдельно
+2. Если отзыв касается нескольких продуктов/услуг, укажи все релевантные категории
+3. Используй только номера категорий из списка ниже
+4. Если отзыв не подходит ни под одну категорию — используй номер категории "Прочее"
+5. review_id — номер отзыва в квадратных скобках в начале его строки
+
+Формат ответа: по одной строке на отзыв — review_id, двоеточие и номера
+категорий через запятую. Без JSON, markdown и комментариев. Пример:
+1: 3,7
+2: 12
+
+Доступные категории продуктов/услуг (номер. название):
+{available_categories}
+
+Отзывы для анализа (по одному на строку):
+<reviews>
+{reviews}
+</reviews>"""
+
+CLASSIFY_SENTIMENT_MULTIPLE_REVIEWS_COMPACT_PROMPT = """Ты — эксперт по анализу тональности отзывов о банковских продуктах и услугах.
+
+Твоя задача: определить тональность отзывов для каждой категории продукта/услуги отдельно.
+
+Коды тональностей:
+- п — положительно: клиент доволен, хвалит, выражает благодарность, рекомендует
+- н — нейтрально: объективное описание без ярко выраженных эмоций, констатация фактов
+- о — отрицательно: клиент недоволен, жалуется, критикует, выражает разочарование
+
+Правила:
+1. Анализируй каждый отзыв отдельно
+2. Анализируй тональность для каждой категории отдельно
+3. Один отзыв может содержать разную тональность для разных категорий
+4. Каждый отзыв — строка вида "[review_id] (номера категорий через ;) текст"
+
+Формат ответа: по одной строке на отзыв — review_id, двоеточие и для каждой
+категории отзыва её номер и код тональности, через запятую. Без JSON,
+markdown и комментариев. Пример:
+1: 3п,7о
+2: 12н
+
+Категории продуктов/услуг (номер. название):
+{available_categories}
+
+Отзывы с уже определенными категориями:
+<reviews_with_categories>
+{reviews_with_categories}
+</reviews_with_categories>"""
+
+CLASSIFY_COMBINED_MULTIPLE_REVIEWS_COMPACT_PROMPT = """Ты — эксперт по анализу отзывов о банковских продуктах и услугах.
+
+Твоя задача: для каждого отзыва определить категории банковских продуктов и услуг и тональность отзыва по каждой из них.
+
+Коды тональностей:
+- п — положительно: клиент доволен, хвалит, выражает благодарность, рекомендует
+- н — нейтрально: объективное описание без ярко выраженных эмоций, констатация фактов
+- о — отрицательно: клиент недоволен, жалуется, критикует, выражает разочарование
+
+Правила:
+1. Анализируй каждый отзыв отдельно
+2. Если отзыв касается нескольких продуктов/услуг, укажи все релевантные категории
+3. Используй только номера категорий из списка ниже и коды тональностей из списка выше
+4. Если отзыв не подходит ни под одну категорию — используй номер категории "Прочее"
+5. Один отзыв может содержать разную тональность для разных категорий
+6. review_id — номер отзыва в квадратных скобках в начале его строки
+
+Формат ответа: по одной строке на отзыв — review_id, двоеточие и для каждой
+категории её номер и код тональности, через запятую. Без JSON, markdown и
+комментариев. Пример:
+1: 3п,7о
+2: 12н
+
+Доступные категории продуктов/услуг (номер. название):
+{available_categories}
+
+Отзывы для анализа (по одному на строку):
+<reviews>
+{reviews}
+</reviews>"""
+
+
+# Версия разметки отзывов в промпте (format_reviews, clean_review_text):
+# увеличивается при её изменении, чтобы сбросить кэш результатов
+REVIEWS_LAYOUT_VERSION = "compact-1"
+
+
+def _prompt_version(*prompts: str) -> str:
+    return hashlib.sha256("".join((REVIEWS_LAYOUT_VERSION, *prompts)).encode("utf-8")).hexdigest()[:12]
+
+
+# Версии промптов по формату ответа (LLM_OUTPUT_FORMAT) и режиму графа:
+# меняются при любой правке текста, чтобы закэшированные результаты
+# старых промптов не переиспользовались. pipelined использует те же
+# промпты, что two_stage, меняется только порядок вызовов
+PROMPT_VERSIONS = {
+    "json": {
+        "two_stage": _prompt_version(
+            CLASSIFY_CATEGORY_MULTIPLE_REVIEWS_PROMPT, CLASSIFY_SENTIMENT_MULTIPLE_REVIEWS_PROMPT
+        ),
+        "combined": _prompt_version(CLASSIFY_COMBINED_MULTIPLE_REVIEWS_PROMPT),
+    },
+    "compact": {
+        "two_stage": _prompt_version(
+            CLASSIFY_CATEGORY_MULTIPLE_REVIEWS_COMPACT_PROMPT, CLASSIFY_SENTIMENT_MULTIPLE_REVIEWS_COMPACT_PROMPT
+        ),
+        "combined": _prompt_version(CLASSIFY_COMBINED_MULTIPLE_REVIEWS_COMPACT_PROMPT),
+    },
+}
+for _versions in PROMPT_VERSIONS.values():
+    _versions["pipelined"] = _versions["two_stage"]
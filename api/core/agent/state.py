@@ -1,4 +1,4 @@
-from typing import TypedDict
+from typing import NotRequired, TypedDict
 
 
 class ClassificationState(TypedDict):
@@ -8,3 +8,9 @@ class ClassificationState(TypedDict):
     reviews: list[str]
     categories: list[list[str]]
     sentiments: list[dict[str, str]]
+    # Оценки отзывов и выученное соответствие оценка -> тональность:
+    # однотемные отзывы с такой оценкой не отправляются на этап тональности
+    ratings: NotRequired[list[int | None]]
+    rating_sentiments: NotRequired[dict[int, str]]
+    # Дублировать медленные вызовы модели на другой бэкенд (LLM_HEDGE_*)
+    hedge: NotRequired[bool]
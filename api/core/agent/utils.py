@@ -1,16 +1,29 @@
 """Утилиты для агента."""
 
 import asyncio
+import html
 import json
+import math
+import random
 import re
-from collections.abc import Callable
+import statistics
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable
+from email.utils import parsedate_to_datetime
 from types import SimpleNamespace
-from typing import Any
+from typing import Any, TypeVar
 
-from langchain_core.messages import AIMessage
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
 from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_openai import ChatOpenAI
 
-from api.core.settings import settings
+from api.core.metrics import metrics
+from api.core.rate_limit import RateLimiter, RateLimitReservation
+from api.core.settings import LLMBackendSettings, settings
+
+T = TypeVar("T")
 
 model_exception_message = """Ошибка при инициализации языковой модели (LLM):
 Убедитесь, что указан верный API ключ в .env файле.
@@ -20,57 +33,612 @@ Gemini модель из Google AI Studio не поддерживается на
 Стабильно работает бесплатный VPN Proxy Master (доступен в AppStore). Может потребоваться множественное переподключение VPN."""
 
 
-class LLM:
-    """Обертка над моделью для вызова с повторением при превышении квоты/лимита запросов."""
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов в тексте
 
-    def __init__(self) -> None:
+    Args:
+        text (str): Текст промпта или ответа
+
+    Returns:
+        int: Оценка количества токенов
+    """
+    return math.ceil(len(text) / settings.CHARS_PER_TOKEN)
+
+
+_TRANSIENT_STATUS_CODES = {
+    408: "timeout",
+    429: "rate_limit",
+    500: "server_error",
+    502: "server_error",
+    503: "server_error",
+    504: "timeout",
+}
+
+
+def _status_code(error: Exception) -> int | None:
+    for value in (
+        getattr(error, "status_code", None),
+        getattr(error, "code", None),
+        getattr(getattr(error, "response", None), "status_code", None),
+    ):
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def classify_llm_error(error: Exception) -> str | None:
+    """Причина временной ошибки вызова модели
+
+    Args:
+        error (Exception): Исключение клиента модели
+
+    Returns:
+        str | None: "rate_limit", "server_error", "timeout", "network" или None,
+        если ошибка не временная и повтор не поможет
+    """
+    status_code = _status_code(error)
+    if status_code in _TRANSIENT_STATUS_CODES:
+        return _TRANSIENT_STATUS_CODES[status_code]
+
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return "timeout"
+    if isinstance(error, ConnectionError):
+        return "network"
+
+    # Клиенты провайдеров оборачивают ошибки по-разному: смотрим на имена
+    # классов (httpx, google.api_core) и текст
+    names = " ".join(cls.__name__ for cls in type(error).__mro__)
+    error_text = f"{names} {error}"
+    if "429" in error_text or "ResourceExhausted" in error_text or "quota" in error_text.lower():
+        return "rate_limit"
+    if "Timeout" in names or "DeadlineExceeded" in error_text:
+        return "timeout"
+    if re.search(r"\b50[0234]\b", str(error)) or "ServiceUnavailable" in error_text or "InternalServerError" in error_text:
+        return "server_error"
+    if any(name in names for name in ("ConnectError", "NetworkError", "RemoteProtocolError", "ReadError")):
+        return "network"
+    return None
+
+
+def retry_after_seconds(error: Exception) -> float | None:
+    """Пауза, которую просит провайдер: заголовок Retry-After или retryDelay из тела ошибки
+
+    Args:
+        error (Exception): Исключение клиента модели
+
+    Returns:
+        float | None: Секунды ожидания или None, если провайдер их не указал
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    value = headers.get("retry-after") if headers is not None else None
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+
+    # Gemini передаёт паузу в деталях ошибки: "retryDelay": "37s" или retry_delay { seconds: 37 }
+    match = re.search(r"retry_?delay\W*(?:seconds\W*)?(\d+(?:\.\d+)?)", str(error), re.IGNORECASE)
+    if match is None:
+        match = re.search(r"retry in (\d+(?:\.\d+)?)\s*s", str(error), re.IGNORECASE)
+    return float(match.group(1)) if match else None
+
+
+def backoff_delay(attempt: int, retry_after: float | None = None) -> float:
+    """Пауза перед повтором: экспоненциальная с полным джиттером
+
+    Если провайдер указал Retry-After, ждём не меньше него. Пауза не
+    превышает LLM_RETRY_MAX_DELAY.
+
+    Args:
+        attempt (int): Номер неудачной попытки, начиная с 0
+        retry_after (float | None): Пауза, которую просит провайдер
+
+    Returns:
+        float: Секунды ожидания
+    """
+    ceiling = min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * 2**attempt)
+    delay = random.uniform(0, ceiling)
+    if retry_after is not None:
+        # Небольшой джиттер поверх Retry-After, чтобы ожидающие не пришли разом
+        delay = retry_after + delay * 0.1
+    return min(delay, settings.LLM_RETRY_MAX_DELAY)
+
+
+class CircuitOpenError(RuntimeError):
+    """Провайдер недоступен: circuit breaker открыт, вызов не выполнялся"""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"Провайдер {provider} временно недоступен, повторите через {math.ceil(retry_after)} с")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Circuit breaker провайдера модели.
+
+    closed — вызовы идут как обычно. После failure_threshold ошибок
+    провайдера подряд (5xx, таймауты, сеть) переходит в open: вызовы
+    сразу отклоняются CircuitOpenError. Через recovery_seconds —
+    half_open: пропускается один пробный вызов, успех закрывает
+    breaker, ошибка снова открывает.
+    """
+
+    STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+    def __init__(self, provider: str, failure_threshold: int, recovery_seconds: float):
+        """Инициализация circuit breaker
+
+        Args:
+            provider (str): Имя провайдера для метрик и сообщений
+            failure_threshold (int): Ошибок подряд до открытия
+            recovery_seconds (float): Сколько секунд отклонять вызовы после открытия
         """
-        Получить Gemini модель из Google AI Studio.
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started_at: float | None = None
+        self._set_state("closed")
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            print(f"Circuit breaker {self.provider}: {self.state} -> {state}")
+        self.state = state
+        metrics.set_gauge("llm_circuit_state", self.STATES[state], provider=self.provider)
+
+    def before_call(self) -> None:
+        """Проверить, можно ли вызывать провайдера
 
         Raises:
-            RuntimeError: Ошибка при инициализации языковой модели
+            CircuitOpenError: Breaker открыт или пробный вызов уже выполняется
         """
-        try:
-            llm = ChatGoogleGenerativeAI(
-                model=settings.LLM_NAME,
-                google_api_key=settings.GOOGLE_API_KEY,
+        now = time.monotonic()
+        if self.state == "open":
+            remaining = self._opened_at + self.recovery_seconds - now
+            if remaining > 0:
+                metrics.increment("llm_circuit_rejections_total", provider=self.provider)
+                raise CircuitOpenError(self.provider, remaining)
+            self._set_state("half_open")
+            self._probe_started_at = None
+
+        if self.state == "half_open":
+            # Зависший или отменённый пробный вызов не блокирует breaker навсегда
+            if self._probe_started_at is not None and now - self._probe_started_at < self.recovery_seconds:
+                metrics.increment("llm_circuit_rejections_total", provider=self.provider)
+                raise CircuitOpenError(self.provider, self._probe_started_at + self.recovery_seconds - now)
+            self._probe_started_at = now
+
+    def is_open(self) -> bool:
+        """Будет ли вызов сейчас отклонён (без смены состояния)"""
+        now = time.monotonic()
+        if self.state == "open":
+            return now < self._opened_at + self.recovery_seconds
+        if self.state == "half_open":
+            return self._probe_started_at is not None and now - self._probe_started_at < self.recovery_seconds
+        return False
+
+    def record_success(self) -> None:
+        """Провайдер ответил (в том числе ошибкой запроса, а не своей)"""
+        self._failures = 0
+        self._probe_started_at = None
+        self._set_state("closed")
+
+    def record_failure(self) -> None:
+        """Ошибка провайдера: 5xx, таймаут или сеть"""
+        self._failures += 1
+        self._probe_started_at = None
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            if self.state != "open":
+                metrics.increment("llm_circuit_opened_total", provider=self.provider)
+            self._opened_at = time.monotonic()
+            self._set_state("open")
+
+    def stats(self) -> dict[str, Any]:
+        """Состояние breaker для эндпоинта метрик"""
+        return {"state": self.state, "consecutive_failures": self._failures}
+
+
+# Breaker общий для всех клиентов одного бэкенда
+circuit_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_circuit_breaker(provider: str) -> CircuitBreaker:
+    """Получить circuit breaker провайдера, создав его при первом обращении
+
+    Args:
+        provider (str): Имя провайдера
+
+    Returns:
+        CircuitBreaker: Breaker провайдера
+    """
+    if provider not in circuit_breakers:
+        circuit_breakers[provider] = CircuitBreaker(
+            provider,
+            failure_threshold=settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+            recovery_seconds=settings.LLM_CIRCUIT_RECOVERY_SECONDS,
+        )
+    return circuit_breakers[provider]
+
+
+def _create_chat_model(config: LLMBackendSettings) -> BaseChatModel:
+    """Клиент модели для бэкенда (без обращения к сети)
+
+    Raises:
+        RuntimeError: Клиент не удалось создать
+    """
+    try:
+        if config.provider == "openai":
+            # Повторы выполняет пул, чтобы ошибки доходили до breaker и статистики
+            return ChatOpenAI(
+                model=config.model,
+                api_key=config.api_key,
+                base_url=config.base_url,
                 temperature=0.0,
+                max_retries=0,
             )
+        return ChatGoogleGenerativeAI(
+            model=config.model,
+            google_api_key=config.api_key,
+            temperature=0.0,
+            client_options={"api_endpoint": config.base_url} if config.base_url else None,
+        )
+    except Exception:
+        raise RuntimeError(model_exception_message) from None
+
+
+def _default_backends() -> list[LLMBackendSettings]:
+    """Один Gemini-бэкенд из GOOGLE_API_KEY, если LLM_BACKENDS не задан"""
+    if not settings.GOOGLE_API_KEY:
+        return []
+    return [
+        LLMBackendSettings(
+            name="gemini",
+            provider="gemini",
+            model=settings.LLM_NAME,
+            api_key=settings.GOOGLE_API_KEY,
+            requests_per_minute=settings.RATE_LIMIT_PER_MINUTE,
+            tokens_per_minute=settings.TOKENS_PER_MINUTE_LIMIT,
+            request_burst=settings.RATE_LIMIT_BURST,
+            token_burst=settings.TOKEN_LIMIT_BURST,
+        )
+    ]
 
-            _ = llm.invoke("Hello!")
 
-            self.llm = llm
+def llm_model_id() -> str:
+    """Модели пула для ключа кэша классификации
+
+    Ключ называет все модели, которые могут ответить на вызов, а не только
+    LLM_NAME: смена состава пула не отдаёт из кэша разметку другой модели.
+
+    Returns:
+        str: Отсортированные "провайдер:модель" через "+"
+    """
+    configs = settings.LLM_BACKENDS or _default_backends()
+    if not configs:
+        return settings.LLM_NAME
+    return "+".join(sorted({f"{config.provider}:{config.model}" for config in configs}))
+
 
-        except Exception:
-            raise RuntimeError(model_exception_message) from None
+class LLMBackend:
+    """Бэкенд пула: клиент модели со своими квотами, circuit breaker и статистикой задержки."""
 
-    async def _arun_with_retry(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
-        """Выполнить функцию с повторными попытками при ошибках"""
-        max_retries = 3
+    def __init__(self, config: LLMBackendSettings):
+        """Инициализация бэкенда
 
-        for attempt in range(max_retries):
+        Args:
+            config (LLMBackendSettings): Настройки бэкенда
+
+        Raises:
+            RuntimeError: Клиент не удалось создать
+        """
+        self.name = config.name
+        self.llm = _create_chat_model(config)
+        self.rate_limiter = RateLimiter(
+            max_requests_per_minute=config.requests_per_minute,
+            max_tokens_per_minute=config.tokens_per_minute,
+            request_burst=config.request_burst,
+            token_burst=config.token_burst,
+        )
+        self.circuit_breaker = get_circuit_breaker(config.name)
+
+        # Запросы, выбравшие бэкенд: ждущие квоту и выполняющиеся
+        self.in_flight = 0
+        # До первого ответа — априорная оценка, затем EWMA измеренных задержек
+        self.latency_ewma = settings.LLM_INITIAL_LATENCY_SECONDS
+        self._latency_samples = 0
+        # После временной ошибки бэкенд не выбирается до этого момента, если есть другие
+        self.cooldown_until = 0.0
+
+    def expected_wait(self, estimated_tokens: int) -> float:
+        """Сколько новый запрос прождёт до вызова: квота или пауза после ошибки"""
+        return max(0.0, self.rate_limiter.wait_time(estimated_tokens), self.cooldown_until - time.monotonic())
+
+    def score(self, estimated_tokens: int) -> float:
+        """Оценка времени до ответа: ожидание плюс EWMA задержки за каждый запрос в очереди"""
+        return self.expected_wait(estimated_tokens) + self.latency_ewma * (self.in_flight + 1)
+
+    def record_latency(self, seconds: float) -> None:
+        """Учесть задержку успешного вызова в EWMA"""
+        alpha = settings.LLM_LATENCY_EWMA_ALPHA if self._latency_samples else 1.0
+        self.latency_ewma = alpha * seconds + (1 - alpha) * self.latency_ewma
+        self._latency_samples += 1
+        metrics.set_gauge("llm_latency_ewma_seconds", round(self.latency_ewma, 3), provider=self.name)
+
+    def stats(self) -> dict[str, Any]:
+        """Состояние бэкенда для эндпоинта метрик"""
+        return {
+            "name": self.name,
+            "in_flight": self.in_flight,
+            "latency_ewma_seconds": round(self.latency_ewma, 3),
+            "circuit": self.circuit_breaker.state,
+        }
+
+
+class LLM:
+    """Пул бэкендов модели: квоты, повторы временных ошибок, circuit breaker и выбор бэкенда по задержке.
+
+    Каждый вызов (и каждый повтор) уходит бэкенду с наименьшей оценкой
+    времени до ответа среди тех, чей breaker не открыт. Пропускная
+    способность растёт с числом бэкендов: квоты у каждого свои.
+    """
+
+    def __init__(self, backends: list[LLMBackendSettings] | None = None) -> None:
+        """
+        Создать клиенты бэкендов из LLM_BACKENDS (или Gemini из GOOGLE_API_KEY).
+
+        Клиенты создаются без обращения к сети, доступность модели
+        проверяет probe().
+
+        Args:
+            backends (list[LLMBackendSettings] | None): Бэкенды вместо настроек
+
+        Raises:
+            RuntimeError: Не задан ни один бэкенд или клиент не удалось создать
+        """
+        configs = backends if backends is not None else settings.LLM_BACKENDS or _default_backends()
+        if not configs:
+            raise RuntimeError("Не задан GOOGLE_API_KEY: классификация отзывов недоступна")
+
+        self.backends = [LLMBackend(config) for config in configs]
+        if len({(config.provider, config.model) for config in configs}) > 1:
+            print(
+                "Внимание: бэкенды пула используют разные модели, ответы на один отзыв "
+                "могут отличаться в зависимости от выбранного бэкенда"
+            )
+
+        # Задержки успешных вызовов для порога hedging и учёт бюджета дублей
+        self._latencies: deque[float] = deque(maxlen=500)
+        self._calls = 0
+        self._hedges = 0
+
+    def _choose_backend(self, estimated_tokens: int, avoid: set[str] | None = None) -> LLMBackend:
+        """Бэкенд с наименьшей оценкой времени до ответа
+
+        Открытые breaker и бэкенды из avoid выбираются, только если других нет.
+        """
+        available = [backend for backend in self.backends if not backend.circuit_breaker.is_open()] or self.backends
+        preferred = [backend for backend in available if backend.name not in (avoid or ())] or available
+        return min(preferred, key=lambda backend: backend.score(estimated_tokens))
+
+    async def _acquire_backend(
+        self, estimated_tokens: int, avoid: set[str] | None = None
+    ) -> tuple[LLMBackend, RateLimitReservation]:
+        """Выбрать бэкенд и дождаться его квоты; in_flight увеличивается до ожидания
+
+        Если breaker бэкенда открылся, пока запрос ждал, выбирается другой.
+
+        Raises:
+            CircuitOpenError: Все бэкенды недоступны
+        """
+        while True:
+            backend = self._choose_backend(estimated_tokens, avoid)
+            backend.in_flight += 1
             try:
-                return await func(*args, **kwargs)
+                cooldown = backend.cooldown_until - time.monotonic()
+                if cooldown > 0:
+                    await asyncio.sleep(cooldown)
+                backend.circuit_breaker.before_call()
+                reservation = await backend.rate_limiter.acquire(estimated_tokens)
+            except CircuitOpenError:
+                backend.in_flight -= 1
+                if all(b.circuit_breaker.is_open() for b in self.backends):
+                    raise
+                continue
+            except BaseException:
+                backend.in_flight -= 1
+                raise
+            return backend, reservation
+
+    def _retry_delay(self, error: Exception, attempt: int, backend: LLMBackend) -> float | None:
+        """Учесть ошибку вызова и решить, повторять ли его
+
+        Пауза перед повтором назначается бэкенду: если есть другой
+        бэкенд, повтор уйдёт к нему без ожидания.
+
+        Args:
+            error (Exception): Ошибка вызова
+            attempt (int): Номер попытки, начиная с 0
+            backend (LLMBackend): Бэкенд, вернувший ошибку
+
+        Returns:
+            float | None: Пауза бэкенда или None, если ошибку нужно пробросить
+        """
+        reason = classify_llm_error(error)
+        if reason in ("server_error", "timeout", "network"):
+            backend.circuit_breaker.record_failure()
+        else:
+            # 429 и ошибки запроса означают, что провайдер отвечает
+            backend.circuit_breaker.record_success()
+
+        open_everywhere = all(b.circuit_breaker.is_open() for b in self.backends)
+        if reason is None or attempt == settings.LLM_RETRY_ATTEMPTS - 1 or open_everywhere:
+            metrics.increment("llm_failures_total", provider=backend.name, reason=reason or "other")
+            return None
+
+        delay = backoff_delay(attempt, retry_after_seconds(error))
+        backend.cooldown_until = max(backend.cooldown_until, time.monotonic() + delay)
+        metrics.increment("llm_retries_total", provider=backend.name, reason=reason)
+        print(
+            f"Ошибка вызова модели {backend.name} ({reason}), повтор {attempt + 1}/{settings.LLM_RETRY_ATTEMPTS - 1}, "
+            f"бэкенд на паузе {delay:.1f} с: {error}"
+        )
+        return delay
+
+    async def _arun_with_retry(
+        self,
+        call: Callable[[Any], Awaitable[Any]],
+        estimated_tokens: int,
+        used_backends: set[str] | None = None,
+        sent: asyncio.Event | None = None,
+    ) -> Any:
+        """Выполнить вызов на лучшем бэкенде с повторами при временных ошибках
+
+        Args:
+            call (Callable[[Any], Awaitable[Any]]): Вызов по клиенту модели бэкенда
+            estimated_tokens (int): Оценка токенов для квот и выбора бэкенда
+            used_backends (set[str] | None): Сюда добавляются выбранные бэкенды, их
+                вызов по возможности избегает (для дубля при hedging)
+            sent (asyncio.Event | None): Устанавливается, когда запрос получил
+                квоту и уходит провайдеру (для таймера hedging)
+
+        Raises:
+            CircuitOpenError: Все бэкенды недоступны, вызов не выполнялся
+        """
+        avoid = set(used_backends) if used_backends else None
+        for attempt in range(settings.LLM_RETRY_ATTEMPTS):
+            self._calls += 1
+            backend, reservation = await self._acquire_backend(estimated_tokens, avoid)
+            if used_backends is not None:
+                used_backends.add(backend.name)
+            if sent is not None:
+                sent.set()
+            started_at = time.monotonic()
+            try:
+                response = await call(backend.llm)
             except Exception as e:
-                error_text = str(e)
-                is_quota = "429" in error_text or "ResourceExhausted" in error_text or "quota" in error_text.lower()
+                if self._retry_delay(e, attempt, backend) is None:
+                    raise
+                continue
+            finally:
+                backend.in_flight -= 1
+
+            backend.circuit_breaker.record_success()
+            backend.record_latency(time.monotonic() - started_at)
+            self._latencies.append(time.monotonic() - started_at)
+            reservation.settle(response)
+            return response
+
+        raise RuntimeError(f"Не удалось выполнить запрос после {settings.LLM_RETRY_ATTEMPTS} попыток")
+
+    def _hedge_delay(self) -> float | None:
+        """Через сколько секунд дублировать вызов (None — hedging сейчас невозможен)"""
+        if not settings.LLM_HEDGE_ENABLED or len(self._latencies) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        cut = statistics.quantiles(self._latencies, n=100, method="inclusive")
+        quantile = cut[min(98, max(0, round(settings.LLM_HEDGE_QUANTILE * 100) - 1))]
+        return max(settings.LLM_HEDGE_MIN_DELAY, quantile)
 
-                if not is_quota or attempt == max_retries - 1:
+    async def _arun_hedged(self, call: Callable[[Any], Awaitable[Any]], estimated_tokens: int) -> Any:
+        """Вызов с дублем на другой бэкенд, если ответ задержался дольше квантиля задержек
+
+        Побеждает первый успешный ответ, второй вызов отменяется. Ошибка
+        пробрасывается, только если не удались оба вызова. Таймер дубля
+        запускается, когда основной запрос получил квоту и ушёл провайдеру:
+        ожидание собственной квоты медленным ответом не считается.
+        """
+        delay = self._hedge_delay()
+        if delay is None:
+            return await self._arun_with_retry(call, estimated_tokens)
+
+        used_backends: set[str] = set()
+        sent = asyncio.Event()
+        primary = asyncio.create_task(self._arun_with_retry(call, estimated_tokens, used_backends, sent))
+        tasks = {primary}
+        sent_wait = asyncio.create_task(sent.wait())
+        try:
+            try:
+                await asyncio.wait({primary, sent_wait}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                sent_wait.cancel()
+
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            # Бюджет: дублей не больше LLM_HEDGE_BUDGET_RATIO от всех вызовов
+            if not done and self._hedges < settings.LLM_HEDGE_BUDGET_RATIO * self._calls:
+                self._hedges += 1
+                metrics.increment("llm_hedges_total")
+                tasks.add(asyncio.create_task(self._arun_with_retry(call, estimated_tokens, used_backends)))
+
+            errors = []
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                        continue
+                    if task is not primary:
+                        metrics.increment("llm_hedge_wins_total")
+                    return task.result()
+            raise errors[0]
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _astream_with_retry(
+        self, call: Callable[[Any], AsyncIterator[Any]], estimated_tokens: int
+    ) -> AsyncIterator[Any]:
+        """Стрим на лучшем бэкенде с повторами, пока не получен первый чанк
+
+        После первого чанка ошибка пробрасывается: часть ответа уже отдана.
+        """
+        for attempt in range(settings.LLM_RETRY_ATTEMPTS):
+            backend, reservation = await self._acquire_backend(estimated_tokens)
+            started_at = time.monotonic()
+            response: AIMessageChunk | None = None
+            started = False
+            try:
+                async for chunk in call(backend.llm):
+                    started = True
+                    if isinstance(chunk, AIMessageChunk):
+                        response = chunk if response is None else response + chunk
+                    yield chunk
+            except Exception as e:
+                # Оборванный стрим не повторяем: считаем попытку последней
+                if self._retry_delay(e, settings.LLM_RETRY_ATTEMPTS - 1 if started else attempt, backend) is None:
                     raise
+                continue
+            finally:
+                backend.in_flight -= 1
 
-                print("Превышен лимит API, ожидание 60 секунд...")
-                await asyncio.sleep(60)
+            backend.circuit_breaker.record_success()
+            backend.record_latency(time.monotonic() - started_at)
+            reservation.settle(response)
+            return
 
-        raise RuntimeError(f"Не удалось выполнить запрос после {max_retries} попыток")
+    def _wrap_runnable(self, build: Callable[[Any], Any]) -> Any:
+        """Обёртка runnable: вызовы через пул и ретраи
 
-    def _wrap_runnable(self, runnable: Any) -> Any:
-        """Обёртка runnable: синхронные и асинхронные вызовы через ретраи"""
+        Args:
+            build (Callable[[Any], Any]): Runnable по клиенту модели бэкенда
+        """
 
-        async def ainvoke(*args: Any, **kwargs: Any) -> Any:
-            return await self._arun_with_retry(runnable.ainvoke, *args, **kwargs)
+        async def ainvoke(prompt: Any, *args: Any, **kwargs: Any) -> Any:
+            return await self._arun_with_retry(
+                lambda llm: build(llm).ainvoke(prompt, *args, **kwargs),
+                estimate_tokens(str(prompt)) + settings.COMPLETION_TOKENS_ESTIMATE,
+            )
 
-        async def astream(*args: Any, **kwargs: Any) -> Any:
-            return await self._arun_with_retry(runnable.astream, *args, **kwargs)
+        def astream(prompt: Any, *args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+            return self._astream_with_retry(
+                lambda llm: build(llm).astream(prompt, *args, **kwargs),
+                estimate_tokens(str(prompt)) + settings.COMPLETION_TOKENS_ESTIMATE,
+            )
 
         return SimpleNamespace(
             ainvoke=ainvoke,
@@ -79,54 +647,126 @@ class LLM:
 
     def bind_tools(self, *args: Any, **kwargs: Any) -> Any:
         """Привязать инструменты к модели"""
-        return self._wrap_runnable(self.llm.bind_tools(*args, **kwargs))
+        return self._wrap_runnable(lambda llm: llm.bind_tools(*args, **kwargs))
 
     def with_structured_output(self, *args: Any, **kwargs: Any) -> Any:
         """Получить структурированный вывод"""
-        return self._wrap_runnable(self.llm.with_structured_output(*args, **kwargs))
+        return self._wrap_runnable(lambda llm: llm.with_structured_output(*args, **kwargs))
+
+    async def probe(self) -> dict[str, str]:
+        """Пробный вызов каждого бэкенда без повторов и квот
+
+        Returns:
+            dict[str, str]: "ready" или описание ошибки для каждого бэкенда
+        """
+
+        async def probe_backend(backend: LLMBackend) -> str:
+            try:
+                await asyncio.wait_for(backend.llm.ainvoke("Hello!"), timeout=settings.LLM_PROBE_TIMEOUT)
+                return "ready"
+            except Exception as e:
+                return f"unavailable: {type(e).__name__}"
+
+        results = await asyncio.gather(*(probe_backend(backend) for backend in self.backends))
+        return {backend.name: result for backend, result in zip(self.backends, results)}
+
+    def stats(self) -> dict[str, Any]:
+        """Состояние бэкендов пула и hedging"""
+        return {
+            "backends": [backend.stats() for backend in self.backends],
+            "calls": self._calls,
+            "hedges": self._hedges,
+            "hedge_delay_seconds": self._hedge_delay(),
+        }
+
+    async def ainvoke(self, prompt: str, *args: Any, hedge: bool = False, **kwargs: Any) -> Any:
+        """Асинхронный вызов модели на лучшем бэкенде с учётом квот по запросам и токенам
+
+        Args:
+            prompt (str): Промпт
+            hedge (bool): Дублировать вызов на другой бэкенд, если он задержался (LLM_HEDGE_*)
+        """
+        run = self._arun_hedged if hedge else self._arun_with_retry
+        return await run(
+            lambda llm: llm.ainvoke(prompt, *args, **kwargs),
+            estimate_tokens(str(prompt)) + settings.COMPLETION_TOKENS_ESTIMATE,
+        )
+
+    def astream(self, prompt: str, *args: Any, **kwargs: Any) -> AsyncIterator[AIMessageChunk]:
+        """Асинхронный стрим модели на лучшем бэкенде с учётом квот по запросам и токенам"""
+        return self._astream_with_retry(
+            lambda llm: llm.astream(prompt, *args, **kwargs),
+            estimate_tokens(str(prompt)) + settings.COMPLETION_TOKENS_ESTIMATE,
+        )
+
 
-    async def ainvoke(self, *args: Any, **kwargs: Any) -> Any:
-        """Асинхронный вызов модели"""
-        return await self._arun_with_retry(self.llm.ainvoke, *args, **kwargs)
+_HTML_TAG = re.compile(r"<[^>]+>")
+_WHITESPACE = re.compile(r"\s+")
 
-    async def astream(self, *args: Any, **kwargs: Any) -> Any:
-        """Асинхронный стрим модели"""
-        return await self._arun_with_retry(self.llm.astream, *args, **kwargs)
+
+def normalize_review_text(text: str) -> str:
+    """Нормализовать текст отзыва без обрезки
+
+    HTML-теги удаляются, сущности раскрываются, пробельные символы
+    схлопываются. Общая нормализация для промпта и ключа кэша
+    классификации, чтобы одинаковые для модели тексты давали один ключ.
+
+    Args:
+        text (str): Текст отзыва
+
+    Returns:
+        str: Нормализованный текст
+    """
+    return _WHITESPACE.sub(" ", html.unescape(_HTML_TAG.sub(" ", text))).strip()
+
+
+def clean_review_text(text: str, max_tokens: int | None = None) -> str:
+    """Нормализовать текст отзыва для промпта
+
+    Текст нормализуется normalize_review_text и занимает одну строку
+    промпта. Текст длиннее бюджета обрезается по границе слова.
+
+    Args:
+        text (str): Текст отзыва
+        max_tokens (int | None): Бюджет токенов на отзыв (по умолчанию REVIEW_MAX_TOKENS)
+
+    Returns:
+        str: Нормализованный текст
+    """
+    text = normalize_review_text(text)
+
+    max_chars = int((max_tokens or settings.REVIEW_MAX_TOKENS) * settings.CHARS_PER_TOKEN)
+    if len(text) > max_chars:
+        text = text[:max_chars].rsplit(" ", 1)[0] + " …"
+    return text
 
 
 def format_reviews(reviews: list[str]) -> str:
-    """Форматирование списка отзывов в читаемый текст
+    """Форматирование списка отзывов для промпта: строка "[ID] текст" на отзыв
 
     Args:
         reviews (list[str]): Список текстов отзывов
 
     Returns:
-        str: Отформатированная строка с пронумерованными отзывами
+        str: Пронумерованные с 1 нормализованные отзывы
     """
-    formatted_reviews = ""
-    for i, review in enumerate(reviews, 1):
-        formatted_reviews += f"\n{i}. Отзыв (ID={i}):\n{review}\n"
-        formatted_reviews += "-" * 100 + "\n"
-    return formatted_reviews
+    return "\n".join(f"[{i}] {clean_review_text(review)}" for i, review in enumerate(reviews, 1))
 
 
 def format_reviews_with_categories(reviews: list[str], categories: list[list[str]]) -> str:
-    """Форматирование списка отзывов с категориями в читаемый текст
+    """Форматирование списка отзывов с категориями для промпта: строка "[ID] (категории) текст"
 
     Args:
         reviews (list[str]): Список текстов отзывов
         categories (list[list[str]]): Список категорий для каждого отзыва
 
     Returns:
-        str: Отформатированная строка с отзывами и их категориями
+        str: Пронумерованные с 1 нормализованные отзывы с категориями
     """
-    formatted_reviews = ""
-    for i, (review, cats) in enumerate(zip(reviews, categories, strict=True), 1):
-        formatted_reviews += f"\n{i}. Отзыв (ID={i}):\n"
-        formatted_reviews += f"Категории: {', '.join(cats)}\n"
-        formatted_reviews += f"Текст: {review}\n"
-        formatted_reviews += "-" * 100 + "\n"
-    return formatted_reviews
+    return "\n".join(
+        f"[{i}] ({'; '.join(cats)}) {clean_review_text(review)}"
+        for i, (review, cats) in enumerate(zip(reviews, categories, strict=True), 1)
+    )
 
 
 def clean_json_response(response: AIMessage) -> str:
@@ -150,14 +790,142 @@ def clean_json_response(response: AIMessage) -> str:
     return content
 
 
-def parse_review_categories(response: AIMessage) -> list[list[str]]:
-    """Парсинг ответа модели в список категорий для каждого отзыва
+def chunk_text(chunk: AIMessageChunk) -> str:
+    """Текст чанка стрима (content бывает строкой или списком частей)"""
+    content = chunk.content
+    if isinstance(content, str):
+        return content
+    return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+
+
+class IncrementalReviewsParser:
+    """Инкрементальный разбор массива "reviews" из потока JSON.
+
+    Каждый вызов feed() возвращает объекты массива, закрывающая скобка
+    которых уже пришла, не дожидаясь конца ответа: {"review_id": int,
+    "categories": list[str]}. Markdown-обёртка и текст вокруг JSON
+    пропускаются.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = ""
+        self._position = 0
+        self._array_started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object_start = 0
+        self._finished = False
+
+    def feed(self, text: str) -> list[dict]:
+        """Добавить фрагмент ответа
+
+        Args:
+            text (str): Очередной фрагмент текста модели
+
+        Returns:
+            list[dict]: Завершённые элементы массива reviews
+
+        Raises:
+            ValueError: Завершённый элемент не является корректным JSON
+                или в нём нет review_id и списка categories
+        """
+        self._buffer += text
+        items: list[dict] = []
+
+        if not self._array_started:
+            match = re.search(r'"reviews"\s*:\s*\[', self._buffer)
+            if not match:
+                return items
+            self._array_started = True
+            self._position = match.end()
+
+        while self._position < len(self._buffer) and not self._finished:
+            char = self._buffer[self._position]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                if self._depth == 0:
+                    self._object_start = self._position
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    items.append(self._review(self._buffer[self._object_start : self._position + 1]))
+            elif char == "]" and self._depth == 0:
+                self._finished = True
+
+            self._position += 1
+
+        return items
+
+    def close(self) -> list[dict]:
+        """Конец потока: объекты отдаются сразу в feed(), здесь ничего не остаётся"""
+        return []
+
+    @staticmethod
+    def _review(text: str) -> dict:
+        """Проверить элемент массива так же строго, как parse_review_categories"""
+        try:
+            review = json.loads(text)
+            categories = review["categories"]
+            if not isinstance(categories, list) or not all(isinstance(category, str) for category in categories):
+                raise TypeError(f"categories должен быть списком строк: {categories!r}")
+            return {"review_id": int(review["review_id"]), "categories": categories}
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Ошибка парсинга элемента стрима категорий: {e!r}") from e
+
+
+def normalize_categories(categories: list[str]) -> list[str]:
+    """Нормализовать названия категорий из ответа модели"""
+    return [category.title().strip() for category in categories]
+
+
+def reviews_by_id(data: dict) -> dict[int, dict]:
+    """Ответы модели по review_id
+
+    Повторный review_id игнорируется: используется первый ответ.
+
+    Args:
+        data (dict): Разобранный JSON с ключом "reviews"
+
+    Returns:
+        dict[int, dict]: Ответ по каждому review_id
+    """
+    by_id = {}
+    for review in data["reviews"]:
+        review_id = int(review["review_id"])
+        if review_id in by_id:
+            print(f"Модель вернула review_id={review_id} повторно, используется первый ответ")
+            continue
+        by_id[review_id] = review
+    return by_id
+
+
+def normalize_sentiment(sentiment: str) -> str:
+    """Нормализовать тональность; неизвестные значения считаются нейтральными"""
+    sentiment_normalized = sentiment.lower().strip()
+    if sentiment_normalized not in ["положительно", "нейтрально", "отрицательно"]:
+        sentiment_normalized = "нейтрально"
+    return sentiment_normalized
+
+
+def parse_review_categories(response: AIMessage) -> dict[int, list[str]]:
+    """Парсинг ответа модели в категории для каждого отзыва
 
     Args:
         response (AIMessage): Ответ модели
 
     Returns:
-        list[list[str]]: Список категорий для каждого отзыва
+        dict[int, list[str]]: Категории по review_id
 
     Raises:
         ValueError: Код 400 - Если не удалось распарсить ответ
@@ -165,28 +933,24 @@ def parse_review_categories(response: AIMessage) -> list[list[str]]:
     try:
         content = clean_json_response(response)
         data = json.loads(content)
-        reviews = data["reviews"]
-        reviews.sort(key=lambda x: x["review_id"])
 
-        reviews_categories = []
-        for review in reviews:
-            categories = review["categories"]
-            categories_normalized = [category.title().strip() for category in categories]
-            reviews_categories.append(categories_normalized)
-        return reviews_categories
+        return {
+            review_id: normalize_categories(review["categories"])
+            for review_id, review in reviews_by_id(data).items()
+        }
 
     except Exception as e:
         raise ValueError(f"Ошибка парсинга ответа модели в категории: {e}") from e
 
 
-def parse_review_sentiments(response: AIMessage) -> list[dict[str, str]]:
-    """Парсинг ответа модели в список тональностей для каждого отзыва
+def parse_review_sentiments(response: AIMessage) -> dict[int, dict[str, str]]:
+    """Парсинг ответа модели в тональности для каждого отзыва
 
     Args:
         response (AIMessage): Ответ модели
 
     Returns:
-        list[dict[str, str]]: Список словарей {категория: тональность} для каждого отзыва
+        dict[int, dict[str, str]]: Словари {категория: тональность} по review_id
 
     Raises:
         ValueError: Код 400 - Если не удалось распарсить ответ
@@ -194,29 +958,295 @@ def parse_review_sentiments(response: AIMessage) -> list[dict[str, str]]:
     try:
         content = clean_json_response(response)
         data = json.loads(content)
-        reviews = data["reviews"]
-        reviews.sort(key=lambda x: x["review_id"])
 
-        reviews_sentiments = []
-        for review in reviews:
-            sentiments = review["sentiments"]
+        return {
+            review_id: {
+                category: normalize_sentiment(sentiment) for category, sentiment in review["sentiments"].items()
+            }
+            for review_id, review in reviews_by_id(data).items()
+        }
+
+    except Exception as e:
+        raise ValueError(f"Ошибка парсинга ответа модели в тональности: {e}") from e
+
 
-            normalized_sentiments = {}
-            for category, sentiment in sentiments.items():
-                sentiment_normalized = sentiment.lower().strip()
+def parse_review_combined(response: AIMessage) -> dict[int, tuple[list[str], dict[str, str]]]:
+    """Парсинг ответа модели с категориями и тональностями за один вызов
 
-                if sentiment_normalized not in ["положительно", "нейтрально", "отрицательно"]:
-                    sentiment_normalized = "нейтрально"
+    Args:
+        response (AIMessage): Ответ модели
 
-                normalized_sentiments[category] = sentiment_normalized
+    Returns:
+        dict[int, tuple[list[str], dict[str, str]]]: Категории и словарь {категория: тональность} по review_id
 
-            reviews_sentiments.append(normalized_sentiments)
+    Raises:
+        ValueError: Код 400 - Если не удалось распарсить ответ
+    """
+    try:
+        content = clean_json_response(response)
+        data = json.loads(content)
 
-        return reviews_sentiments
+        parsed = {}
+        for review_id, review in reviews_by_id(data).items():
+            sentiments = {
+                category.title().strip(): normalize_sentiment(sentiment)
+                for category, sentiment in review["sentiments"].items()
+            }
+            parsed[review_id] = (list(sentiments), sentiments)
+        return parsed
 
     except Exception as e:
-        raise ValueError(f"Ошибка парсинга ответа модели в тональности: {e}") from e
+        raise ValueError(f"Ошибка парсинга ответа модели в категории и тональности: {e}") from e
+
+
+# Коды тональностей компактного формата ответа
+SENTIMENT_CODES = {"п": "положительно", "н": "нейтрально", "о": "отрицательно"}
+
+_COMPACT_LINE = re.compile(r"^\s*\[?(\d+)\]?\s*[:\-–—]\s*(.*?)\s*$")
+_COMPACT_SENTIMENT = re.compile(r"(\d+)\s*([^\d\s,;]+)")
+
+
+def format_categories_numbered(categories: list[str]) -> str:
+    """Список категорий с номерами для компактного формата: "1. Категория" на строку"""
+    return "\n".join(f"{i}. {category}" for i, category in enumerate(categories, 1))
+
+
+def category_numbers(categories: list[str], available_categories: list[str]) -> list[str]:
+    """Номера категорий в списке available_categories (без учёта регистра)
+
+    Категория не из списка остаётся названием.
+    """
+    index = {category.casefold(): i for i, category in enumerate(available_categories, 1)}
+    return [str(index.get(category.casefold(), category)) for category in categories]
+
+
+def _category_by_number(number: str, available_categories: list[str]) -> str | None:
+    position = int(number)
+    if 1 <= position <= len(available_categories):
+        return available_categories[position - 1]
+    print(f"Модель вернула несуществующий номер категории: {position}")
+    return None
+
+
+def decode_compact_categories(value: str, available_categories: list[str]) -> list[str]:
+    """Номера категорий через запятую в названия (как в JSON-формате)
+
+    Args:
+        value (str): Например "3,7"
+        available_categories (list[str]): Категории в порядке нумерации промпта
+
+    Returns:
+        list[str]: Нормализованные названия без повторов
+    """
+    categories = []
+    for number in re.findall(r"\d+", value):
+        category = _category_by_number(number, available_categories)
+        if category is not None and category not in categories:
+            categories.append(category)
+    return normalize_categories(categories)
+
+
+def decode_compact_sentiments(value: str, available_categories: list[str]) -> dict[str, str]:
+    """Пары "номер категории + код тональности" в словарь {категория: тональность}
+
+    Args:
+        value (str): Например "3п,7о"
+        available_categories (list[str]): Категории в порядке нумерации промпта
+
+    Returns:
+        dict[str, str]: Тональность по нормализованному названию категории
+    """
+    sentiments = {}
+    for number, code in _COMPACT_SENTIMENT.findall(value):
+        category = _category_by_number(number, available_categories)
+        if category is None:
+            continue
+        code = code.lower()
+        sentiment = SENTIMENT_CODES.get(code[0], normalize_sentiment(code))
+        sentiments.setdefault(normalize_categories([category])[0], sentiment)
+    return sentiments
+
+
+def compact_lines(text: str) -> dict[int, str]:
+    """Строки компактного ответа по review_id
+
+    Повторный review_id игнорируется: используется первая строка.
+    Строки не в формате "review_id: ..." пропускаются.
+
+    Args:
+        text (str): Текст ответа модели
+
+    Returns:
+        dict[int, str]: Значение после двоеточия по review_id
+    """
+    by_id = {}
+    for line in re.sub(r"```\w*", "", text).splitlines():
+        match = _COMPACT_LINE.match(line)
+        if match is None:
+            continue
+        review_id = int(match.group(1))
+        if review_id in by_id:
+            print(f"Модель вернула review_id={review_id} повторно, используется первый ответ")
+            continue
+        by_id[review_id] = match.group(2)
+    return by_id
+
+
+def _parse_compact(response: AIMessage, decode: Callable[[str], T], what: str) -> dict[int, T]:
+    try:
+        lines = compact_lines(chunk_text(response))
+        if not lines:
+            raise ValueError("в ответе нет строк вида \"review_id: ...\"")
+        return {review_id: decode(value) for review_id, value in lines.items()}
+    except Exception as e:
+        raise ValueError(f"Ошибка парсинга компактного ответа модели в {what}: {e}") from e
+
+
+def parse_compact_categories(response: AIMessage, available_categories: list[str]) -> dict[int, list[str]]:
+    """Парсинг компактного ответа "review_id: номера категорий"
+
+    Args:
+        response (AIMessage): Ответ модели
+        available_categories (list[str]): Категории в порядке нумерации промпта
+
+    Returns:
+        dict[int, list[str]]: Категории по review_id
+
+    Raises:
+        ValueError: Если не удалось распарсить ответ
+    """
+    return _parse_compact(
+        response, lambda value: decode_compact_categories(value, available_categories), "категории"
+    )
+
+
+def parse_compact_sentiments(response: AIMessage, available_categories: list[str]) -> dict[int, dict[str, str]]:
+    """Парсинг компактного ответа "review_id: номер категории + код тональности, ..."
+
+    Args:
+        response (AIMessage): Ответ модели
+        available_categories (list[str]): Категории в порядке нумерации промпта
+
+    Returns:
+        dict[int, dict[str, str]]: Словари {категория: тональность} по review_id
+
+    Raises:
+        ValueError: Если не удалось распарсить ответ
+    """
+    return _parse_compact(
+        response, lambda value: decode_compact_sentiments(value, available_categories), "тональности"
+    )
+
+
+def parse_compact_combined(
+    response: AIMessage, available_categories: list[str]
+) -> dict[int, tuple[list[str], dict[str, str]]]:
+    """Парсинг компактного ответа с категориями и тональностями за один вызов
+
+    Args:
+        response (AIMessage): Ответ модели
+        available_categories (list[str]): Категории в порядке нумерации промпта
+
+    Returns:
+        dict[int, tuple[list[str], dict[str, str]]]: Категории и словарь {категория: тональность} по review_id
+
+    Raises:
+        ValueError: Если не удалось распарсить ответ
+    """
+
+    def decode(value: str) -> tuple[list[str], dict[str, str]]:
+        sentiments = decode_compact_sentiments(value, available_categories)
+        return list(sentiments), sentiments
+
+    return _parse_compact(response, decode, "категории и тональности")
+
+
+class IncrementalCompactParser:
+    """Инкрементальный разбор компактного ответа с категориями.
+
+    feed() возвращает отзывы, строка которых уже закончилась, в том же
+    виде, что IncrementalReviewsParser: {"review_id", "categories"}.
+    Последняя строка без перевода строки отдаётся в close().
+    """
+
+    def __init__(self, available_categories: list[str]) -> None:
+        self._available_categories = available_categories
+        self._buffer = ""
+        self._seen: set[int] = set()
+
+    def _parse(self, lines: list[str]) -> list[dict]:
+        items = []
+        for review_id, value in compact_lines("\n".join(lines)).items():
+            if review_id in self._seen:
+                continue
+            self._seen.add(review_id)
+            items.append(
+                {
+                    "review_id": review_id,
+                    "categories": decode_compact_categories(value, self._available_categories),
+                }
+            )
+        return items
+
+    def feed(self, text: str) -> list[dict]:
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        return self._parse(lines)
+
+    def close(self) -> list[dict]:
+        lines, self._buffer = [self._buffer], ""
+        return self._parse(lines)
+
+
+# Синглтон клиента: создаётся при первой классификации, а не при импорте
+_llm_instance: LLM | None = None
+
+# Результат последней проверки доступности модели
+_llm_readiness: dict[str, Any] = {"status": "pending", "error": None, "backends": {}, "checked_at": None}
+
+
+def get_llm() -> LLM:
+    """Получить синглтон клиента модели
+
+    Returns:
+        LLM: Клиент модели
+
+    Raises:
+        RuntimeError: Клиент не удалось создать (например, не задан ключ)
+    """
+    global _llm_instance
+    if _llm_instance is None:
+        _llm_instance = LLM()
+    return _llm_instance
+
+
+async def probe_llm() -> dict[str, Any]:
+    """Проверить доступность бэкендов модели и запомнить результат
+
+    Returns:
+        dict[str, Any]: Состояние модели: status ("ready", если ответил хотя бы
+        один бэкенд, иначе "unavailable"), error, backends, checked_at
+    """
+    try:
+        backends = await get_llm().probe()
+    except RuntimeError as e:
+        print(f"Модель недоступна: {e}")
+        _llm_readiness.update(status="unavailable", error=str(e).splitlines()[0], backends={})
+    else:
+        if "ready" in backends.values():
+            _llm_readiness.update(status="ready", error=None, backends=backends)
+        else:
+            print(f"Ни один бэкенд модели не ответил: {backends}")
+            _llm_readiness.update(status="unavailable", error="Ни один бэкенд модели не ответил", backends=backends)
+    _llm_readiness["checked_at"] = time.time()
+    return get_llm_readiness()
+
+
+def get_llm_readiness() -> dict[str, Any]:
+    """Результат последней проверки модели ("pending", пока проверки не было)"""
+    return dict(_llm_readiness)
 
 
-# Синглтон
-llm = LLM()
\ No newline at end of file
+def get_llm_stats() -> dict[str, Any]:
+    """Состояние пула модели (пусто, пока клиент не создан)"""
+    return _llm_instance.stats() if _llm_instance is not None else {}
@@ -1,32 +1,153 @@
+import asyncio
 import json
+import time
 from pathlib import Path
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Callable
 
-from api.core.settings import DATABASE_URL
+from api.core.settings import DATABASE_URL, REPLICA_DATABASE_URL, settings
 from api.core.models import Base
 from api.core.db.review_crud import create_reviews_from_json_list
 
-engine = create_async_engine(DATABASE_URL, echo=True, future=True)
-async_session_maker = sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False
+# Запись (сидирование, загрузка отзывов) всегда идёт в primary
+write_engine = create_async_engine(
+    DATABASE_URL,
+    echo=True,
+    future=True,
+    pool_size=settings.DB_WRITE_POOL_SIZE,
+    max_overflow=settings.DB_WRITE_MAX_OVERFLOW,
+    pool_timeout=settings.DB_WRITE_POOL_TIMEOUT,
+    query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+    connect_args={"prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE},
+)
+write_session_maker = sessionmaker(
+    write_engine, class_=AsyncSession, expire_on_commit=False
+)
+
+# Аналитика читает из реплики, если она задана, иначе из primary,
+# но через отдельный пул — большая загрузка не отнимает соединения у дашборда
+read_engine = create_async_engine(
+    REPLICA_DATABASE_URL or DATABASE_URL,
+    echo=True,
+    future=True,
+    pool_size=settings.DB_READ_POOL_SIZE,
+    max_overflow=settings.DB_READ_MAX_OVERFLOW,
+    pool_timeout=settings.DB_READ_POOL_TIMEOUT,
+    pool_pre_ping=REPLICA_DATABASE_URL is not None,
+    query_cache_size=settings.DB_QUERY_CACHE_SIZE,
+    connect_args={"prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE},
+)
+read_session_maker = sessionmaker(
+    read_engine, class_=AsyncSession, expire_on_commit=False
 )
 
 JSON_PATH = Path(__file__).parent.parent / "transformed_reviews.json"
 
+REPLICA_LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+    """
+)
+
+# SQLSTATE query_canceled: statement_timeout или отмена запроса
+QUERY_CANCELED_SQLSTATE = "57014"
+
+_replica_lock = asyncio.Lock()
+_replica_checked_at = 0.0
+_replica_is_fresh = True
+
+
 async def init_db():
-    async with engine.begin() as conn:
+    async with write_engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
     if JSON_PATH.exists():
         with open(JSON_PATH, "r", encoding="utf-8") as f:
             reviews_data = json.load(f)
 
-        async with async_session_maker() as session:
+        async with write_session_maker() as session:
             await create_reviews_from_json_list(session, reviews_data)
 
 
-async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
-    async with async_session_maker() as session:
+async def replica_is_fresh() -> bool:
+    """
+    Проверка отставания реплики (результат кэшируется на
+    DB_REPLICA_LAG_CHECK_INTERVAL секунд). Недоступная реплика считается
+    отставшей.
+    """
+    global _replica_checked_at, _replica_is_fresh
+
+    if REPLICA_DATABASE_URL is None:
+        return True
+
+    if time.monotonic() - _replica_checked_at < settings.DB_REPLICA_LAG_CHECK_INTERVAL:
+        return _replica_is_fresh
+
+    async with _replica_lock:
+        # Пока ждали блокировку, проверку мог выполнить другой запрос
+        if time.monotonic() - _replica_checked_at < settings.DB_REPLICA_LAG_CHECK_INTERVAL:
+            return _replica_is_fresh
+
+        try:
+            async with read_engine.connect() as conn:
+                lag = await conn.scalar(REPLICA_LAG_QUERY)
+            _replica_is_fresh = lag is None or float(lag) <= settings.DB_REPLICA_MAX_LAG_SECONDS
+            if not _replica_is_fresh:
+                print(f"Реплика отстаёт на {float(lag):.1f} с, чтение переключено на primary")
+        except Exception as e:
+            print(f"Реплика недоступна, чтение переключено на primary: {e}")
+            _replica_is_fresh = False
+
+        _replica_checked_at = time.monotonic()
+        return _replica_is_fresh
+
+
+async def get_write_session() -> AsyncGenerator[AsyncSession, None]:
+    async with write_session_maker() as session:
+        yield session
+
+
+async def _get_read_session_maker() -> sessionmaker:
+    return read_session_maker if await replica_is_fresh() else write_session_maker
+
+
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    session_maker = await _get_read_session_maker()
+    async with session_maker() as session:
         yield session
+
+
+def get_read_session_with_timeout(
+    timeout_ms: int,
+) -> Callable[[], AsyncGenerator[AsyncSession, None]]:
+    """
+    Зависимость FastAPI: сессия на чтение с statement_timeout на время
+    транзакции запроса. Postgres сам прервёт слишком долгую агрегацию
+    и освободит соединение.
+    """
+
+    async def get_session() -> AsyncGenerator[AsyncSession, None]:
+        session_maker = await _get_read_session_maker()
+        async with session_maker() as session:
+            await session.execute(
+                select(func.set_config("statement_timeout", str(timeout_ms), True))
+            )
+            yield session
+
+    return get_session
+
+
+def is_database_timeout(error: Exception) -> bool:
+    """Запрос прерван по statement_timeout или не дождался соединения из пула"""
+    if isinstance(error, PoolTimeoutError):
+        return True
+    if isinstance(error, DBAPIError):
+        return getattr(error.orig, "sqlstate", None) == QUERY_CANCELED_SQLSTATE
+    return False
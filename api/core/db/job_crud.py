@@ -0,0 +1,193 @@
+import uuid
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.core.models import ClassificationJob, ClassificationJobItem, JobStatus
+
+
+async def create_job(session: AsyncSession, reviews: List[Dict[str, Any]]) -> ClassificationJob:
+    """
+    Сохранить задачу и её отзывы одной транзакцией.
+    reviews — словари с ключами id, text и rating в порядке запроса.
+    """
+    job = ClassificationJob(
+        id=str(uuid.uuid4()),
+        status=JobStatus.QUEUED.value,
+        total=len(reviews),
+        completed=0,
+    )
+    session.add(job)
+    await session.flush()
+
+    await session.execute(
+        ClassificationJobItem.__table__.insert(),
+        [
+            {
+                "job_id": job.id,
+                "position": position,
+                "review_id": review["id"],
+                "text": review["text"],
+                "rating": review.get("rating"),
+            }
+            for position, review in enumerate(reviews)
+        ],
+    )
+    await session.commit()
+    await session.refresh(job)
+    return job
+
+
+async def get_job(session: AsyncSession, job_id: str) -> Optional[ClassificationJob]:
+    result = await session.execute(select(ClassificationJob).where(ClassificationJob.id == job_id))
+    return result.scalar_one_or_none()
+
+
+async def get_job_items(
+    session: AsyncSession, job_id: str, offset: int, limit: int
+) -> List[ClassificationJobItem]:
+    """
+    Страница отзывов задачи по позициям [offset, offset + limit).
+    """
+    result = await session.execute(
+        select(ClassificationJobItem)
+        .where(
+            ClassificationJobItem.job_id == job_id,
+            ClassificationJobItem.position >= offset,
+            ClassificationJobItem.position < offset + limit,
+        )
+        .order_by(ClassificationJobItem.position)
+    )
+    return result.scalars().all()
+
+
+async def claim_next_job(session: AsyncSession, lease_seconds: int) -> Optional[str]:
+    """
+    Захватить самую старую задачу в очереди или задачу, чей обработчик
+    перестал обновлять heartbeat. Параллельные обработчики не получат
+    одну задачу благодаря FOR UPDATE SKIP LOCKED.
+    """
+    candidate = (
+        select(ClassificationJob.id)
+        .where(
+            (ClassificationJob.status == JobStatus.QUEUED.value)
+            | (
+                (ClassificationJob.status == JobStatus.RUNNING.value)
+                & (ClassificationJob.heartbeat_at < func.now() - timedelta(seconds=lease_seconds))
+            )
+        )
+        .order_by(ClassificationJob.created_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    result = await session.execute(
+        update(ClassificationJob)
+        .where(ClassificationJob.id == candidate)
+        .values(status=JobStatus.RUNNING.value, heartbeat_at=func.now())
+        .returning(ClassificationJob.id)
+    )
+    job_id = result.scalar_one_or_none()
+    await session.commit()
+    return job_id
+
+
+async def get_pending_job_items(
+    session: AsyncSession, job_id: str, limit: int
+) -> List[tuple[int, int, str, int | None]]:
+    """
+    Необработанные отзывы задачи: (позиция, id отзыва, текст, оценка).
+    """
+    result = await session.execute(
+        select(
+            ClassificationJobItem.position,
+            ClassificationJobItem.review_id,
+            ClassificationJobItem.text,
+            ClassificationJobItem.rating,
+        )
+        .where(ClassificationJobItem.job_id == job_id, ClassificationJobItem.topics.is_(None))
+        .order_by(ClassificationJobItem.position)
+        .limit(limit)
+    )
+    return [tuple(row) for row in result.all()]
+
+
+async def save_job_results(
+    session: AsyncSession, job_id: str, results: List[tuple[int, list[str], list[str], str | None]]
+) -> int:
+    """
+    Сохранить результаты батча и продвинуть прогресс задачи.
+    results — кортежи (позиция, темы, тональности, ошибка).
+    Записываются только ещё не обработанные отзывы: строки блокируются
+    FOR UPDATE, поэтому обработчик, потерявший аренду задачи, не перезапишет
+    результаты другого и не посчитает их повторно.
+    Возвращает количество сохранённых отзывов.
+    """
+    by_position = {position: (topics, sentiments, error) for position, topics, sentiments, error in results}
+    pending = await session.execute(
+        select(ClassificationJobItem.position)
+        .where(
+            ClassificationJobItem.job_id == job_id,
+            ClassificationJobItem.position.in_(list(by_position)),
+            ClassificationJobItem.topics.is_(None),
+        )
+        .with_for_update()
+    )
+    positions = pending.scalars().all()
+
+    if positions:
+        await session.execute(
+            update(ClassificationJobItem),
+            [
+                {
+                    "job_id": job_id,
+                    "position": position,
+                    "topics": by_position[position][0],
+                    "sentiments": by_position[position][1],
+                    "error": by_position[position][2],
+                }
+                for position in positions
+            ],
+        )
+    await session.execute(
+        update(ClassificationJob)
+        .where(ClassificationJob.id == job_id)
+        .values(completed=ClassificationJob.completed + len(positions), heartbeat_at=func.now())
+    )
+    await session.commit()
+    return len(positions)
+
+
+async def touch_job(session: AsyncSession, job_id: str) -> None:
+    """
+    Продлить аренду задачи, пока обработчик ещё работает над ней.
+    """
+    await session.execute(
+        update(ClassificationJob)
+        .where(ClassificationJob.id == job_id, ClassificationJob.status == JobStatus.RUNNING.value)
+        .values(heartbeat_at=func.now())
+    )
+    await session.commit()
+
+
+async def finish_job(session: AsyncSession, job_id: str, status: JobStatus, error: str | None = None) -> None:
+    await session.execute(
+        update(ClassificationJob)
+        .where(ClassificationJob.id == job_id)
+        .values(status=status.value, error=error, heartbeat_at=func.now())
+    )
+    await session.commit()
+
+
+async def release_jobs(session: AsyncSession, job_ids: List[str]) -> None:
+    """
+    Вернуть незавершённые задачи в очередь (при остановке обработчика).
+    """
+    await session.execute(
+        update(ClassificationJob)
+        .where(ClassificationJob.id.in_(job_ids), ClassificationJob.status == JobStatus.RUNNING.value)
+        .values(status=JobStatus.QUEUED.value)
+    )
+    await session.commit()
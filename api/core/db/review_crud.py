@@ -1,10 +1,268 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, case
+from sqlalchemy import bindparam, select, func, case, or_, tuple_
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import selectinload
+from sqlalchemy.sql import Select
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import List, Optional, Dict, Any
 
-from api.core.models import Review, ReviewTopic, Sentiment, Topic
+from api.core.models import Review, ReviewTopic, Sentiment, StoredPrediction, Topic
+
+
+# Аналитические запросы строятся один раз на каждую комбинацию структурных
+# параметров (шкала деления, число окон) и дальше переиспользуются: даты,
+# темы и лимиты передаются через bindparam. Один и тот же объект запроса
+# попадает в кэш компиляции SQLAlchemy и в кэш prepared statements asyncpg,
+# поэтому на каждый HTTP-запрос не тратится время на сборку и компиляцию SQL.
+
+TRUNC_UNITS = {
+    "all:month": "month",
+    "month:day": "day",
+    "days:day": "day",
+    "halfyear:week": "week",
+}
+
+
+def _trunc_unit(mode: str) -> str:
+    try:
+        return TRUNC_UNITS[mode]
+    except KeyError:
+        raise ValueError(f"Unsupported mode: {mode}") from None
+
+
+def _in_interval(start_key: str = "start_date", end_key: str = "end_date"):
+    return Review.date.between(bindparam(start_key), bindparam(end_key))
+
+
+@lru_cache(maxsize=None)
+def _reviews_stats_query(unit: str) -> Select:
+    trunc_func = func.date_trunc(unit, Review.date)
+    return (
+        select(
+            trunc_func.label("period"),
+            func.count(Review.id).label("count"),
+        )
+        .where(Review.date >= bindparam("start_date"), Review.date <= bindparam("end_date"))
+        .group_by(trunc_func)
+        .order_by("period")
+    )
+
+
+@lru_cache(maxsize=None)
+def _dashboard_queries() -> Dict[str, Select]:
+    return {
+        "total_reviews": select(func.count(Review.id)).where(_in_interval()),
+        "avg_rating": select(func.avg(Review.rating)).where(
+            _in_interval(),
+            Review.rating.isnot(None),
+        ),
+        "rating_distribution": (
+            select(Review.rating, func.count(Review.id))
+            .where(_in_interval())
+            .group_by(Review.rating)
+            .order_by(Review.rating)
+        ),
+        "sentiment_overall": (
+            select(
+                ReviewTopic.sentiment,
+                func.count(ReviewTopic.review_id)
+            )
+            .select_from(ReviewTopic)
+            .join(Review, ReviewTopic.review_id == Review.id)
+            .where(Review.date >= bindparam("start_date"), Review.date <= bindparam("end_date"))
+            .group_by(ReviewTopic.sentiment)
+        ),
+        "popular_topics": (
+            select(Topic.name, func.count(ReviewTopic.review_id))
+            .select_from(ReviewTopic)
+            .join(Review)
+            .join(Topic)
+            .where(_in_interval())
+            .group_by(Topic.name)
+            .order_by(func.count(ReviewTopic.review_id).desc())
+        ),
+        "problem_topics": (
+            select(Topic.name, func.count(ReviewTopic.review_id))
+            .select_from(ReviewTopic)
+            .join(Review)
+            .join(Topic)
+            .where(
+                _in_interval(),
+                ReviewTopic.sentiment == Sentiment.NEGATIVE
+            )
+            .group_by(Topic.name)
+            .order_by(func.count(ReviewTopic.review_id).desc())
+        ),
+    }
+
+
+@lru_cache(maxsize=None)
+def _top_topics_query() -> Select:
+    return (
+        select(Topic.name)
+        .select_from(ReviewTopic)
+        .join(Review)
+        .join(Topic)
+        .where(_in_interval())
+        .group_by(Topic.name)
+        .order_by(func.count(ReviewTopic.review_id).desc())
+        .limit(bindparam("topic_limit"))
+    )
+
+
+@lru_cache(maxsize=None)
+def _topic_trends_query(unit: str) -> Select:
+    trunc_func = func.date_trunc(unit, Review.date)
+    return (
+        select(
+            trunc_func.label("period"),
+            Topic.name.label("topic"),
+            func.count(ReviewTopic.review_id).label("count"),
+            func.avg(
+                case(
+                    (ReviewTopic.sentiment == Sentiment.POSITIVE, 1),
+                    (ReviewTopic.sentiment == Sentiment.NEGATIVE, -1),
+                    else_=0
+                )
+            ).label("sentiment_score")
+        )
+        .select_from(ReviewTopic)
+        .join(Review)
+        .join(Topic)
+        .where(
+            _in_interval(),
+            Topic.name.in_(bindparam("topic_names", expanding=True))
+        )
+        .group_by(trunc_func, Topic.name)
+        .order_by(trunc_func, Topic.name)
+    )
+
+
+@lru_cache(maxsize=None)
+def _sentiment_dynamics_query(unit: str) -> Select:
+    trunc_func = func.date_trunc(unit, Review.date)
+    return (
+        select(
+            trunc_func.label("period"),
+            ReviewTopic.sentiment,
+            func.count(ReviewTopic.review_id).label("count")
+        )
+        .select_from(ReviewTopic)
+        .join(Review)
+        .where(_in_interval())
+        .group_by(trunc_func, ReviewTopic.sentiment)
+        .order_by(trunc_func)
+    )
+
+
+@lru_cache(maxsize=None)
+def _topics_statistics_query(unit: str) -> Select:
+    trunc_func = func.date_trunc(unit, Review.date)
+    return (
+        select(
+            trunc_func.label("period"),
+            Topic.name.label("topic_name"),
+            ReviewTopic.sentiment,
+            func.count(ReviewTopic.review_id).label("count"),
+            func.avg(Review.rating).label("avg_rating")
+        )
+        .select_from(ReviewTopic)
+        .join(Review, ReviewTopic.review_id == Review.id)
+        .join(Topic, ReviewTopic.topic_id == Topic.id)
+        .where(
+            _in_interval(),
+            Topic.name.in_(bindparam("topic_names", expanding=True))
+        )
+        .group_by(trunc_func, Topic.name, ReviewTopic.sentiment)
+        .order_by(trunc_func, Topic.name, ReviewTopic.sentiment)
+    )
+
+
+@lru_cache(maxsize=None)
+def _topics_comparison_query() -> Select:
+    return (
+        select(
+            Topic.name.label("topic_name"),
+            ReviewTopic.sentiment,
+            func.count(ReviewTopic.review_id).label("count"),
+            func.avg(Review.rating).label("avg_rating"),
+            func.min(Review.date).label("first_mention"),
+            func.max(Review.date).label("last_mention")
+        )
+        .select_from(ReviewTopic)
+        .join(Review, ReviewTopic.review_id == Review.id)
+        .join(Topic, ReviewTopic.topic_id == Topic.id)
+        .where(
+            _in_interval(),
+            Topic.name.in_(bindparam("topic_names", expanding=True))
+        )
+        .group_by(Topic.name, ReviewTopic.sentiment)
+        .order_by(Topic.name, ReviewTopic.sentiment)
+    )
+
+
+@lru_cache(maxsize=None)
+def _multi_interval_query(window_count: int, filter_topics: bool) -> Select:
+    window_columns = []
+    for idx in range(window_count):
+        in_window = _in_interval(f"start_date_{idx}", f"end_date_{idx}")
+        window_columns.extend(
+            [
+                func.count(case((in_window, ReviewTopic.review_id))).label(f"count_{idx}"),
+                func.sum(case((in_window, Review.rating))).label(f"rating_sum_{idx}"),
+                func.count(case((in_window, Review.rating))).label(f"rating_count_{idx}"),
+            ]
+        )
+
+    query = (
+        select(
+            Topic.name.label("topic_name"),
+            ReviewTopic.sentiment,
+            *window_columns,
+        )
+        .select_from(ReviewTopic)
+        .join(Review, ReviewTopic.review_id == Review.id)
+        .join(Topic, ReviewTopic.topic_id == Topic.id)
+        .where(
+            or_(
+                *[
+                    _in_interval(f"start_date_{idx}", f"end_date_{idx}")
+                    for idx in range(window_count)
+                ]
+            )
+        )
+        .group_by(Topic.name, ReviewTopic.sentiment)
+        .order_by(Topic.name, ReviewTopic.sentiment)
+    )
+    if filter_topics:
+        query = query.where(Topic.name.in_(bindparam("topic_names", expanding=True)))
+    return query
+
+
+@lru_cache(maxsize=None)
+def _topic_detail_query(unit: str) -> Select:
+    trunc_func = func.date_trunc(unit, Review.date)
+    return (
+        select(
+            trunc_func.label("period"),
+            ReviewTopic.sentiment,
+            func.count(ReviewTopic.review_id).label("count"),
+            func.avg(Review.rating).label("avg_rating"),
+            func.min(Review.date).label("first_mention"),
+            func.max(Review.date).label("last_mention"),
+            func.grouping(trunc_func).label("period_grouped"),
+            func.grouping(ReviewTopic.sentiment).label("sentiment_grouped"),
+        )
+        .select_from(ReviewTopic)
+        .join(Review, ReviewTopic.review_id == Review.id)
+        .join(Topic, ReviewTopic.topic_id == Topic.id)
+        .where(
+            _in_interval(),
+            Topic.name == bindparam("topic_name"),
+        )
+        .group_by(func.rollup(ReviewTopic.sentiment, trunc_func))
+    )
 
 
 async def get_reviews_by_interval(
@@ -28,6 +286,106 @@ async def get_review_by_id(session: AsyncSession, review_id: int) -> Optional[Re
     return result.scalar_one_or_none()
 
 
+async def get_labeled_reviews(
+    session: AsyncSession, limit: int
+) -> List[tuple[int, str, list[str], list[str]]]:
+    """
+    Последние размеченные отзывы: (id, текст, темы, тональности).
+    Используется для построения индекса почти-дубликатов.
+    """
+    latest_ids = (
+        select(Review.id).order_by(Review.id.desc()).limit(limit).scalar_subquery()
+    )
+    result = await session.execute(
+        select(Review.id, Review.text, Topic.name, ReviewTopic.sentiment)
+        .join(ReviewTopic, ReviewTopic.review_id == Review.id)
+        .join(Topic, Topic.id == ReviewTopic.topic_id)
+        .where(Review.id.in_(latest_ids))
+        .order_by(Review.id, Topic.name)
+    )
+
+    labeled: Dict[int, tuple[int, str, list[str], list[str]]] = {}
+    for review_id, text, topic_name, sentiment in result.all():
+        entry = labeled.setdefault(review_id, (review_id, text, [], []))
+        entry[2].append(topic_name)
+        entry[3].append(sentiment.value)
+    return list(labeled.values())
+
+
+async def get_rating_sentiment_counts(
+    session: AsyncSession,
+) -> List[tuple[int, str, int]]:
+    """
+    Распределение тональностей по оценкам для отзывов ровно с одной темой:
+    (оценка, тональность, количество).
+    """
+    single_topic = (
+        select(ReviewTopic.review_id)
+        .group_by(ReviewTopic.review_id)
+        .having(func.count() == 1)
+    )
+    result = await session.execute(
+        select(Review.rating, ReviewTopic.sentiment, func.count())
+        .join(ReviewTopic, ReviewTopic.review_id == Review.id)
+        .where(Review.rating.is_not(None), Review.id.in_(single_topic))
+        .group_by(Review.rating, ReviewTopic.sentiment)
+    )
+    return [(rating, sentiment.value, count) for rating, sentiment, count in result.all()]
+
+
+async def get_stored_classifications(
+    session: AsyncSession, keys: List[tuple[int, str]]
+) -> Dict[tuple[int, str], tuple[list[str], list[str]]]:
+    """
+    Сохранённые предсказания по (id отзыва клиента, хэш текста) одним запросом:
+    ключ -> (темы, тональности).
+    """
+    if not keys:
+        return {}
+
+    result = await session.execute(
+        select(
+            StoredPrediction.review_id,
+            StoredPrediction.text_hash,
+            StoredPrediction.topics,
+            StoredPrediction.sentiments,
+        ).where(tuple_(StoredPrediction.review_id, StoredPrediction.text_hash).in_(keys))
+    )
+    return {
+        (review_id, text_hash): (topics, sentiments)
+        for review_id, text_hash, topics, sentiments in result.all()
+    }
+
+
+async def save_classifications(
+    session: AsyncSession, classifications: List[tuple[int, str, list[str], list[str]]]
+) -> None:
+    """
+    Пакетно сохранить предсказания: (id отзыва клиента, хэш текста, темы, тональности).
+    Уже сохранённые ключи не перезаписываются. Таблицы reviews и
+    review_topics не затрагиваются. Commits immediately.
+    """
+    if not classifications:
+        return
+
+    # Повторный ключ в одном запросе: берём последний результат
+    rows = {
+        (review_id, text_hash): (topics, sentiments)
+        for review_id, text_hash, topics, sentiments in classifications
+    }
+    await session.execute(
+        insert(StoredPrediction)
+        .values(
+            [
+                {"review_id": review_id, "text_hash": text_hash, "topics": topics, "sentiments": sentiments}
+                for (review_id, text_hash), (topics, sentiments) in rows.items()
+            ]
+        )
+        .on_conflict_do_nothing(index_elements=[StoredPrediction.review_id, StoredPrediction.text_hash])
+    )
+    await session.commit()
+
+
 async def create_review(
     session: AsyncSession,
     review_id: int,
@@ -114,27 +472,12 @@ async def get_reviews_stats(
     if end_date <= start_date:
         raise ValueError("end_date должен быть больше start_date")
 
-    # Построение запроса в зависимости от режима
-    if mode == "all:month":
-        trunc_func = func.date_trunc("month", Review.date)
-    elif mode in ("month:day", "days:day"):
-        trunc_func = func.date_trunc("day", Review.date)
-    elif mode == "halfyear:week":
-        trunc_func = func.date_trunc("week", Review.date)
-    else:
-        raise ValueError(f"Unsupported mode: {mode}")
+    # Запрос выбирается по шкале деления
+    query = _reviews_stats_query(_trunc_unit(mode))
 
-    query = (
-        select(
-            trunc_func.label("period"),
-            func.count(Review.id).label("count"),
-        )
-        .where(Review.date >= start_date, Review.date <= end_date)
-        .group_by(trunc_func)
-        .order_by("period")
+    result = await session.execute(
+        query, {"start_date": start_date, "end_date": end_date}
     )
-
-    result = await session.execute(query)
     rows = result.all()
 
     # Форматирование результата
@@ -181,66 +524,25 @@ async def get_dashboard_stats(
     """
     Комплексная статистика для дашборда по интервалам
     """
+    queries = _dashboard_queries()
+    params = {"start_date": start_date, "end_date": end_date}
+
     # Базовые метрики
-    total_reviews = await session.scalar(
-        select(func.count(Review.id)).where(
-            Review.date.between(start_date, end_date)
-        )
-    )
-    
-    avg_rating = await session.scalar(
-        select(func.avg(Review.rating)).where(
-            Review.date.between(start_date, end_date),
-            Review.rating.isnot(None)
-        )
-    )
+    total_reviews = await session.scalar(queries["total_reviews"], params)
+    avg_rating = await session.scalar(queries["avg_rating"], params)
 
     # Распределение рейтингов
-    rating_dist = await session.execute(
-        select(Review.rating, func.count(Review.id))
-        .where(Review.date.between(start_date, end_date))
-        .group_by(Review.rating)
-        .order_by(Review.rating)
-    )
-    
+    rating_dist = (await session.execute(queries["rating_distribution"], params)).all()
+
     # Общая тональность
-    sentiment_overall = await session.execute(
-        select(
-            ReviewTopic.sentiment,
-            func.count(ReviewTopic.review_id)
-        )
-        .select_from(ReviewTopic)  # Явно указываем основную таблицу
-        .join(Review, ReviewTopic.review_id == Review.id)  # Явное соединение
-        .where(Review.date >= start_date, Review.date <= end_date)
-        .group_by(ReviewTopic.sentiment)
-    )
-    
+    sentiment_overall = (await session.execute(queries["sentiment_overall"], params)).all()
+
     # Топ тем
-    popular_topics = await session.execute(
-        select(Topic.name, func.count(ReviewTopic.review_id))
-        .select_from(ReviewTopic)
-        .join(Review)
-        .join(Topic)
-        .where(Review.date.between(start_date, end_date))
-        .group_by(Topic.name)
-        .order_by(func.count(ReviewTopic.review_id).desc())
-    )
-    
+    popular_topics = (await session.execute(queries["popular_topics"], params)).all()
+
     # Проблемные темы (негативные)
-    problem_topics = await session.execute(
-        select(Topic.name, func.count(ReviewTopic.review_id))
-        .select_from(ReviewTopic)
-        .join(Review)
-        .join(Topic)
-        .where(
-            Review.date.between(start_date, end_date),
-            ReviewTopic.sentiment == Sentiment.NEGATIVE
-        )
-        .group_by(Topic.name)
-        .order_by(func.count(ReviewTopic.review_id).desc())
-    )
-   
-    
+    problem_topics = (await session.execute(queries["problem_topics"], params)).all()
+
     sentiment_counts = {s: c for s, c in sentiment_overall}
     total_mentions = sum(sentiment_counts.values())
     nps_score = 0
@@ -280,56 +582,19 @@ async def get_topic_trends(
     """
     Динамика топ-тем по интервалам
     """
-    if mode == "all:month":
-        trunc_func = func.date_trunc("month", Review.date)
-    elif mode in ("month:day", "days:day"):
-        trunc_func = func.date_trunc("day", Review.date)
-    elif mode == "halfyear:week":
-        trunc_func = func.date_trunc("week", Review.date)
-    else:
-        raise ValueError(f"Unsupported mode: {mode}")
+    unit = _trunc_unit(mode)
+    params = {"start_date": start_date, "end_date": end_date}
 
     # Получаем топ тем за весь период
-    top_topics_query = (
-        select(Topic.name)
-        .select_from(ReviewTopic)
-        .join(Review)
-        .join(Topic)
-        .where(Review.date.between(start_date, end_date))
-        .group_by(Topic.name)
-        .order_by(func.count(ReviewTopic.review_id).desc())
-        .limit(topic_limit)
+    top_topics_result = await session.execute(
+        _top_topics_query(), {**params, "topic_limit": topic_limit}
     )
-    
-    top_topics_result = await session.execute(top_topics_query)
     top_topics = [name for name, in top_topics_result]
 
     # Динамика по топ-темам
-    trends_query = (
-        select(
-            trunc_func.label("period"),
-            Topic.name.label("topic"),
-            func.count(ReviewTopic.review_id).label("count"),
-            func.avg(
-                case(
-                    (ReviewTopic.sentiment == Sentiment.POSITIVE, 1),
-                    (ReviewTopic.sentiment == Sentiment.NEGATIVE, -1),
-                    else_=0
-                )
-            ).label("sentiment_score")
-        )
-        .select_from(ReviewTopic)
-        .join(Review)
-        .join(Topic)
-        .where(
-            Review.date.between(start_date, end_date),
-            Topic.name.in_(top_topics)
-        )
-        .group_by(trunc_func, Topic.name)
-        .order_by(trunc_func, Topic.name)
+    result = await session.execute(
+        _topic_trends_query(unit), {**params, "topic_names": top_topics}
     )
-    
-    result = await session.execute(trends_query)
     rows = result.all()
     
     # Форматируем результат
@@ -352,29 +617,11 @@ async def get_sentiment_dynamics(
     """
     Динамика тональности по интервалам
     """
-    if mode == "all:month":
-        trunc_func = func.date_trunc("month", Review.date)
-    elif mode in ("month:day", "days:day"):
-        trunc_func = func.date_trunc("day", Review.date)
-    elif mode == "halfyear:week":
-        trunc_func = func.date_trunc("week", Review.date)
-    else:
-        raise ValueError(f"Unsupported mode: {mode}")
+    query = _sentiment_dynamics_query(_trunc_unit(mode))
 
-    query = (
-        select(
-            trunc_func.label("period"),
-            ReviewTopic.sentiment,
-            func.count(ReviewTopic.review_id).label("count")
-        )
-        .select_from(ReviewTopic)
-        .join(Review)
-        .where(Review.date.between(start_date, end_date))
-        .group_by(trunc_func, ReviewTopic.sentiment)
-        .order_by(trunc_func)
+    result = await session.execute(
+        query, {"start_date": start_date, "end_date": end_date}
     )
-    
-    result = await session.execute(query)
     rows = result.all()
     
     # Группируем по периодам
@@ -417,37 +664,13 @@ async def get_topics_statistics(
     if not topic_names:
         return []
 
-    # Определяем функцию для группировки по времени
-    if mode == "all:month":
-        trunc_func = func.date_trunc("month", Review.date)
-    elif mode in ("month:day", "days:day"):
-        trunc_func = func.date_trunc("day", Review.date)
-    elif mode == "halfyear:week":
-        trunc_func = func.date_trunc("week", Review.date)
-    else:
-        raise ValueError(f"Unsupported mode: {mode}")
-
     # Основной запрос для статистики по темам
-    query = (
-        select(
-            trunc_func.label("period"),
-            Topic.name.label("topic_name"),
-            ReviewTopic.sentiment,
-            func.count(ReviewTopic.review_id).label("count"),
-            func.avg(Review.rating).label("avg_rating")
-        )
-        .select_from(ReviewTopic)
-        .join(Review, ReviewTopic.review_id == Review.id)
-        .join(Topic, ReviewTopic.topic_id == Topic.id)
-        .where(
-            Review.date.between(start_date, end_date),
-            Topic.name.in_(topic_names)
-        )
-        .group_by(trunc_func, Topic.name, ReviewTopic.sentiment)
-        .order_by(trunc_func, Topic.name, ReviewTopic.sentiment)
-    )
+    query = _topics_statistics_query(_trunc_unit(mode))
 
-    result = await session.execute(query)
+    result = await session.execute(
+        query,
+        {"start_date": start_date, "end_date": end_date, "topic_names": topic_names},
+    )
     rows = result.all()
 
     # Группируем результаты по периоду и теме
@@ -529,27 +752,10 @@ async def get_topics_comparison(
     if not topic_names:
         return []
 
-    query = (
-        select(
-            Topic.name.label("topic_name"),
-            ReviewTopic.sentiment,
-            func.count(ReviewTopic.review_id).label("count"),
-            func.avg(Review.rating).label("avg_rating"),
-            func.min(Review.date).label("first_mention"),
-            func.max(Review.date).label("last_mention")
-        )
-        .select_from(ReviewTopic)
-        .join(Review, ReviewTopic.review_id == Review.id)
-        .join(Topic, ReviewTopic.topic_id == Topic.id)
-        .where(
-            Review.date.between(start_date, end_date),
-            Topic.name.in_(topic_names)
-        )
-        .group_by(Topic.name, ReviewTopic.sentiment)
-        .order_by(Topic.name, ReviewTopic.sentiment)
+    result = await session.execute(
+        _topics_comparison_query(),
+        {"start_date": start_date, "end_date": end_date, "topic_names": topic_names},
     )
-
-    result = await session.execute(query)
     rows = result.all()
 
     # Группируем по теме
@@ -630,4 +836,192 @@ async def get_all_available_topics(
         return topics
     except Exception as e:
         print(f"Error in get_all_available_topics: {e}")
-        raise
\ No newline at end of file
+        raise
+
+
+def _sentiment_metrics(sentiment_data: Dict[str, int]) -> Dict[str, Any]:
+    """Проценты, NPS и доминирующая тональность по разбивке упоминаний"""
+    total = sum(sentiment_data.values())
+
+    positive = sentiment_data.get(Sentiment.POSITIVE.value, 0)
+    negative = sentiment_data.get(Sentiment.NEGATIVE.value, 0)
+
+    return {
+        "total_mentions": total,
+        "sentiment_breakdown": sentiment_data,
+        "sentiment_percentages": {
+            sentiment: round((count / total) * 100, 2) if total > 0 else 0
+            for sentiment, count in sentiment_data.items()
+        },
+        "nps_score": round(((positive - negative) / total) * 100, 2) if total > 0 else 0,
+        "dominant_sentiment": max(sentiment_data.items(), key=lambda x: x[1])[0] if total > 0 else None,
+    }
+
+
+def _empty_sentiment_breakdown() -> Dict[str, int]:
+    return {
+        Sentiment.POSITIVE.value: 0,
+        Sentiment.NEGATIVE.value: 0,
+        Sentiment.NEUTRAL.value: 0,
+    }
+
+
+async def get_multi_interval_statistics(
+    session: AsyncSession,
+    windows: List[Dict[str, Any]],
+    topic_names: List[str],
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Статистика по темам сразу для нескольких интервалов одним запросом.
+
+    Строки выбираются один раз по объединению интервалов, а принадлежность
+    к каждому окну считается через CASE внутри агрегатов, поэтому
+    пересекающиеся окна («этот месяц» и «последние 90 дней») учитываются
+    корректно. Если список тем пуст — считаются все темы.
+    """
+    if not windows:
+        return {}
+
+    params = {}
+    for idx, window in enumerate(windows):
+        params[f"start_date_{idx}"] = window["start_date"]
+        params[f"end_date_{idx}"] = window["end_date"]
+    if topic_names:
+        params["topic_names"] = topic_names
+
+    query = _multi_interval_query(len(windows), bool(topic_names))
+
+    result = await session.execute(query, params)
+    rows = result.all()
+
+    # Раскладываем строки по окнам и темам
+    stats_by_window = {}
+    for idx, window in enumerate(windows):
+        topics = {}
+        for row in rows:
+            count = row._mapping[f"count_{idx}"]
+            if not count:
+                continue
+
+            topic_stat = topics.setdefault(
+                row.topic_name,
+                {
+                    "sentiment_breakdown": _empty_sentiment_breakdown(),
+                    "rating_sum": 0,
+                    "rating_count": 0,
+                },
+            )
+            topic_stat["sentiment_breakdown"][row.sentiment.value] = count
+            topic_stat["rating_sum"] += row._mapping[f"rating_sum_{idx}"] or 0
+            topic_stat["rating_count"] += row._mapping[f"rating_count_{idx}"]
+
+        window_breakdown = _empty_sentiment_breakdown()
+        window_rating_sum = 0
+        window_rating_count = 0
+        formatted_topics = []
+        for topic_name, topic_stat in topics.items():
+            for sentiment, count in topic_stat["sentiment_breakdown"].items():
+                window_breakdown[sentiment] += count
+            window_rating_sum += topic_stat["rating_sum"]
+            window_rating_count += topic_stat["rating_count"]
+
+            formatted_topics.append({
+                "topic": topic_name,
+                **_sentiment_metrics(topic_stat["sentiment_breakdown"]),
+                "average_rating": (
+                    round(topic_stat["rating_sum"] / topic_stat["rating_count"], 2)
+                    if topic_stat["rating_count"] else None
+                ),
+            })
+
+        stats_by_window[window["name"]] = {
+            "start_date": window["start_date"].isoformat(),
+            "end_date": window["end_date"].isoformat(),
+            **_sentiment_metrics(window_breakdown),
+            "average_rating": (
+                round(window_rating_sum / window_rating_count, 2)
+                if window_rating_count else None
+            ),
+            "topics": sorted(formatted_topics, key=lambda x: x["total_mentions"], reverse=True),
+        }
+
+    return stats_by_window
+
+
+async def get_topic_detail(
+    session: AsyncSession,
+    topic_name: str,
+    start_date: datetime,
+    end_date: datetime,
+    mode: str,
+) -> Dict[str, Any]:
+    """
+    Разбивка по интервалам и сводка за весь период для одной темы.
+
+    Один сгруппированный запрос с ROLLUP(sentiment, period) отдаёт сразу
+    строки (тональность, период) для разбивки, строки (тональность) для
+    сводки за весь период и итоговую строку со средним рейтингом и датами
+    первого/последнего упоминания.
+    """
+    query = _topic_detail_query(_trunc_unit(mode))
+
+    result = await session.execute(
+        query,
+        {"start_date": start_date, "end_date": end_date, "topic_name": topic_name},
+    )
+    rows = result.all()
+
+    periods = {}
+    range_breakdown = _empty_sentiment_breakdown()
+    grand_total = None
+
+    for row in rows:
+        if row.sentiment_grouped:
+            grand_total = row
+        elif row.period_grouped:
+            range_breakdown[row.sentiment.value] = row.count
+        else:
+            period_str = row.period.strftime("%Y-%m-%d")
+            period_stat = periods.setdefault(
+                period_str,
+                {
+                    "period_start": row.period,
+                    "sentiment_breakdown": _empty_sentiment_breakdown(),
+                    "avg_rating": 0,
+                    "rating_count": 0,
+                },
+            )
+            period_stat["sentiment_breakdown"][row.sentiment.value] = row.count
+
+            # Аккумулируем рейтинги так же, как get_topics_statistics
+            if row.avg_rating is not None:
+                total_count = period_stat["rating_count"] + row.count
+                period_stat["avg_rating"] = (
+                    (period_stat["avg_rating"] * period_stat["rating_count"])
+                    + (row.avg_rating * row.count)
+                ) / total_count
+                period_stat["rating_count"] = total_count
+
+    statistics = [
+        {
+            "period": period_str,
+            "topic": topic_name,
+            **_sentiment_metrics(stat["sentiment_breakdown"]),
+            "average_rating": round(stat["avg_rating"], 2) if stat["avg_rating"] else None,
+        }
+        for period_str, stat in sorted(periods.items(), key=lambda item: item[1]["period_start"])
+    ]
+
+    comparison = None
+    if grand_total is not None and grand_total.count:
+        comparison = {
+            "topic": topic_name,
+            **_sentiment_metrics(range_breakdown),
+            "average_rating": (
+                round(float(grand_total.avg_rating), 2) if grand_total.avg_rating else None
+            ),
+            "first_mention": grand_total.first_mention.isoformat() if grand_total.first_mention else None,
+            "last_mention": grand_total.last_mention.isoformat() if grand_total.last_mention else None,
+        }
+
+    return {"comparison": comparison, "statistics": statistics}
@@ -0,0 +1,216 @@
+"""Локальный классификатор тем и тональностей на хэшированных n-граммах.
+
+Логистическая регрессия без внешних зависимостей: по одному бинарному
+классификатору на тему и по softmax на три тональности для каждой темы.
+Признаки — хэшированные униграммы и биграммы слов. Обучение — SGD,
+модель хранится в gzip-JSON.
+"""
+
+import gzip
+import html
+import json
+import math
+import random
+import re
+import zlib
+from dataclasses import dataclass
+
+SENTIMENTS = ["положительно", "нейтрально", "отрицательно"]
+
+
+def extract_features(text: str, buckets: int) -> dict[int, float]:
+    """Хэшированные признаки текста
+
+    Args:
+        text (str): Текст отзыва
+        buckets (int): Размер пространства хэшей
+
+    Returns:
+        dict[int, float]: L2-нормированный бинарный вектор и признак смещения (индекс buckets)
+    """
+    words = re.findall(r"\w+", html.unescape(text).casefold())
+    tokens = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    indices = {zlib.crc32(token.encode("utf-8")) % buckets for token in tokens}
+
+    value = 1.0 / math.sqrt(len(indices)) if indices else 0.0
+    features = {i: value for i in indices}
+    features[buckets] = 1.0
+    return features
+
+
+def _dot(weights: dict[int, float], features: dict[int, float]) -> float:
+    return sum(weights.get(i, 0.0) * v for i, v in features.items())
+
+
+def _sigmoid(z: float) -> float:
+    if z < -35:
+        return 0.0
+    return 1.0 / (1.0 + math.exp(-z))
+
+
+def _softmax(scores: list[float]) -> list[float]:
+    top = max(scores)
+    exps = [math.exp(s - top) for s in scores]
+    total = sum(exps)
+    return [e / total for e in exps]
+
+
+@dataclass
+class FastPrediction:
+    """Результат локального классификатора"""
+
+    topics: list[str]
+    sentiments: list[str]
+    confidence: float
+
+
+class FastClassifier:
+    """Каскадный классификатор: уверенные ответы локально, остальные — в LLM."""
+
+    def __init__(
+        self,
+        categories: list[str],
+        buckets: int,
+        topic_weights: list[dict[int, float]],
+        sentiment_weights: list[list[dict[int, float]]],
+    ):
+        """Инициализация классификатора
+
+        Args:
+            categories (list[str]): Темы в порядке весов
+            buckets (int): Размер пространства хэшей
+            topic_weights (list[dict[int, float]]): Веса бинарного классификатора каждой темы
+            sentiment_weights (list[list[dict[int, float]]]): Веса тональностей для каждой темы
+        """
+        self.categories = categories
+        self.buckets = buckets
+        self.topic_weights = topic_weights
+        self.sentiment_weights = sentiment_weights
+
+    def predict(self, text: str) -> FastPrediction:
+        """Предсказать темы и тональности
+
+        Уверенность — минимум по всем решениям: для каждой темы
+        max(p, 1 - p), для каждой найденной темы — вероятность выбранной
+        тональности. Если ни одна тема не найдена, уверенность равна 0.
+
+        Args:
+            text (str): Текст отзыва
+
+        Returns:
+            FastPrediction: Темы, тональности и уверенность
+        """
+        features = extract_features(text, self.buckets)
+
+        topics = []
+        sentiments = []
+        confidence = 1.0
+        for index, category in enumerate(self.categories):
+            p = _sigmoid(_dot(self.topic_weights[index], features))
+            confidence = min(confidence, max(p, 1.0 - p))
+            if p < 0.5:
+                continue
+
+            probabilities = _softmax([_dot(w, features) for w in self.sentiment_weights[index]])
+            best = max(range(len(SENTIMENTS)), key=probabilities.__getitem__)
+            confidence = min(confidence, probabilities[best])
+            topics.append(category)
+            sentiments.append(SENTIMENTS[best])
+
+        if not topics:
+            confidence = 0.0
+        return FastPrediction(topics=topics, sentiments=sentiments, confidence=confidence)
+
+    @classmethod
+    def train(
+        cls,
+        samples: list[tuple[str, list[str], list[str]]],
+        buckets: int = 1 << 18,
+        epochs: int = 3,
+        learning_rate: float = 0.5,
+        seed: int = 0,
+    ) -> "FastClassifier":
+        """Обучить классификатор SGD на размеченных отзывах
+
+        Args:
+            samples (list[tuple[str, list[str], list[str]]]): (текст, темы, тональности)
+            buckets (int): Размер пространства хэшей
+            epochs (int): Количество проходов по данным
+            learning_rate (float): Начальный шаг, убывает как 1/sqrt(эпоха)
+            seed (int): Зерно перемешивания
+
+        Returns:
+            FastClassifier: Обученная модель
+        """
+        categories = sorted({topic for _, topics, _ in samples for topic in topics})
+        category_index = {category: i for i, category in enumerate(categories)}
+        topic_weights: list[dict[int, float]] = [{} for _ in categories]
+        sentiment_weights: list[list[dict[int, float]]] = [[{} for _ in SENTIMENTS] for _ in categories]
+
+        prepared = []
+        for text, topics, sentiments in samples:
+            labels = {
+                category_index[topic]: SENTIMENTS.index(sentiment) if sentiment in SENTIMENTS else 1
+                for topic, sentiment in zip(topics, sentiments)
+            }
+            prepared.append((extract_features(text, buckets), labels))
+
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(prepared)
+            rate = learning_rate / math.sqrt(epoch + 1)
+
+            for features, labels in prepared:
+                for index, weights in enumerate(topic_weights):
+                    target = 1.0 if index in labels else 0.0
+                    gradient = (target - _sigmoid(_dot(weights, features))) * rate
+                    for i, v in features.items():
+                        weights[i] = weights.get(i, 0.0) + gradient * v
+
+                for index, sentiment in labels.items():
+                    class_weights = sentiment_weights[index]
+                    probabilities = _softmax([_dot(w, features) for w in class_weights])
+                    for label, weights in enumerate(class_weights):
+                        gradient = ((1.0 if label == sentiment else 0.0) - probabilities[label]) * rate
+                        for i, v in features.items():
+                            weights[i] = weights.get(i, 0.0) + gradient * v
+
+        return cls(categories, buckets, topic_weights, sentiment_weights)
+
+    def save(self, path: str) -> None:
+        """Сохранить модель в gzip-JSON
+
+        Args:
+            path (str): Путь к файлу
+        """
+        payload = {
+            "categories": self.categories,
+            "buckets": self.buckets,
+            "topic_weights": self.topic_weights,
+            "sentiment_weights": self.sentiment_weights,
+        }
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "FastClassifier":
+        """Загрузить модель из gzip-JSON
+
+        Args:
+            path (str): Путь к файлу
+
+        Returns:
+            FastClassifier: Загруженная модель
+        """
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            payload = json.load(f)
+
+        def restore(weights: dict[str, float]) -> dict[int, float]:
+            return {int(i): w for i, w in weights.items()}
+
+        return cls(
+            categories=payload["categories"],
+            buckets=payload["buckets"],
+            topic_weights=[restore(w) for w in payload["topic_weights"]],
+            sentiment_weights=[[restore(w) for w in per_topic] for per_topic in payload["sentiment_weights"]],
+        )
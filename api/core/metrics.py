@@ -0,0 +1,73 @@
+"""Метрики процесса: счётчики и текущие значения с метками.
+
+Хранятся в памяти процесса и отдаются эндпоинтом /api/metrics.
+"""
+
+import time
+from collections import defaultdict
+from typing import Any
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _labels(labels: dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class MetricsRegistry:
+    """Реестр метрик: счётчики только растут, gauge хранит последнее значение."""
+
+    def __init__(self) -> None:
+        self._counters: defaultdict[str, defaultdict[Labels, float]] = defaultdict(lambda: defaultdict(float))
+        self._gauges: defaultdict[str, dict[Labels, float]] = defaultdict(dict)
+        self._started_at = time.time()
+
+    def increment(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        """Увеличить счётчик
+
+        Args:
+            name (str): Имя метрики
+            value (float): На сколько увеличить
+            **labels: Метки (например, provider="gemini")
+        """
+        self._counters[name][_labels(labels)] += value
+
+    def set_gauge(self, name: str, value: float, **labels: Any) -> None:
+        """Записать текущее значение
+
+        Args:
+            name (str): Имя метрики
+            value (float): Значение
+            **labels: Метки
+        """
+        self._gauges[name][_labels(labels)] = value
+
+    def get(self, name: str, **labels: Any) -> float:
+        """Текущее значение счётчика или gauge (0, если метрики нет)"""
+        key = _labels(labels)
+        if key in self._gauges.get(name, {}):
+            return self._gauges[name][key]
+        return self._counters.get(name, {}).get(key, 0.0)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Все метрики в виде, пригодном для JSON
+
+        Returns:
+            dict[str, Any]: {"uptime_seconds", "counters", "gauges"}, значения —
+            списки {"labels": {...}, "value": ...}
+        """
+
+        def dump(series: dict[str, dict[Labels, float]]) -> dict[str, list[dict[str, Any]]]:
+            return {
+                name: [{"labels": dict(labels), "value": value} for labels, value in values.items()]
+                for name, values in sorted(series.items())
+            }
+
+        return {
+            "uptime_seconds": round(time.time() - self._started_at, 1),
+            "counters": dump(self._counters),
+            "gauges": dump(self._gauges),
+        }
+
+
+metrics = MetricsRegistry()
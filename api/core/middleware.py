@@ -0,0 +1,62 @@
+"""ASGI middleware приложения."""
+
+import asyncio
+from collections import deque
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class CancelOnDisconnectMiddleware:
+    """Отмена обработки запроса, если клиент закрыл соединение.
+
+    Тело запроса читается заранее, после чего middleware ждёт
+    http.disconnect параллельно с обработчиком. Если клиент ушёл раньше,
+    чем получил ответ, задача обработчика отменяется: asyncpg при отмене
+    отправляет в Postgres cancel request, и агрегация не досчитывается
+    впустую, удерживая соединение из пула.
+    """
+
+    def __init__(self, app: ASGIApp, path_prefixes: tuple[str, ...] = ("/",)) -> None:
+        self.app = app
+        self.path_prefixes = path_prefixes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        # Буферизуем тело, чтобы дальше receive() слушал только disconnect
+        body_messages: deque[Message] = deque()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body_messages.append(message)
+            if not message.get("more_body", False):
+                break
+
+        disconnected = asyncio.Event()
+
+        async def replay_receive() -> Message:
+            if body_messages:
+                return body_messages.popleft()
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        app_task = asyncio.create_task(self.app(scope, replay_receive, send))
+
+        async def watch_disconnect() -> None:
+            message = await receive()
+            if message["type"] == "http.disconnect" and not app_task.done():
+                disconnected.set()
+                app_task.cancel()
+
+        watcher = asyncio.create_task(watch_disconnect())
+        try:
+            await app_task
+        except asyncio.CancelledError:
+            if not disconnected.is_set():
+                raise
+            print(f"Клиент отключился, обработка {scope['path']} отменена")
+        finally:
+            watcher.cancel()
@@ -5,8 +5,10 @@ from sqlalchemy import (
     ForeignKey,
     DateTime,
     Enum,
+    Float,
     Text,
     Index,
+    JSON,
     UniqueConstraint,
 )
 from sqlalchemy.sql import func
@@ -78,3 +80,103 @@ class Topic(Base):
         "ReviewTopic", back_populates="topic", cascade="all, delete-orphan"
     )
     reviews = relationship("Review", secondary="review_topics", back_populates="topics")
+
+
+class ClassificationCacheEntry(Base):
+    """
+    Результат классификации текста отзыва.
+    Ключ — sha256 от нормализованного текста, версии таксономии,
+    версии промптов и модели.
+    """
+
+    __tablename__ = "classification_cache"
+
+    key = Column(String(64), primary_key=True)
+    topics = Column(JSON, nullable=False)
+    sentiments = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class StoredPrediction(Base):
+    """
+    Результат /predict?idempotent=true для отзыва клиента.
+    Ключ — id отзыва в запросе и sha256 его текста. Хранится отдельно от
+    reviews/review_topics: id клиента не связан с историческими отзывами,
+    а предсказания не должны попадать в аналитику и обучающие данные.
+    """
+
+    __tablename__ = "stored_predictions"
+
+    review_id = Column(Integer, primary_key=True)
+    text_hash = Column(String(64), primary_key=True)
+    topics = Column(JSON, nullable=False)
+    sentiments = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class NearDuplicateReuse(Base):
+    """
+    Журнал переиспользования разметки почти-дубликата вместо вызова модели.
+    """
+
+    __tablename__ = "near_duplicate_reuses"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    review_id = Column(Integer, nullable=True, index=True)
+    source_review_id = Column(Integer, nullable=True, index=True)
+    similarity = Column(Float, nullable=False)
+    topics = Column(JSON, nullable=False)
+    sentiments = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class JobStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class ClassificationJob(Base):
+    """
+    Фоновая задача классификации большого набора отзывов.
+    heartbeat_at обновляется обработчиком всё время работы над задачей:
+    задачу со старым heartbeat_at может подхватить другой обработчик.
+    """
+
+    __tablename__ = "classification_jobs"
+
+    id = Column(String(36), primary_key=True)
+    status = Column(String(16), nullable=False, default=JobStatus.QUEUED.value, index=True)
+    total = Column(Integer, nullable=False)
+    completed = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+
+    items = relationship(
+        "ClassificationJobItem", back_populates="job", cascade="all, delete-orphan"
+    )
+
+
+class ClassificationJobItem(Base):
+    """
+    Отзыв внутри задачи классификации; topics/sentiments заполняются,
+    когда батч с отзывом обработан.
+    """
+
+    __tablename__ = "classification_job_items"
+
+    job_id = Column(
+        String(36), ForeignKey("classification_jobs.id", ondelete="CASCADE"), primary_key=True
+    )
+    position = Column(Integer, primary_key=True)
+    review_id = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+    rating = Column(Integer, nullable=True)
+    topics = Column(JSON, nullable=True)
+    sentiments = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+
+    job = relationship("ClassificationJob", back_populates="items")
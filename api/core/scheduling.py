@@ -0,0 +1,227 @@
+"""Планировщик батчей классификации.
+
+Модуль не зависит от настроек: синглтон с параметрами сервиса создаётся
+в api/core/services/scheduler.py. У сервиса src/lct_gazprombank своя
+копия планировщика (пакеты разворачиваются независимо), тесты
+tests/test_scheduler.py прогоняются на обеих.
+"""
+
+import asyncio
+import itertools
+import math
+import time
+from collections import OrderedDict, deque
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+
+class SchedulerSaturatedError(Exception):
+    """Очередь планировщика заполнена, запрос не принят"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Очередь классификации переполнена, повторите через {retry_after} с")
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Job:
+    func: Callable[[], Awaitable[Any]]
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+    # Задача, в которой батч выполняется воркером
+    task: asyncio.Task | None = None
+
+
+class ClassificationScheduler:
+    """Планировщик батчей с общей для всех запросов конкурентностью.
+
+    Батчи каждого HTTP-запроса лежат в отдельной очереди, воркеры
+    забирают их по кругу (round-robin), поэтому большой запрос не
+    блокирует маленькие. Общее число ожидающих батчей ограничено:
+    при переполнении новый запрос отклоняется с оценкой Retry-After.
+    Отмена future батча убирает его из очереди, а уже выполняющийся
+    батч прерывает.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue_size: int):
+        """Инициализация планировщика
+
+        Args:
+            max_concurrency (int): Количество одновременно выполняемых батчей
+            max_queue_size (int): Максимальное количество батчей в очереди
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue_size = max_queue_size
+
+        self._queues: OrderedDict[int, deque[_Job]] = OrderedDict()
+        self._queued = 0
+        self._in_flight = 0
+        self._request_ids = itertools.count()
+        self._condition: asyncio.Condition | None = None
+        self._workers: list[asyncio.Task] = []
+
+        self._completed = 0
+        self._failed = 0
+        self._cancelled = 0
+        self._rejected = 0
+        self._wait_times: deque[float] = deque(maxlen=1000)
+        self._avg_run_time: float | None = None
+
+    def _ensure_workers(self) -> None:
+        """Ленивый запуск воркеров в текущем event loop"""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        self._workers = [worker for worker in self._workers if not worker.done()]
+        while len(self._workers) < self.max_concurrency:
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    def _retry_after(self) -> int:
+        """Оценка времени, через которое очередь освободится"""
+        avg_run_time = self._avg_run_time or 10.0
+        return max(1, math.ceil(self._queued * avg_run_time / self.max_concurrency))
+
+    async def run(self, jobs: list[Callable[[], Awaitable[Any]]]) -> list[Any]:
+        """Выполнить батчи одного запроса и дождаться всех результатов
+
+        Args:
+            jobs: Корутинные функции без аргументов, по одной на батч
+
+        Returns:
+            list: Результаты в порядке jobs
+
+        Raises:
+            SchedulerSaturatedError: Очередь переполнена
+        """
+        futures = await self.submit(jobs)
+        return await asyncio.gather(*futures)
+
+    async def submit(self, jobs: list[Callable[[], Awaitable[Any]]]) -> list[asyncio.Future]:
+        """Поставить батчи одного запроса в очередь
+
+        Returns:
+            list[asyncio.Future]: Future результата для каждого батча
+
+        Raises:
+            SchedulerSaturatedError: Очередь переполнена
+        """
+        if not jobs:
+            return []
+
+        self._ensure_workers()
+
+        # Пустая очередь принимает запрос любого размера
+        if self._queued and self._queued + len(jobs) > self.max_queue_size:
+            self._rejected += 1
+            raise SchedulerSaturatedError(self._retry_after())
+
+        loop = asyncio.get_running_loop()
+        request_id = next(self._request_ids)
+        queue = deque(_Job(func=job, future=loop.create_future()) for job in jobs)
+        futures = [job.future for job in queue]
+
+        for job in queue:
+            job.future.add_done_callback(lambda f, rid=request_id, job=job: self._on_job_done(rid, job))
+
+        async with self._condition:
+            self._queues[request_id] = queue
+            self._queued += len(queue)
+            self._condition.notify(len(queue))
+
+        return futures
+
+    def _on_job_done(self, request_id: int, job: _Job) -> None:
+        """Отмена батча: прервать его выполнение или убрать из очереди"""
+        if not job.future.cancelled():
+            return
+        if job.task is not None:
+            job.task.cancel()
+            return
+        queue = self._queues.get(request_id)
+        if queue is None:
+            return
+        remaining = deque(job for job in queue if not job.future.done())
+        self._queued -= len(queue) - len(remaining)
+        if remaining:
+            self._queues[request_id] = remaining
+        else:
+            del self._queues[request_id]
+
+    async def _next_job(self) -> _Job:
+        """Взять следующий батч по кругу между запросами"""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._queued > 0)
+
+            request_id, queue = next(iter(self._queues.items()))
+            job = queue.popleft()
+            self._queued -= 1
+
+            if queue:
+                self._queues.move_to_end(request_id)
+            else:
+                del self._queues[request_id]
+
+            return job
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._next_job()
+            if job.future.done():
+                continue
+
+            started_at = time.monotonic()
+            self._wait_times.append(started_at - job.enqueued_at)
+            self._in_flight += 1
+            # Отдельная задача, чтобы отмена future прерывала сам батч
+            job.task = asyncio.ensure_future(job.func())
+            try:
+                result = await job.task
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    # Отменяют сам воркер: батч не будет выполнен
+                    self._failed += 1
+                    job.future.cancel()
+                    raise
+                if job.future.cancelled():
+                    # Батч отменил ожидающий (например, клиент закрыл стрим)
+                    self._cancelled += 1
+                    continue
+                # CancelledError изнутри батча (например, отменённая вложенная
+                # задача): воркер продолжает работу, ожидающий получает ошибку
+                self._failed += 1
+                if not job.future.done():
+                    job.future.set_exception(RuntimeError("Выполнение батча прервано"))
+            except Exception as e:
+                self._failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                self._completed += 1
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                self._in_flight -= 1
+                run_time = time.monotonic() - started_at
+                self._avg_run_time = (
+                    run_time if self._avg_run_time is None else 0.8 * self._avg_run_time + 0.2 * run_time
+                )
+
+    def stats(self) -> dict[str, Any]:
+        """Метрики очереди: глубина, ожидание, отказы"""
+        wait_times = sorted(self._wait_times)
+        return {
+            "queue_depth": self._queued,
+            "queued_requests": len(self._queues),
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "max_queue_size": self.max_queue_size,
+            "completed_batches": self._completed,
+            "failed_batches": self._failed,
+            "cancelled_batches": self._cancelled,
+            "rejected_requests": self._rejected,
+            "wait_time_avg": round(sum(wait_times) / len(wait_times), 3) if wait_times else None,
+            "wait_time_p95": round(wait_times[int(0.95 * (len(wait_times) - 1))], 3) if wait_times else None,
+            "wait_time_max": round(wait_times[-1], 3) if wait_times else None,
+            "avg_batch_time": round(self._avg_run_time, 3) if self._avg_run_time is not None else None,
+        }
+
@@ -138,6 +138,70 @@ class TopicsComparisonRequest(BaseModel):
     start_date: datetime
     end_date: datetime
     topics: List[str]
+
+
+class IntervalWindowSchema(BaseModel):
+    name: str
+    start_date: datetime
+    end_date: datetime
+
+    @field_validator("end_date")
+    def validate_end_date(cls, v, info):
+        start = info.data.get("start_date")
+        if start is not None and v <= start:
+            raise ValueError("end_date должен быть больше start_date")
+        return v
+
+
+class MultiIntervalRequest(BaseModel):
+    windows: List[IntervalWindowSchema] = Field(min_length=1, max_length=12)
+    topics: List[str] = Field(default_factory=list)
+
+    @field_validator("windows")
+    def validate_unique_names(cls, v):
+        names = [window.name for window in v]
+        if len(names) != len(set(names)):
+            raise ValueError("Названия интервалов должны быть уникальными")
+        return v
+
+
+class IntervalTopicStatistic(BaseModel):
+    topic: str
+    total_mentions: int
+    sentiment_breakdown: Dict[str, int]
+    sentiment_percentages: Dict[str, float]
+    nps_score: float
+    average_rating: Optional[float]
+    dominant_sentiment: Optional[str]
+
+
+class IntervalWindowStatistics(BaseModel):
+    start_date: str
+    end_date: str
+    total_mentions: int
+    sentiment_breakdown: Dict[str, int]
+    sentiment_percentages: Dict[str, float]
+    nps_score: float
+    average_rating: Optional[float]
+    dominant_sentiment: Optional[str]
+    topics: List[IntervalTopicStatistic]
+
+
+class MultiIntervalResponse(BaseModel):
+    status: str
+    data: Dict[str, IntervalWindowStatistics]
+    meta: Dict[str, Any]
+
+
+class TopicDetailData(BaseModel):
+    comparison: Optional[TopicsComparisonResponse]
+    statistics: List[TopicStatisticResponse]
+
+
+class TopicDetailResponse(BaseModel):
+    status: str
+    data: TopicDetailData
+    meta: Dict[str, Any]
     
     
 
@@ -147,6 +211,7 @@ class ReviewInput(BaseModel):
 
     id: int = Field(description="Уникальный идентификатор отзыва")
     text: str = Field(description="Текст отзыва")
+    rating: int | None = Field(default=None, description="Оценка отзыва в звёздах, если есть у источника")
 
 
 class ReviewInputWithMetadata(BaseModel):
@@ -156,6 +221,7 @@ class ReviewInputWithMetadata(BaseModel):
     text: str = Field(description="Текст отзыва")
     date: datetime = Field(description="Дата отзыва")
     source: str | None = Field(default=None, description="Источник отзыва (banki.ru, sravni.ru и др.)")
+    rating: int | None = Field(default=None, description="Оценка отзыва в звёздах, если есть у источника")
 
 
 class ReviewOutput(BaseModel):
@@ -164,6 +230,8 @@ class ReviewOutput(BaseModel):
     id: int = Field(description="Идентификатор отзыва")
     topics: list[str] = Field(description="Список тем отзыва")
     sentiments: list[str] = Field(description="Список тональностей для каждой темы")
+    status: Literal["ok", "error"] = Field(default="ok", description="Статус обработки отзыва")
+    error: str | None = Field(default=None, description="Причина ошибки, если отзыв не удалось классифицировать")
     
     
 class PredictRequest(BaseModel):
@@ -172,7 +240,44 @@ class PredictRequest(BaseModel):
     data: list[ReviewInput] = Field(description="Список отзывов для анализа")
     
     
+class PredictMeta(BaseModel):
+    """Статистика обработки запроса на предсказание"""
+
+    total: int = Field(default=0, description="Количество отзывов в запросе")
+    stored_hits: int = Field(default=0, description="Отзывов, классификация которых взята из базы")
+    cache_hits: int = Field(default=0, description="Отзывов, найденных в кэше")
+    near_duplicate_hits: int = Field(default=0, description="Отзывов, унаследовавших разметку почти-дубликата")
+    fast_path_hits: int = Field(default=0, description="Отзывов, размеченных локальным классификатором")
+    errors: int = Field(default=0, description="Отзывов, которые не удалось классифицировать")
+    llm_reviews: int = Field(default=0, description="Отзывов, отправленных в модель")
+    cache_hit_rate: float = Field(default=0.0, description="Доля попаданий в кэш")
+
+
 class PredictResponse(BaseModel):
     """Ответ с предсказаниями"""
 
-    predictions: list[ReviewOutput] = Field(description="Список предсказаний")
\ No newline at end of file
+    predictions: list[ReviewOutput] = Field(description="Список предсказаний")
+    meta: PredictMeta = Field(default_factory=PredictMeta, description="Статистика обработки")
+
+
+class PredictJobCreated(BaseModel):
+    """Созданная задача классификации"""
+
+    job_id: str = Field(description="Идентификатор задачи")
+    status: str = Field(description="Статус задачи")
+    total: int = Field(description="Количество отзывов в задаче")
+
+
+class PredictJobStatus(BaseModel):
+    """Прогресс задачи классификации и страница результатов"""
+
+    job_id: str = Field(description="Идентификатор задачи")
+    status: str = Field(description="queued, running, completed или failed")
+    total: int = Field(description="Количество отзывов в задаче")
+    completed: int = Field(description="Количество обработанных отзывов")
+    error: str | None = Field(default=None, description="Ошибка, если задача завершилась неудачно")
+    created_at: datetime | None = Field(default=None, description="Время создания")
+    updated_at: datetime | None = Field(default=None, description="Время последнего обновления")
+    offset: int = Field(description="Позиция первого отзыва страницы")
+    limit: int = Field(description="Размер страницы")
+    predictions: list[ReviewOutput] = Field(description="Готовые результаты страницы в порядке загрузки")
\ No newline at end of file
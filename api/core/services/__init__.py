@@ -1,3 +1,5 @@
+from .jobs import get_job_runner
 from .predict import get_classification_service
+from .scheduler import SchedulerSaturatedError, get_scheduler
 
-__all__ = ["get_classification_service"]
+__all__ = ["get_classification_service", "get_job_runner", "get_scheduler", "SchedulerSaturatedError"]
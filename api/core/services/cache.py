@@ -0,0 +1,153 @@
+"""Кэш результатов классификации, адресуемый по содержимому отзыва."""
+
+import hashlib
+from collections import OrderedDict
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from api.core.agent.utils import normalize_review_text
+from api.core.models import ClassificationCacheEntry
+
+Classification = tuple[list[str], list[str]]
+
+
+def normalize_text(text: str) -> str:
+    """Нормализация текста отзыва перед хэшированием
+
+    Та же нормализация, что и для промпта (normalize_review_text), плюс
+    приведение регистра.
+
+    Args:
+        text (str): Исходный текст
+
+    Returns:
+        str: Текст без HTML, лишних пробелов и регистра
+    """
+    return normalize_review_text(text).casefold()
+
+
+def taxonomy_version(categories: list[str]) -> str:
+    """Версия списка категорий
+
+    Args:
+        categories (list[str]): Доступные категории
+
+    Returns:
+        str: Короткий хэш списка категорий
+    """
+    return hashlib.sha256("\n".join(categories).encode("utf-8")).hexdigest()[:12]
+
+
+def classification_cache_key(text: str, taxonomy: str, prompt_version: str, model: str) -> str:
+    """Ключ кэша классификации
+
+    Args:
+        text (str): Текст отзыва
+        taxonomy (str): Версия таксономии
+        prompt_version (str): Версия промптов
+        model (str): Название модели
+
+    Returns:
+        str: sha256 в hex
+    """
+    payload = "\x1f".join([normalize_text(text), taxonomy, prompt_version, model])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ClassificationCache:
+    """Кэш классификаций: LRU в памяти поверх таблицы classification_cache.
+
+    Ошибки базы данных не прерывают предсказание: кэш в этом случае
+    просто ведёт себя как промах.
+    """
+
+    def __init__(self, session_maker: sessionmaker, max_memory_entries: int):
+        """Инициализация кэша
+
+        Args:
+            session_maker (sessionmaker): Фабрика сессий для записи и чтения кэша
+            max_memory_entries (int): Размер LRU в памяти
+        """
+        self._session_maker = session_maker
+        self._max_memory_entries = max_memory_entries
+        self._memory: OrderedDict[str, Classification] = OrderedDict()
+
+    def _remember(self, key: str, value: Classification) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_memory_entries:
+            self._memory.popitem(last=False)
+
+    async def get_many(self, keys: set[str]) -> dict[str, Classification]:
+        """Найти закэшированные классификации
+
+        Args:
+            keys (set[str]): Ключи кэша
+
+        Returns:
+            dict[str, Classification]: Найденные пары (темы, тональности) по ключам
+        """
+        found: dict[str, Classification] = {}
+        for key in keys:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                found[key] = self._memory[key]
+
+        missing = keys - found.keys()
+        if not missing:
+            return found
+
+        try:
+            async with self._session_maker() as session:
+                result = await session.execute(
+                    select(
+                        ClassificationCacheEntry.key,
+                        ClassificationCacheEntry.topics,
+                        ClassificationCacheEntry.sentiments,
+                    ).where(ClassificationCacheEntry.key.in_(missing))
+                )
+                rows = result.all()
+        except Exception as e:
+            print(f"Кэш классификации недоступен: {e}")
+            return found
+
+        for key, topics, sentiments in rows:
+            found[key] = (topics, sentiments)
+            self._remember(key, (topics, sentiments))
+
+        return found
+
+    async def set_many(self, entries: dict[str, Classification]) -> None:
+        """Сохранить новые классификации
+
+        Args:
+            entries (dict[str, Classification]): Пары (темы, тональности) по ключам
+        """
+        if not entries:
+            return
+
+        for key, value in entries.items():
+            self._remember(key, value)
+
+        try:
+            async with self._session_maker() as session:
+                await _insert_entries(session, entries)
+        except Exception as e:
+            print(f"Не удалось сохранить кэш классификации: {e}")
+
+
+async def _insert_entries(session: AsyncSession, entries: dict[str, Classification]) -> None:
+    await session.execute(
+        insert(ClassificationCacheEntry)
+        .values(
+            [
+                {"key": key, "topics": topics, "sentiments": sentiments}
+                for key, (topics, sentiments) in entries.items()
+            ]
+        )
+        .on_conflict_do_nothing(index_elements=[ClassificationCacheEntry.key])
+    )
+    await session.commit()
@@ -0,0 +1,295 @@
+"""Индекс почти-дубликатов отзывов на MinHash LSH."""
+
+import asyncio
+import hashlib
+import random
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy.orm import sessionmaker
+
+from api.core.db.review_crud import get_labeled_reviews
+from api.core.models import NearDuplicateReuse
+from api.core.services.cache import normalize_text
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def shingles(text: str, size: int = 3) -> set[str]:
+    """Словесные шинглы нормализованного текста
+
+    Args:
+        text (str): Текст отзыва
+        size (int): Количество слов в шингле
+
+    Returns:
+        set[str]: Множество шинглов
+    """
+    words = re.findall(r"\w+", normalize_text(text))
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+@dataclass
+class NearDuplicateMatch:
+    """Найденный почти-дубликат с его разметкой"""
+
+    source_review_id: int | None
+    similarity: float
+    topics: list[str]
+    sentiments: list[str]
+
+
+@dataclass
+class _Entry:
+    signature: tuple[int, ...]
+    source_review_id: int | None
+    topics: list[str]
+    sentiments: list[str]
+
+
+class NearDuplicateIndex:
+    """LSH-индекс MinHash-сигнатур ранее размеченных отзывов.
+
+    Сигнатура режется на bands полос; отзывы, совпавшие хотя бы по одной
+    полосе, становятся кандидатами, а сходство проверяется по доле
+    совпавших компонент сигнатуры (оценка коэффициента Жаккара).
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        num_perm: int,
+        bands: int,
+        min_shingles: int,
+        max_entries: int,
+        seed: int = 1,
+        retry_seconds: float = 5.0,
+        retry_max_seconds: float = 300.0,
+    ):
+        """Инициализация индекса
+
+        Args:
+            threshold (float): Минимальное сходство для переиспользования разметки
+            num_perm (int): Длина MinHash-сигнатуры
+            bands (int): Количество полос LSH (должно делить num_perm)
+            min_shingles (int): Минимум шинглов, чтобы текст участвовал в поиске
+            max_entries (int): Максимальный размер индекса, старые записи вытесняются
+            seed (int): Зерно хэш-функций
+            retry_seconds (float): Пауза перед повторной загрузкой после ошибки базы
+            retry_max_seconds (float): Максимальная пауза, до которой она удваивается
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm должно делиться на bands")
+
+        self.threshold = threshold
+        self._bands = bands
+        self._rows = num_perm // bands
+        self._min_shingles = min_shingles
+        self._max_entries = max_entries
+
+        rng = random.Random(seed)
+        self._permutations = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)
+        ]
+
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._buckets: dict[tuple[int, tuple[int, ...]], set[int]] = {}
+        self._next_id = 0
+
+        self._hydrated = False
+        self._hydrate_task: asyncio.Task | None = None
+        self._retry_seconds = retry_seconds
+        self._retry_max_seconds = retry_max_seconds
+        self._failures = 0
+        self._retry_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def ready(self) -> bool:
+        """Загружены ли размеченные отзывы из базы"""
+        return self._hydrated
+
+    def signature(self, text: str) -> tuple[int, ...] | None:
+        """MinHash-сигнатура текста
+
+        Args:
+            text (str): Текст отзыва
+
+        Returns:
+            tuple[int, ...] | None: Сигнатура или None, если текст слишком короткий
+        """
+        text_shingles = shingles(text)
+        if len(text_shingles) < self._min_shingles:
+            return None
+
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+            for shingle in text_shingles
+        ]
+        return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._permutations)
+
+    def _band_keys(self, signature: tuple[int, ...]) -> list[tuple[int, tuple[int, ...]]]:
+        return [(band, signature[band * self._rows : (band + 1) * self._rows]) for band in range(self._bands)]
+
+    def query(self, text: str) -> NearDuplicateMatch | None:
+        """Найти самый похожий размеченный отзыв выше порога
+
+        Args:
+            text (str): Текст нового отзыва
+
+        Returns:
+            NearDuplicateMatch | None: Лучшее совпадение или None (в том числе пока индекс не загружен)
+        """
+        if not self._hydrated:
+            return None
+
+        signature = self.signature(text)
+        if signature is None:
+            return None
+
+        candidates: set[int] = set()
+        for key in self._band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+
+        best: NearDuplicateMatch | None = None
+        for entry_id in candidates:
+            entry = self._entries[entry_id]
+            similarity = sum(x == y for x, y in zip(signature, entry.signature)) / len(signature)
+            if similarity >= self.threshold and (best is None or similarity > best.similarity):
+                best = NearDuplicateMatch(
+                    source_review_id=entry.source_review_id,
+                    similarity=similarity,
+                    topics=entry.topics,
+                    sentiments=entry.sentiments,
+                )
+        return best
+
+    def add(self, text: str, source_review_id: int | None, topics: list[str], sentiments: list[str]) -> bool:
+        """Добавить размеченный отзыв в индекс
+
+        Args:
+            text (str): Текст отзыва
+            source_review_id (int | None): Id отзыва (из базы или из запроса)
+            topics (list[str]): Темы отзыва
+            sentiments (list[str]): Тональности по темам
+
+        Returns:
+            bool: True, если отзыв добавлен (короткие тексты не индексируются)
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return False
+        self._insert(signature, source_review_id, topics, sentiments)
+        return True
+
+    def _insert(
+        self, signature: tuple[int, ...], source_review_id: int | None, topics: list[str], sentiments: list[str]
+    ) -> None:
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = _Entry(signature, source_review_id, list(topics), list(sentiments))
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, set()).add(entry_id)
+
+        while len(self._entries) > self._max_entries:
+            evicted_id, evicted = self._entries.popitem(last=False)
+            for key in self._band_keys(evicted.signature):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(evicted_id)
+                    if not bucket:
+                        del self._buckets[key]
+
+    def start_hydration(self, session_maker: sessionmaker) -> None:
+        """Запустить загрузку индекса в фоне, если она ещё не шла или пора повторить
+
+        Args:
+            session_maker (sessionmaker): Фабрика сессий для чтения
+        """
+        if self._hydrated or (self._hydrate_task is not None and not self._hydrate_task.done()):
+            return
+        if time.monotonic() < self._retry_at:
+            return
+        self._hydrate_task = asyncio.create_task(self.hydrate(session_maker))
+
+    async def hydrate(self, session_maker: sessionmaker) -> bool:
+        """Загрузка размеченных отзывов из базы
+
+        Сигнатуры считаются в отдельном потоке, чтобы не блокировать event loop.
+        Индекс считается готовым только после успешной загрузки; после ошибки
+        следующая попытка разрешается через паузу, удваивающуюся с каждой неудачей.
+
+        Args:
+            session_maker (sessionmaker): Фабрика сессий для чтения
+
+        Returns:
+            bool: True, если индекс загружен
+        """
+        if self._hydrated:
+            return True
+
+        try:
+            async with session_maker() as session:
+                labeled = await get_labeled_reviews(session, self._max_entries)
+            signatures = await asyncio.to_thread(lambda: [self.signature(text) for _, text, _, _ in labeled])
+        except Exception as e:
+            delay = min(self._retry_seconds * 2**self._failures, self._retry_max_seconds)
+            self._failures += 1
+            self._retry_at = time.monotonic() + delay
+            print(f"Не удалось загрузить индекс почти-дубликатов, повтор через {delay:.0f} с: {e}")
+            return False
+
+        # Отзывы, добавленные во время загрузки, новее загруженных: они остаются в индексе
+        # и переносятся в конец очереди вытеснения, а из базы берутся самые новые на оставшееся место
+        added_meanwhile = list(self._entries)
+        loaded = [
+            (signature, review_id, topics, sentiments)
+            for (review_id, _, topics, sentiments), signature in zip(labeled, signatures)
+            if signature is not None
+        ]
+        room = max(self._max_entries - len(added_meanwhile), 0)
+        # Отзывы идут по возрастанию id
+        for signature, review_id, topics, sentiments in loaded[max(len(loaded) - room, 0) :]:
+            self._insert(signature, review_id, topics, sentiments)
+        for entry_id in added_meanwhile:
+            self._entries.move_to_end(entry_id)
+
+        self._hydrated = True
+        self._failures = 0
+        print(f"Индекс почти-дубликатов загружен: {len(self)} отзывов")
+        return True
+
+
+async def record_reuses(session_maker: sessionmaker, reuses: list[tuple[int | None, NearDuplicateMatch]]) -> None:
+    """Записать в журнал переиспользованную разметку
+
+    Args:
+        session_maker (sessionmaker): Фабрика сессий для записи
+        reuses (list[tuple[int | None, NearDuplicateMatch]]): Пары (id отзыва, совпадение)
+    """
+    if not reuses:
+        return
+
+    try:
+        async with session_maker() as session:
+            session.add_all(
+                [
+                    NearDuplicateReuse(
+                        review_id=review_id,
+                        source_review_id=match.source_review_id,
+                        similarity=match.similarity,
+                        topics=match.topics,
+                        sentiments=match.sentiments,
+                    )
+                    for review_id, match in reuses
+                ]
+            )
+            await session.commit()
+    except Exception as e:
+        print(f"Не удалось записать журнал почти-дубликатов: {e}")
@@ -0,0 +1,163 @@
+"""Фоновые обработчики задач классификации."""
+
+import asyncio
+
+from api.core.database import write_session_maker
+from api.core.db.job_crud import (
+    claim_next_job,
+    finish_job,
+    get_pending_job_items,
+    release_jobs,
+    save_job_results,
+    touch_job,
+)
+from api.core.models import JobStatus
+from api.core.schemas import ReviewInput
+from api.core.services.predict import get_classification_service
+from api.core.services.scheduler import SchedulerSaturatedError
+from api.core.settings import settings
+
+
+class ClassificationJobRunner:
+    """Обработчики задач из таблицы classification_jobs.
+
+    Задачи захватываются из базы, поэтому переживают перезапуск API и
+    могут обрабатываться несколькими процессами. Результаты сохраняются
+    после каждого батча: после перезапуска задача продолжается с
+    необработанных отзывов.
+    """
+
+    def __init__(self, workers: int):
+        """Инициализация обработчиков
+
+        Args:
+            workers (int): Количество одновременно обрабатываемых задач
+        """
+        self.workers = workers
+        self._tasks: list[asyncio.Task] = []
+        self._active_jobs: set[str] = set()
+        self._wakeup = asyncio.Event()
+
+    def start(self) -> None:
+        """Запустить обработчики в текущем event loop"""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Остановить обработчики и вернуть незавершённые задачи в очередь"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        if self._active_jobs:
+            try:
+                async with write_session_maker() as session:
+                    await release_jobs(session, list(self._active_jobs))
+            except Exception as e:
+                print(f"Не удалось вернуть задачи в очередь: {e}")
+            self._active_jobs.clear()
+
+    def notify(self) -> None:
+        """Разбудить обработчики после создания новой задачи"""
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                async with write_session_maker() as session:
+                    job_id = await claim_next_job(session, settings.JOB_LEASE_SECONDS)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Ошибка захвата задачи классификации: {e}")
+                job_id = None
+
+            if job_id is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._active_jobs.add(job_id)
+            try:
+                await self._process(job_id)
+            finally:
+                self._active_jobs.discard(job_id)
+
+    async def _heartbeat(self, job_id: str) -> None:
+        """Продлевать аренду задачи каждую треть JOB_LEASE_SECONDS
+
+        Батч может долго ждать в очереди планировщика: без отдельного
+        heartbeat аренда истечёт и задачу повторно оплатит другой обработчик.
+        """
+        interval = settings.JOB_LEASE_SECONDS / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with write_session_maker() as session:
+                    await touch_job(session, job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Не удалось продлить аренду задачи {job_id}: {e}")
+
+    async def _process(self, job_id: str) -> None:
+        """Обработать задачу порциями по JOB_CHUNK_SIZE отзывов"""
+        service = get_classification_service()
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+
+        try:
+            while True:
+                async with write_session_maker() as session:
+                    rows = await get_pending_job_items(session, job_id, settings.JOB_CHUNK_SIZE)
+                if not rows:
+                    break
+
+                reviews = [
+                    ReviewInput(id=review_id, text=text, rating=rating) for _, review_id, text, rating in rows
+                ]
+                try:
+                    async for chunk in service.predict_stream(reviews):
+                        if not chunk:
+                            continue
+                        async with write_session_maker() as session:
+                            await save_job_results(
+                                session,
+                                job_id,
+                                [(rows[i][0], item.topics, item.sentiments, item.error) for i, item in chunk],
+                            )
+                except SchedulerSaturatedError as e:
+                    # Онлайн-запросы важнее: ждём освобождения очереди
+                    await asyncio.sleep(e.retry_after)
+
+            async with write_session_maker() as session:
+                await finish_job(session, job_id, JobStatus.COMPLETED)
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Задача классификации {job_id} завершилась с ошибкой: {e}")
+            async with write_session_maker() as session:
+                await finish_job(session, job_id, JobStatus.FAILED, error=str(e))
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+
+
+# Синглтон обработчиков
+_runner_instance: ClassificationJobRunner | None = None
+
+
+def get_job_runner() -> ClassificationJobRunner:
+    """Получить синглтон обработчиков задач
+
+    Returns:
+        ClassificationJobRunner: Обработчики задач
+    """
+    global _runner_instance
+    if _runner_instance is None:
+        _runner_instance = ClassificationJobRunner(workers=settings.JOB_WORKERS)
+    return _runner_instance
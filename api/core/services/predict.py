@@ -1,71 +1,357 @@
 import asyncio
-import time
+import hashlib
+import os
+from collections.abc import AsyncIterator
+from functools import partial
 
-from api.core.agent import classification_agent
+from api.core.agent import get_classification_agent
+from api.core.agent.prompts import PROMPT_VERSIONS
+from api.core.agent.utils import clean_review_text, estimate_tokens, llm_model_id, normalize_review_text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.core.database import read_session_maker, write_session_maker
+from api.core.db.review_crud import get_stored_classifications, save_classifications
+from api.core.fast_classifier import FastClassifier
+from api.core.services.cache import ClassificationCache, classification_cache_key, taxonomy_version
+from api.core.services.dedup import NearDuplicateIndex, NearDuplicateMatch, record_reuses
+from api.core.services.rating_policy import RatingSentimentPolicy
+from api.core.services.scheduler import ClassificationScheduler, get_scheduler
 from api.core.settings import settings
-from api.core.schemas import ReviewInput, ReviewInputWithMetadata, ReviewOutput
+from api.core.schemas import PredictMeta, ReviewInput, ReviewInputWithMetadata, ReviewOutput
 
 
 class ClassificationService:
     """Сервис для классификации отзывов и определения тональности."""
 
-    def __init__(self, available_categories: list[str]):
+    def __init__(
+        self,
+        available_categories: list[str],
+        scheduler: ClassificationScheduler,
+        cache: ClassificationCache | None = None,
+        near_duplicates: NearDuplicateIndex | None = None,
+        fast_classifier: FastClassifier | None = None,
+        rating_policy: RatingSentimentPolicy | None = None,
+    ):
         """Инициализация сервиса классификации
 
         Args:
             available_categories (list[str]): Список доступных категорий
+            scheduler (ClassificationScheduler): Общий планировщик батчей
+            cache (ClassificationCache | None): Кэш результатов классификации
+            near_duplicates (NearDuplicateIndex | None): Индекс почти-дубликатов
+            fast_classifier (FastClassifier | None): Локальный классификатор для уверенных отзывов
+            rating_policy (RatingSentimentPolicy | None): Тональность по оценке для однотемных отзывов
         """
         self.available_categories = available_categories
-        self._semaphore = asyncio.Semaphore(settings.MAX_CONCURRENT_REQUESTS)
-        self._request_times: list[float] = []
-
-    async def _wait_for_rate_limit(self) -> None:
-        """Ожидание для соблюдения rate limit"""
-        now = time.time()
-        self._request_times = [t for t in self._request_times if now - t < 60]
-
-        if len(self._request_times) >= settings.RATE_LIMIT_PER_MINUTE:
-            wait_time = 60 - (now - self._request_times[0]) + 0.1
-            if wait_time > 0:
-                await asyncio.sleep(wait_time)
-                self._request_times = [t for t in self._request_times if time.time() - t < 60]
+        self._scheduler = scheduler
+        self._cache = cache
+        self._near_duplicates = near_duplicates
+        self._fast_classifier = fast_classifier
+        self._rating_policy = rating_policy
+        self._taxonomy_version = taxonomy_version(available_categories)
+        self._model_id = llm_model_id()
 
-        self._request_times.append(time.time())
+    def _cache_key(self, review: ReviewInput | ReviewInputWithMetadata) -> str:
+        prompt_version = PROMPT_VERSIONS[settings.LLM_OUTPUT_FORMAT][settings.CLASSIFICATION_MODE]
+        # При тональности по оценке результат зависит и от оценки
+        if self._rating_policy and review.rating is not None:
+            prompt_version = f"{prompt_version}:r{review.rating}"
+        return classification_cache_key(review.text, self._taxonomy_version, prompt_version, self._model_id)
 
-    async def predict(self, reviews: list[ReviewInput] | list[ReviewInputWithMetadata]) -> list[ReviewOutput]:
+    async def predict(
+        self,
+        reviews: list[ReviewInput] | list[ReviewInputWithMetadata],
+        meta: PredictMeta | None = None,
+    ) -> list[ReviewOutput]:
         """Предсказание тем и тональности для отзывов с параллельной обработкой
 
         Args:
             reviews: Список отзывов для анализа
+            meta (PredictMeta | None): Статистика запроса, заполняется по ходу обработки
 
         Returns:
             list[ReviewOutput]: Список классифицированных отзывов
+
+        Raises:
+            SchedulerSaturatedError: Очередь классификации переполнена
+        """
+        results: list[ReviewOutput | None] = [None] * len(reviews)
+        async for chunk in self.predict_stream(reviews, meta):
+            for i, item in chunk:
+                results[i] = item
+        return results
+
+    async def predict_idempotent(
+        self,
+        session: AsyncSession,
+        reviews: list[ReviewInput] | list[ReviewInputWithMetadata],
+        meta: PredictMeta | None = None,
+    ) -> list[ReviewOutput]:
+        """Предсказание с учётом уже сохранённых в базе предсказаний
+
+        Отзыв, который уже присылали с тем же id и тем же текстом,
+        возвращается из таблицы stored_predictions. Остальные (новые id или
+        изменившийся текст) классифицируются и пакетно сохраняются туда же,
+        так что повторный запрос не вызывает модель. Исторические отзывы
+        (reviews, review_topics) не читаются и не изменяются.
+
+        Args:
+            session (AsyncSession): Сессия основной базы
+            reviews: Список отзывов для анализа
+            meta (PredictMeta | None): Статистика запроса
+
+        Returns:
+            list[ReviewOutput]: Список классифицированных отзывов в порядке запроса
+
+        Raises:
+            SchedulerSaturatedError: Очередь классификации переполнена
+        """
+        keys = [(review.id, prediction_text_hash(review.text)) for review in reviews]
+        stored = await get_stored_classifications(session, list(set(keys)))
+        # Закрываем транзакцию чтения, чтобы не держать соединение на время вызова модели
+        await session.commit()
+
+        results: list[ReviewOutput | None] = [None] * len(reviews)
+        fresh_positions = []
+        for i, (review, key) in enumerate(zip(reviews, keys)):
+            entry = stored.get(key)
+            if entry is not None:
+                results[i] = ReviewOutput(id=review.id, topics=entry[0], sentiments=entry[1])
+            else:
+                fresh_positions.append(i)
+
+        fresh_meta = PredictMeta()
+        fresh = await self.predict([reviews[i] for i in fresh_positions], fresh_meta) if fresh_positions else []
+        for i, item in zip(fresh_positions, fresh):
+            results[i] = item
+
+        await save_classifications(
+            session,
+            [
+                (*keys[i], item.topics, item.sentiments)
+                for i, item in zip(fresh_positions, fresh)
+                if item.status == "ok"
+            ],
+        )
+
+        if meta is not None:
+            meta.total = len(reviews)
+            meta.stored_hits = len(reviews) - len(fresh_positions)
+            meta.cache_hits = fresh_meta.cache_hits
+            meta.near_duplicate_hits = fresh_meta.near_duplicate_hits
+            meta.fast_path_hits = fresh_meta.fast_path_hits
+            meta.errors = fresh_meta.errors
+            meta.llm_reviews = fresh_meta.llm_reviews
+            meta.cache_hit_rate = fresh_meta.cache_hits / len(reviews) if reviews else 0.0
+
+        return results
+
+    async def predict_stream(
+        self,
+        reviews: list[ReviewInput] | list[ReviewInputWithMetadata],
+        meta: PredictMeta | None = None,
+    ) -> AsyncIterator[list[tuple[int, ReviewOutput]]]:
+        """Потоковое предсказание: результаты выдаются по мере готовности батчей
+
+        Отзывы, уже найденные в кэше, в модель не отправляются. Одинаковые
+        тексты внутри запроса классифицируются один раз, а почти-дубликаты
+        ранее размеченных отзывов наследуют их разметку. Отзывы, в которых
+        локальный классификатор уверен, тоже размечаются без модели.
+
+        Первый элемент выдаётся сразу после постановки батчей в очередь и
+        содержит отзывы, размеченные без модели (может быть пустым). Далее —
+        по элементу на каждый завершённый батч. meta заполняется до первого
+        элемента. При закрытии генератора незавершённые батчи отменяются:
+        ожидающие убираются из очереди, выполняющиеся прерываются.
+
+        Args:
+            reviews: Список отзывов для анализа
+            meta (PredictMeta | None): Статистика запроса
+
+        Yields:
+            list[tuple[int, ReviewOutput]]: Пары (индекс отзыва в запросе, результат)
+
+        Raises:
+            SchedulerSaturatedError: Очередь классификации переполнена
         """
-        batches = [reviews[i : i + settings.BATCH_SIZE] for i in range(0, len(reviews), settings.BATCH_SIZE)]
+        keys = [self._cache_key(review) for review in reviews]
+        cached = await self._cache.get_many(set(keys)) if self._cache else {}
+
+        # Индексы отзывов запроса по ключу: одинаковые тексты получают один результат
+        positions: dict[str, list[int]] = {}
+        for i, key in enumerate(keys):
+            positions.setdefault(key, []).append(i)
+
+        # Для каждого некэшированного ключа в модель уходит только первый отзыв
+        pending = {key: indices[0] for key, indices in positions.items() if key not in cached}
 
-        async def process_with_limits(batch: list) -> list[ReviewOutput]:
-            async with self._semaphore:
-                await self._wait_for_rate_limit()
-                return await self._predict_batch(batch)
+        resolved: dict[str, tuple[list[str], list[str]]] = {key: value for key, value in cached.items() if key in positions}
+        reuses: list[tuple[int | None, NearDuplicateMatch]] = []
+        if self._near_duplicates and pending:
+            # Индекс загружается в фоне: пока он не готов, совпадений нет и отзывы идут в модель
+            self._near_duplicates.start_hydration(read_session_maker)
+            for key, i in list(pending.items()):
+                match = self._near_duplicates.query(reviews[i].text)
+                if match is not None:
+                    resolved[key] = (match.topics, match.sentiments)
+                    reuses.append((reviews[i].id, match))
+                    del pending[key]
 
-        responses = await asyncio.gather(*[process_with_limits(batch) for batch in batches])
-        return [item for response in responses for item in response]
+        # Локальный классификатор: его ответы не кэшируются, они и так дешёвые
+        fast_resolved: dict[str, tuple[list[str], list[str]]] = {}
+        if self._fast_classifier and pending:
+            allowed = set(self.available_categories)
+            for key, i in list(pending.items()):
+                prediction = self._fast_classifier.predict(reviews[i].text)
+                if prediction.confidence >= settings.FAST_CLASSIFIER_THRESHOLD and set(prediction.topics) <= allowed:
+                    fast_resolved[key] = (prediction.topics, prediction.sentiments)
+                    del pending[key]
+
+        if self._rating_policy and pending:
+            await self._rating_policy.load(read_session_maker)
+
+        pending_keys = list(pending)
+        pending_reviews = [reviews[i] for i in pending.values()]
+        batches = pack_batches([review.text for review in pending_reviews])
+        futures = (
+            await self._scheduler.submit(
+                [partial(self._predict_batch, [pending_reviews[i] for i in batch]) for batch in batches]
+            )
+            if batches
+            else []
+        )
+
+        if meta is not None:
+            hits = sum(len(positions[key]) for key in cached if key in positions)
+            meta.total = len(reviews)
+            meta.cache_hits = hits
+            meta.near_duplicate_hits = len(reuses)
+            meta.fast_path_hits = sum(len(positions[key]) for key in fast_resolved)
+            meta.llm_reviews = len(pending_reviews)
+            meta.cache_hit_rate = hits / len(reviews) if reviews else 0.0
+
+        try:
+            if self._cache and reuses:
+                await self._cache.set_many({key: resolved[key] for key in resolved if key not in cached})
+            await record_reuses(write_session_maker, reuses)
+
+            yield self._expand(reviews, positions, {**resolved, **fast_resolved})
+
+            batch_by_future = dict(zip(futures, batches))
+            waiting = set(futures)
+            while waiting:
+                done, waiting = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    batch = batch_by_future[future]
+                    try:
+                        outputs = future.result()
+                    except (Exception, asyncio.CancelledError) as e:
+                        outputs = [self._error_output(pending_reviews[i], f"Ошибка модели: {e}") for i in batch]
+
+                    classified: dict[str, tuple[list[str], list[str]]] = {}
+                    errors: dict[str, str] = {}
+                    for i, item in zip(batch, outputs):
+                        if item.status == "error":
+                            errors[pending_keys[i]] = item.error
+                            continue
+
+                        classified[pending_keys[i]] = (item.topics, item.sentiments)
+                        if self._near_duplicates:
+                            review = pending_reviews[i]
+                            self._near_duplicates.add(review.text, review.id, item.topics, item.sentiments)
+
+                    if self._cache:
+                        await self._cache.set_many(classified)
+                    if meta is not None:
+                        meta.errors += sum(len(positions[key]) for key in errors)
+                    yield self._expand(reviews, positions, classified, errors)
+        finally:
+            for future in futures:
+                future.cancel()
+
+    @staticmethod
+    def _expand(
+        reviews: list[ReviewInput] | list[ReviewInputWithMetadata],
+        positions: dict[str, list[int]],
+        classified: dict[str, tuple[list[str], list[str]]],
+        errors: dict[str, str] | None = None,
+    ) -> list[tuple[int, ReviewOutput]]:
+        """Раздать результаты по ключам всем отзывам запроса с этим ключом"""
+        chunk = []
+        for key, (topics, sentiments) in classified.items():
+            for i in positions[key]:
+                chunk.append(
+                    (i, ReviewOutput(id=reviews[i].id, topics=list(topics), sentiments=list(sentiments)))
+                )
+        for key, error in (errors or {}).items():
+            for i in positions[key]:
+                chunk.append(
+                    (i, ReviewOutput(id=reviews[i].id, topics=[], sentiments=[], status="error", error=error))
+                )
+        return chunk
 
     async def _predict_batch(self, reviews: list[ReviewInput] | list[ReviewInputWithMetadata]) -> list[ReviewOutput]:
-        """Предсказание для одного батча отзывов
+        """Предсказание для батча с изоляцией ошибок
+
+        Если ответ модели не удалось разобрать, батч повторяется
+        PARSE_RETRY_ATTEMPTS раз, затем делится пополам — вплоть до
+        отдельных отзывов. Так один «ломающий» отзыв не отменяет
+        результаты остальных. Отзыв, который так и не удалось разобрать,
+        и отзывы батча, упавшего по другой причине, возвращаются со
+        статусом error.
+
+        Args:
+            reviews: Батч отзывов (с метаданными или без)
+
+        Returns:
+            list[ReviewOutput]: Результат для каждого отзыва батча
+        """
+        parse_error: ValueError | None = None
+        for attempt in range(settings.PARSE_RETRY_ATTEMPTS):
+            try:
+                return await self._classify_batch(reviews)
+            except ValueError as e:
+                parse_error = e
+                print(f"Не удалось разобрать ответ модели для батча из {len(reviews)} отзывов (попытка {attempt + 1}): {e}")
+            except Exception as e:
+                return [self._error_output(review, f"Ошибка модели: {e}") for review in reviews]
+
+        if len(reviews) == 1:
+            return [self._error_output(reviews[0], str(parse_error))]
+
+        # Половины обрабатываются по очереди в слоте того же батча планировщика,
+        # чтобы деление не обходило MAX_CONCURRENT_REQUESTS и очередь запросов
+        middle = len(reviews) // 2
+        left = await self._predict_batch(reviews[:middle])
+        right = await self._predict_batch(reviews[middle:])
+        return left + right
+
+    @staticmethod
+    def _error_output(review: ReviewInput | ReviewInputWithMetadata, error: str) -> ReviewOutput:
+        return ReviewOutput(id=review.id, topics=[], sentiments=[], status="error", error=error)
+
+    async def _classify_batch(self, reviews: list[ReviewInput] | list[ReviewInputWithMetadata]) -> list[ReviewOutput]:
+        """Один вызов графа классификации для батча
 
         Args:
             reviews: Батч отзывов (с метаданными или без)
 
         Returns:
             list[ReviewOutput]: Список классифицированных отзывов
+
+        Raises:
+            ValueError: Ответ модели не удалось разобрать
         """
         review_texts = [review.text for review in reviews]
 
-        result = await classification_agent.ainvoke(
+        result = await get_classification_agent().ainvoke(
             {
                 "reviews": review_texts,
                 "available_categories": self.available_categories,
+                "ratings": [review.rating for review in reviews],
+                "rating_sentiments": self._rating_policy.mapping if self._rating_policy else {},
+                # Маленькие батчи — интерактивные запросы дашборда, им важен хвост задержки
+                "hedge": len(reviews) <= settings.LLM_HEDGE_MAX_BATCH_SIZE,
             }
         )
 
@@ -93,12 +379,86 @@ class ClassificationService:
         return classifications
 
 
+def prediction_text_hash(text: str) -> str:
+    """Хэш текста отзыва для stored_predictions
+
+    Args:
+        text (str): Текст отзыва
+
+    Returns:
+        str: sha256 текста без крайних пробелов в hex
+    """
+    return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+
+def pack_batches(
+    texts: list[str],
+    token_budget: int | None = None,
+    max_batch_size: int | None = None,
+    long_review_tokens: int | None = None,
+) -> list[list[int]]:
+    """Разбиение отзывов на батчи по оценке токенов
+
+    Отзывы добавляются в батч по порядку, пока суммарная оценка токенов не
+    превысит бюджет промпта или не наберётся max_batch_size отзывов.
+    Длинные отзывы отправляются отдельным вызовом, чтобы не раздувать
+    батч с короткими и не упираться в контекст модели.
+
+    Args:
+        texts (list[str]): Тексты отзывов
+        token_budget (int | None): Бюджет токенов текста на батч (по умолчанию PROMPT_TOKEN_BUDGET)
+        max_batch_size (int | None): Максимум отзывов в батче (по умолчанию BATCH_SIZE)
+        long_review_tokens (int | None): Порог длинного отзыва (по умолчанию LONG_REVIEW_TOKENS)
+
+    Returns:
+        list[list[int]]: Индексы отзывов для каждого батча
+    """
+    token_budget = token_budget or settings.PROMPT_TOKEN_BUDGET
+    max_batch_size = max_batch_size or settings.BATCH_SIZE
+    long_review_tokens = long_review_tokens or settings.LONG_REVIEW_TOKENS
+
+    batches: list[list[int]] = []
+    current: list[int] = []
+    current_tokens = 0
+
+    for i, text in enumerate(texts):
+        # Длинный отзыв определяется по полному тексту: в промпте он обрезан
+        # до REVIEW_MAX_TOKENS и порог LONG_REVIEW_TOKENS иначе недостижим
+        if estimate_tokens(normalize_review_text(text)) >= long_review_tokens:
+            batches.append([i])
+            continue
+
+        # Бюджет батча считаем по тексту в том виде, в каком он попадёт в промпт
+        tokens = estimate_tokens(clean_review_text(text))
+
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+
+        current.append(i)
+        current_tokens += tokens
+
+    if current:
+        batches.append(current)
+
+    return batches
+
+
+# Синглтон сервиса: лимиты и очередь общие для всех запросов
+_service_instance: ClassificationService | None = None
+
+
 def get_classification_service() -> ClassificationService:
-    """Получить экземпляр сервиса классификации
+    """Получить синглтон сервиса классификации
 
     Returns:
         ClassificationService: Сервис классификации
     """
+    global _service_instance
+    if _service_instance is not None:
+        return _service_instance
+
     available_categories = [
             "Дебетовые карты",
             "Кредитные карты",
@@ -113,4 +473,45 @@ def get_classification_service() -> ClassificationService:
             "Обслуживание",
             "Прочее",
         ]
-    return ClassificationService(available_categories=available_categories)
+    cache = (
+        ClassificationCache(write_session_maker, settings.CLASSIFICATION_CACHE_MEMORY_SIZE)
+        if settings.CLASSIFICATION_CACHE_ENABLED
+        else None
+    )
+    near_duplicates = (
+        NearDuplicateIndex(
+            threshold=settings.NEAR_DUPLICATE_THRESHOLD,
+            num_perm=settings.NEAR_DUPLICATE_NUM_PERM,
+            bands=settings.NEAR_DUPLICATE_BANDS,
+            min_shingles=settings.NEAR_DUPLICATE_MIN_SHINGLES,
+            max_entries=settings.NEAR_DUPLICATE_MAX_ENTRIES,
+            retry_seconds=settings.NEAR_DUPLICATE_HYDRATE_RETRY_SECONDS,
+            retry_max_seconds=settings.NEAR_DUPLICATE_HYDRATE_RETRY_MAX_SECONDS,
+        )
+        if settings.NEAR_DUPLICATE_ENABLED
+        else None
+    )
+    fast_classifier = None
+    if settings.FAST_CLASSIFIER_ENABLED and os.path.exists(settings.FAST_CLASSIFIER_PATH):
+        fast_classifier = FastClassifier.load(settings.FAST_CLASSIFIER_PATH)
+        print(f"Локальный классификатор загружен: {settings.FAST_CLASSIFIER_PATH}")
+
+    rating_policy = (
+        RatingSentimentPolicy(
+            min_precision=settings.RATING_POLICY_MIN_PRECISION,
+            min_support=settings.RATING_POLICY_MIN_SUPPORT,
+            ratings=settings.RATING_POLICY_RATINGS,
+        )
+        if settings.RATING_POLICY_ENABLED
+        else None
+    )
+
+    _service_instance = ClassificationService(
+        available_categories=available_categories,
+        scheduler=get_scheduler(),
+        cache=cache,
+        near_duplicates=near_duplicates,
+        fast_classifier=fast_classifier,
+        rating_policy=rating_policy,
+    )
+    return _service_instance
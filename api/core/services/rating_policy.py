@@ -0,0 +1,75 @@
+"""Тональность по оценке отзыва вместо этапа тональности LLM."""
+
+import asyncio
+
+from sqlalchemy.orm import sessionmaker
+
+from api.core.db.review_crud import get_rating_sentiment_counts
+
+
+def learn_rating_sentiments(
+    counts: list[tuple[int, str, int]], min_precision: float, min_support: int, ratings: set[int]
+) -> dict[int, str]:
+    """Выбрать оценки, по которым тональность однотемного отзыва предсказуема
+
+    Args:
+        counts (list[tuple[int, str, int]]): (оценка, тональность, количество) из разметки
+        min_precision (float): Минимальная доля преобладающей тональности
+        min_support (int): Минимум размеченных отзывов с оценкой
+        ratings (set[int]): Оценки-кандидаты (крайние), остальные всегда идут в LLM
+
+    Returns:
+        dict[int, str]: Оценка -> тональность, только для оценок из ratings
+    """
+    by_rating: dict[int, dict[str, int]] = {}
+    for rating, sentiment, count in counts:
+        if rating in ratings:
+            by_rating.setdefault(rating, {})[sentiment] = count
+
+    mapping = {}
+    for rating, sentiments in by_rating.items():
+        total = sum(sentiments.values())
+        sentiment, count = max(sentiments.items(), key=lambda item: item[1])
+        if total >= min_support and count / total >= min_precision:
+            mapping[rating] = sentiment
+    return mapping
+
+
+class RatingSentimentPolicy:
+    """Соответствие оценка -> тональность, выученное по разметке в базе."""
+
+    def __init__(self, min_precision: float, min_support: int, ratings: set[int]):
+        """Инициализация политики
+
+        Args:
+            min_precision (float): Минимальная доля преобладающей тональности
+            min_support (int): Минимум размеченных отзывов с оценкой
+            ratings (set[int]): Оценки, для которых допускается тональность без LLM
+        """
+        self.min_precision = min_precision
+        self.min_support = min_support
+        self.ratings = ratings
+        self.mapping: dict[int, str] = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    async def load(self, session_maker: sessionmaker) -> None:
+        """Однократно выучить соответствие по базе
+
+        Args:
+            session_maker (sessionmaker): Фабрика сессий для чтения
+        """
+        if self._loaded:
+            return
+
+        async with self._lock:
+            if self._loaded:
+                return
+            try:
+                async with session_maker() as session:
+                    counts = await get_rating_sentiment_counts(session)
+                self.mapping = learn_rating_sentiments(counts, self.min_precision, self.min_support, self.ratings)
+                print(f"Тональность по оценке: {self.mapping}")
+            except Exception as e:
+                print(f"Не удалось выучить тональность по оценке: {e}")
+            self._loaded = True
@@ -0,0 +1,23 @@
+"""Общий для процесса планировщик батчей классификации."""
+
+from api.core.scheduling import ClassificationScheduler, SchedulerSaturatedError
+from api.core.settings import settings
+
+
+# Синглтон планировщика
+_scheduler_instance: ClassificationScheduler | None = None
+
+
+def get_scheduler() -> ClassificationScheduler:
+    """Получить синглтон планировщика
+
+    Returns:
+        ClassificationScheduler: Общий для процесса планировщик
+    """
+    global _scheduler_instance
+    if _scheduler_instance is None:
+        _scheduler_instance = ClassificationScheduler(
+            max_concurrency=settings.MAX_CONCURRENT_REQUESTS,
+            max_queue_size=settings.MAX_QUEUED_BATCHES,
+        )
+    return _scheduler_instance
@@ -1,5 +1,8 @@
 from dotenv import load_dotenv
 import os
+from pathlib import Path
+from typing import Literal
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -11,6 +14,25 @@ DB_NAME = os.environ.get('DB_NAME')
 DB_PASS = os.environ.get('DB_PASS')
 DB_PORT = os.environ.get('DB_PORT')
 
+# Реплика для аналитических запросов (необязательна)
+DB_REPLICA_HOST = os.environ.get('DB_REPLICA_HOST')
+DB_REPLICA_PORT = os.environ.get('DB_REPLICA_PORT', DB_PORT)
+
+
+class LLMBackendSettings(BaseModel):
+    """Бэкенд модели в пуле LLM_BACKENDS"""
+
+    name: str
+    # gemini — Google AI Studio, openai — любой OpenAI-совместимый API (OpenRouter, vLLM, заглушки)
+    provider: Literal["gemini", "openai"] = "gemini"
+    model: str
+    api_key: str
+    base_url: str | None = None
+    requests_per_minute: int = 30
+    tokens_per_minute: int | None = None
+    request_burst: int | None = None
+    token_burst: int | None = None
+
 
 class Settings(BaseSettings):
     """Настройки приложения"""
@@ -18,11 +40,136 @@ class Settings(BaseSettings):
     PROJECT_NAME: str = "Review Analysis API"
 
     LLM_NAME: str = "models/gemma-3-27b-it"
-    GOOGLE_API_KEY: str
+    # Без ключа API работает, но классификация возвращает ошибки
+    GOOGLE_API_KEY: str | None = None
+    # Проверка модели в фоне при старте, результат — в /api/ready
+    LLM_PROBE_ON_STARTUP: bool = True
+    LLM_PROBE_TIMEOUT: float = 30.0
 
-    BATCH_SIZE: int = 15
+    # Батчи собираются по оценке токенов: не больше PROMPT_TOKEN_BUDGET
+    # токенов текста и не больше BATCH_SIZE отзывов, длинные отзывы —
+    # отдельным вызовом
+    BATCH_SIZE: int = 40
+    PROMPT_TOKEN_BUDGET: int = 6000
+    LONG_REVIEW_TOKENS: int = 2000
+    # Отзыв в промпте обрезается до этого числа токенов
+    REVIEW_MAX_TOKENS: int = 1500
     MAX_CONCURRENT_REQUESTS: int = 10
+    MAX_QUEUED_BATCHES: int = 200
     RATE_LIMIT_PER_MINUTE: int = 30
+    RATE_LIMIT_BURST: int | None = None
+    TOKENS_PER_MINUTE_LIMIT: int | None = 15000
+    TOKEN_LIMIT_BURST: int | None = None
+
+    # Пул бэкендов модели (JSON-список LLMBackendSettings): у каждого свои
+    # ключ и квоты, запрос уходит бэкенду с наименьшей оценкой ожидания —
+    # очередь и EWMA задержки. Пустой список — один Gemini-бэкенд из
+    # GOOGLE_API_KEY, LLM_NAME и квот выше. Ключ кэша классификации включает
+    # все модели пула, поэтому бэкенды лучше держать на одной модели:
+    # иначе разметка зависит от того, какой бэкенд ответил
+    LLM_BACKENDS: list[LLMBackendSettings] = []
+    LLM_LATENCY_EWMA_ALPHA: float = 0.2
+    LLM_INITIAL_LATENCY_SECONDS: float = 5.0
+
+    # Hedging: если вызов маленького батча (до LLM_HEDGE_MAX_BATCH_SIZE
+    # отзывов) не ответил за LLM_HEDGE_QUANTILE задержек последних вызовов,
+    # дубль уходит на другой бэкенд, побеждает первый ответ. Дублей не
+    # больше LLM_HEDGE_BUDGET_RATIO от всех вызовов модели
+    LLM_HEDGE_ENABLED: bool = False
+    LLM_HEDGE_MAX_BATCH_SIZE: int = 5
+    LLM_HEDGE_QUANTILE: float = 0.95
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_HEDGE_MIN_DELAY: float = 0.5
+    LLM_HEDGE_BUDGET_RATIO: float = 0.05
+
+    # Повторы вызовов модели при 429, 5xx и сетевых ошибках: экспоненциальная
+    # пауза с джиттером, Retry-After провайдера имеет приоритет
+    LLM_RETRY_ATTEMPTS: int = 4
+    LLM_RETRY_BASE_DELAY: float = 1.0
+    LLM_RETRY_MAX_DELAY: float = 60.0
+    # После LLM_CIRCUIT_FAILURE_THRESHOLD ошибок подряд вызовы провайдера
+    # сразу отклоняются LLM_CIRCUIT_RECOVERY_SECONDS секунд, затем
+    # пропускается один пробный вызов
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    LLM_CIRCUIT_RECOVERY_SECONDS: float = 30.0
+
+    # Режим графа: two_stage — категории и тональности двумя вызовами,
+    # combined — одним вызовом, pipelined — категории стримом, тональности
+    # частями по мере разбора категорий
+    CLASSIFICATION_MODE: Literal["two_stage", "combined", "pipelined"] = "two_stage"
+    PIPELINE_SENTIMENT_CHUNK_SIZE: int = 10
+    # Формат ответа модели: json — названия категорий и тональностей,
+    # compact — строки "review_id: номера категорий" и коды тональностей п/н/о
+    # (меньше токенов ответа)
+    LLM_OUTPUT_FORMAT: Literal["json", "compact"] = "json"
+
+    # Повторы батча при неразбираемом ответе модели до деления батча пополам
+    PARSE_RETRY_ATTEMPTS: int = 2
+    # Дополнительные вызовы только для отзывов, пропущенных в ответе модели
+    MISSING_REVIEWS_REASK_ATTEMPTS: int = 1
+
+    # Кэш результатов классификации (in-memory LRU перед таблицей в Postgres)
+    CLASSIFICATION_CACHE_ENABLED: bool = True
+    CLASSIFICATION_CACHE_MEMORY_SIZE: int = 10000
+
+    # Переиспользование разметки почти-дубликатов (MinHash LSH)
+    NEAR_DUPLICATE_ENABLED: bool = True
+    NEAR_DUPLICATE_THRESHOLD: float = 0.85
+    NEAR_DUPLICATE_NUM_PERM: int = 64
+    NEAR_DUPLICATE_BANDS: int = 16
+    NEAR_DUPLICATE_MIN_SHINGLES: int = 5
+    NEAR_DUPLICATE_MAX_ENTRIES: int = 100000
+    # Пауза перед повторной загрузкой индекса после ошибки базы (удваивается до максимума)
+    NEAR_DUPLICATE_HYDRATE_RETRY_SECONDS: float = 5.0
+    NEAR_DUPLICATE_HYDRATE_RETRY_MAX_SECONDS: float = 300.0
+
+    # Локальный классификатор (python -m api.train_fast_classifier):
+    # отзывы с уверенностью не ниже порога размечаются без LLM
+    FAST_CLASSIFIER_ENABLED: bool = True
+    FAST_CLASSIFIER_PATH: str = str(Path(__file__).parent.parent / "fast_classifier.json.gz")
+    FAST_CLASSIFIER_THRESHOLD: float = 0.9
+
+    # Тональность по оценке: крайние оценки (RATING_POLICY_RATINGS), у которых
+    # в разметке однотемных отзывов преобладающая тональность не реже
+    # MIN_PRECISION, пропускают этап тональности LLM
+    RATING_POLICY_ENABLED: bool = True
+    RATING_POLICY_RATINGS: set[int] = {1, 5}
+    RATING_POLICY_MIN_PRECISION: float = 0.9
+    RATING_POLICY_MIN_SUPPORT: int = 200
+
+    # Фоновые задачи классификации (/api/predict/jobs)
+    JOB_WORKERS: int = 2
+    JOB_CHUNK_SIZE: int = 200
+    JOB_POLL_INTERVAL: float = 5.0
+    JOB_LEASE_SECONDS: int = 300
+
+    # Оценка токенов для резервирования бюджета до вызова модели
+    CHARS_PER_TOKEN: float = 3.0
+    COMPLETION_TOKENS_ESTIMATE: int = 600
+
+    # Пул на запись (сидирование, загрузка, predict)
+    DB_WRITE_POOL_SIZE: int = 5
+    DB_WRITE_MAX_OVERFLOW: int = 5
+    DB_WRITE_POOL_TIMEOUT: float = 30.0
+
+    # Пул на чтение (аналитика дашборда)
+    DB_READ_POOL_SIZE: int = 15
+    DB_READ_MAX_OVERFLOW: int = 10
+    DB_READ_POOL_TIMEOUT: float = 10.0
+
+    # Допустимое отставание реплики, после которого чтение идёт в primary
+    DB_REPLICA_MAX_LAG_SECONDS: float = 30.0
+    DB_REPLICA_LAG_CHECK_INTERVAL: float = 5.0
+
+    # Кэш скомпилированных запросов SQLAlchemy и prepared statements asyncpg
+    DB_QUERY_CACHE_SIZE: int = 1000
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 500
+
+    # statement_timeout для аналитических эндпоинтов (мс)
+    ANALYTICS_STATEMENT_TIMEOUT_MS: int = 15000
+    HEAVY_ANALYTICS_STATEMENT_TIMEOUT_MS: int = 30000
+    # Через сколько секунд клиенту предлагается повторить запрос после 503
+    DB_TIMEOUT_RETRY_AFTER_SECONDS: int = 5
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -35,6 +182,10 @@ settings = Settings()
 
 
 DATABASE_URL = f'postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+REPLICA_DATABASE_URL = (
+    f'postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_REPLICA_HOST}:{DB_REPLICA_PORT}/{DB_NAME}'
+    if DB_REPLICA_HOST else None
+)
 ALEBMIC_URL = f'postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}/{DB_NAME}'
 DATE_FORMAT = '%m/%d/%Y %H:%M UTC' #%m/%d/%Y - 
 # '6/29/2011 4:52:48 AM UTC'
\ No newline at end of file
@@ -1,4 +1,8 @@
+import json
+
 from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Any
 from datetime import datetime
@@ -11,19 +15,38 @@ from api.core.db.review_crud import (
     get_all_available_topics,
     get_topics_statistics,
     get_topics_comparison,
+    get_multi_interval_statistics,
+    get_topic_detail,
 )
+from api.core.db.job_crud import create_job, get_job, get_job_items
 from api.core.schemas import (
     ReviewSchema,
     PredictRequest,
+    PredictMeta,
     PredictResponse,
+    PredictJobCreated,
+    PredictJobStatus,
+    ReviewOutput,
     IntervalRequestSchema,
     TopicsStatisticsResponse,
     TopicsStatisticsRequest,
     TopicsComparisonResponseSchema,
     AvailableTopicsResponse,
+    MultiIntervalRequest,
+    MultiIntervalResponse,
+    TopicDetailResponse,
+)
+from api.core.database import (
+    get_read_session_with_timeout,
+    get_write_session,
+)
+from api.core.settings import settings
+from api.core.services import (
+    SchedulerSaturatedError,
+    get_classification_service,
+    get_job_runner,
+    get_scheduler,
 )
-from api.core.database import get_async_session
-from api.core.services.predict import get_classification_service
 
 router = APIRouter(prefix="/api")
 
@@ -32,7 +55,9 @@ router = APIRouter(prefix="/api")
 async def read_reviews(
     start_date: datetime = Query(..., description="Начало интервала (YYYY-MM-DD)"),
     end_date: datetime | None = Query(None, description="Конец интервала (YYYY-MM-DD)"),
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(
+        get_read_session_with_timeout(settings.ANALYTICS_STATEMENT_TIMEOUT_MS)
+    ),
 ):
     """
     Получить список уже предсказанных отзывов за указанный интервал времени.
@@ -45,7 +70,9 @@ async def read_reviews(
 @router.post("/reviews/stats")
 async def read_reviews_stats(
     request: IntervalRequestSchema,
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(
+        get_read_session_with_timeout(settings.ANALYTICS_STATEMENT_TIMEOUT_MS)
+    ),
 ):
     """
     Получить отзывы по времени с разными шкалами деления
@@ -70,6 +97,8 @@ async def read_reviews_stats(
         }
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except (DBAPIError, PoolTimeoutError):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal server error")
 
@@ -77,7 +106,11 @@ async def read_reviews_stats(
 @router.post("/predict", response_model=PredictResponse)
 async def predict(
     data: PredictRequest,
-    session: AsyncSession = Depends(get_async_session),
+    idempotent: bool = Query(
+        False,
+        description="Возвращать сохранённые предсказания для тех же id и текста и сохранять новые",
+    ),
+    session: AsyncSession = Depends(get_write_session),
 ):
     """
     Получить список предсказаний для определённых отзывов.
@@ -88,24 +121,171 @@ async def predict(
         )
     try:
         service = get_classification_service()
-        result = await service.predict(data.data)
+        meta = PredictMeta()
+        if idempotent:
+            result = await service.predict_idempotent(session, data.data, meta=meta)
+        else:
+            result = await service.predict(data.data, meta=meta)
 
-        return PredictResponse(predictions=result)
+        return PredictResponse(predictions=result, meta=meta)
 
+    except SchedulerSaturatedError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        ) from e
     except ValueError as e:
         raise HTTPException(
             status_code=400, detail=f"Неверный формат данных: {str(e)}"
         ) from e
+    except (DBAPIError, PoolTimeoutError):
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Ошибка обработки: {str(e)}"
         ) from e
 
 
+@router.post("/predict/stream")
+async def predict_stream(data: PredictRequest) -> StreamingResponse:
+    """
+    Потоковое предсказание в формате NDJSON: по строке на событие.
+
+    События: start (сразу после постановки в очередь), results (по мере
+    готовности батчей, с прогрессом completed/total), done и error.
+    """
+    if not data.data:
+        raise HTTPException(
+            status_code=400, detail="Список отзывов не должен быть пустым"
+        )
+
+    service = get_classification_service()
+    meta = PredictMeta()
+    chunks = service.predict_stream(data.data, meta=meta)
+
+    # Первый шаг выполняем до ответа, чтобы переполнение очереди вернуло 429
+    try:
+        first_chunk = await anext(chunks)
+    except SchedulerSaturatedError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        ) from e
+
+    async def events():
+        total = len(data.data)
+        completed = 0
+
+        def line(event: Dict[str, Any]) -> str:
+            return json.dumps(event, ensure_ascii=False) + "\n"
+
+        yield line({"type": "start", "total": total, "meta": meta.model_dump()})
+        try:
+            chunk = first_chunk
+            while True:
+                if chunk:
+                    completed += len(chunk)
+                    yield line(
+                        {
+                            "type": "results",
+                            "predictions": [item.model_dump() for _, item in chunk],
+                            "completed": completed,
+                            "total": total,
+                        }
+                    )
+                try:
+                    chunk = await anext(chunks)
+                except StopAsyncIteration:
+                    break
+        except Exception as e:
+            yield line({"type": "error", "detail": f"Ошибка обработки: {str(e)}"})
+            return
+        finally:
+            await chunks.aclose()
+
+        yield line({"type": "done", "completed": completed, "total": total, "meta": meta.model_dump()})
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@router.post("/predict/jobs", response_model=PredictJobCreated, status_code=202)
+async def create_predict_job(
+    data: PredictRequest,
+    session: AsyncSession = Depends(get_write_session),
+):
+    """
+    Поставить большой набор отзывов в фоновую классификацию.
+    Прогресс и результаты — GET /api/predict/jobs/{job_id}.
+    """
+    if not data.data:
+        raise HTTPException(
+            status_code=400, detail="Список отзывов не должен быть пустым"
+        )
+
+    job = await create_job(
+        session,
+        [{"id": review.id, "text": review.text, "rating": review.rating} for review in data.data],
+    )
+    get_job_runner().notify()
+
+    return PredictJobCreated(job_id=job.id, status=job.status, total=job.total)
+
+
+@router.get("/predict/jobs/{job_id}", response_model=PredictJobStatus)
+async def get_predict_job(
+    job_id: str,
+    offset: int = Query(0, ge=0, description="Позиция первого отзыва страницы"),
+    limit: int = Query(100, ge=1, le=1000, description="Размер страницы"),
+    session: AsyncSession = Depends(get_write_session),
+):
+    """
+    Прогресс задачи классификации и страница готовых результатов.
+    """
+    job = await get_job(session, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+
+    items = await get_job_items(session, job_id, offset, limit)
+    return PredictJobStatus(
+        job_id=job.id,
+        status=job.status,
+        total=job.total,
+        completed=job.completed,
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+        offset=offset,
+        limit=limit,
+        predictions=[
+            ReviewOutput(
+                id=item.review_id,
+                topics=item.topics,
+                sentiments=item.sentiments,
+                status="error" if item.error else "ok",
+                error=item.error,
+            )
+            for item in items
+            if item.topics is not None
+        ],
+    )
+
+
+@router.get("/predict/scheduler")
+async def get_predict_scheduler_stats() -> Dict[str, Any]:
+    """
+    Метрики очереди классификации: глубина, время ожидания, отказы
+    """
+    return {"status": "success", "data": get_scheduler().stats()}
+
+
 @router.post("/dashboard/overview")
 async def get_dashboard_overview(
     request: IntervalRequestSchema,
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(
+        get_read_session_with_timeout(settings.ANALYTICS_STATEMENT_TIMEOUT_MS)
+    ),
 ) -> Dict[str, Any]:
     """
     Общая статистика дашборда за интервал
@@ -133,7 +313,9 @@ async def get_dashboard_overview(
 @router.post("/dashboard/topic-trends")
 async def get_dashboard_topic_trends(
     request: IntervalRequestSchema,
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(
+        get_read_session_with_timeout(settings.ANALYTICS_STATEMENT_TIMEOUT_MS)
+    ),
 ) -> Dict[str, Any]:
     """
     Динамика топ-тем за интервал
@@ -161,7 +343,9 @@ async def get_dashboard_topic_trends(
 @router.post("/dashboard/sentiment-dynamics")
 async def get_dashboard_sentiment_dynamics(
     request: IntervalRequestSchema,
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(
+        get_read_session_with_timeout(settings.ANALYTICS_STATEMENT_TIMEOUT_MS)
+    ),
 ) -> Dict[str, Any]:
     """
     Динамика тональности за интервал
@@ -189,7 +373,9 @@ async def get_dashboard_sentiment_dynamics(
 @router.post("/dashboard/comprehensive")
 async def get_comprehensive_dashboard(
     request: IntervalRequestSchema,
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(
+        get_read_session_with_timeout(settings.HEAVY_ANALYTICS_STATEMENT_TIMEOUT_MS)
+    ),
 ) -> Dict[str, Any]:
     """
     Все данные дашборда в одном запросе
@@ -241,10 +427,48 @@ async def get_comprehensive_dashboard(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/dashboard/intervals", response_model=MultiIntervalResponse)
+async def get_dashboard_intervals(
+    request: MultiIntervalRequest,
+    session: AsyncSession = Depends(
+        get_read_session_with_timeout(settings.HEAVY_ANALYTICS_STATEMENT_TIMEOUT_MS)
+    ),
+):
+    """
+    Сравнение нескольких интервалов (например, «этот месяц / прошлый месяц /
+    тот же месяц год назад») за один проход по данным
+    """
+    try:
+        stats = await get_multi_interval_statistics(
+            session=session,
+            windows=[window.model_dump() for window in request.windows],
+            topic_names=request.topics,
+        )
+
+        return {
+            "status": "success",
+            "data": stats,
+            "meta": {
+                "windows": [window.name for window in request.windows],
+                "start_date": min(w.start_date for w in request.windows).isoformat(),
+                "end_date": max(w.end_date for w in request.windows).isoformat(),
+                "topics_analyzed": request.topics,
+            },
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (DBAPIError, PoolTimeoutError):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
 @router.post("/topics/statistics", response_model=TopicsStatisticsResponse)
 async def get_topics_statistics_endpoint(  # Изменили имя функции
     request: TopicsStatisticsRequest,
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(
+        get_read_session_with_timeout(settings.ANALYTICS_STATEMENT_TIMEOUT_MS)
+    ),
 ):
     """
     Получить статистику по выбранным темам в интервалах времени
@@ -272,6 +496,8 @@ async def get_topics_statistics_endpoint(  # Изменили имя функц
         }
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except (DBAPIError, PoolTimeoutError):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
@@ -279,7 +505,9 @@ async def get_topics_statistics_endpoint(  # Изменили имя функц
 @router.post("/topics/comparison", response_model=TopicsComparisonResponseSchema)
 async def get_topics_comparison_endpoint(
     request: TopicsStatisticsRequest,
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(
+        get_read_session_with_timeout(settings.ANALYTICS_STATEMENT_TIMEOUT_MS)
+    ),
 ):
     """
     Сравнительная статистика по темам за весь период (без разбивки по интервалам)
@@ -305,13 +533,57 @@ async def get_topics_comparison_endpoint(
         }
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except (DBAPIError, PoolTimeoutError):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.post("/topics/{name}/detail", response_model=TopicDetailResponse)
+async def get_topic_detail_endpoint(
+    name: str,
+    request: IntervalRequestSchema,
+    session: AsyncSession = Depends(
+        get_read_session_with_timeout(settings.ANALYTICS_STATEMENT_TIMEOUT_MS)
+    ),
+):
+    """
+    Разбивка по интервалам и сводка за весь период для одной темы
+    (объединяет /topics/statistics и /topics/comparison в один проход)
+    """
+    try:
+        detail = await get_topic_detail(
+            session=session,
+            topic_name=name,
+            start_date=request.start_date,
+            end_date=request.end_date,
+            mode=request.mode,
+        )
+
+        return {
+            "status": "success",
+            "data": detail,
+            "meta": {
+                "mode": request.mode,
+                "start_date": request.start_date.isoformat(),
+                "end_date": request.end_date.isoformat(),
+                "topic": name,
+                "total_periods": len(detail["statistics"]),
+            },
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (DBAPIError, PoolTimeoutError):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
 @router.get("/topics/available", response_model=AvailableTopicsResponse)
 async def get_available_topics_endpoint(
-    session: AsyncSession = Depends(get_async_session),
+    session: AsyncSession = Depends(
+        get_read_session_with_timeout(settings.ANALYTICS_STATEMENT_TIMEOUT_MS)
+    ),
 ):
     """
     Получить список всех доступных тем для выбора
@@ -321,6 +593,8 @@ async def get_available_topics_endpoint(
         topics = await get_all_available_topics(session)
 
         return {"status": "success", "data": topics, "count": len(topics)}
+    except (DBAPIError, PoolTimeoutError):
+        raise
     except Exception as e:
         print(f"Error in /topics/available endpoint: {e}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
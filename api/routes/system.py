@@ -0,0 +1,42 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse
+
+from api.core.agent.utils import circuit_breakers, get_llm_readiness, get_llm_stats, probe_llm
+from api.core.metrics import metrics
+
+router = APIRouter(prefix="/api")
+
+
+@router.get("/metrics")
+async def get_metrics() -> Dict[str, Any]:
+    """
+    Метрики процесса: повторы и ошибки вызовов модели, состояние бэкендов и их circuit breaker
+    """
+    return {
+        "status": "success",
+        "data": {
+            **metrics.snapshot(),
+            "circuit_breakers": {provider: breaker.stats() for provider, breaker in circuit_breakers.items()},
+            "llm": get_llm_stats(),
+        },
+    }
+
+
+@router.get("/ready")
+async def get_readiness(
+    require_llm: bool = Query(False, description="Считать сервис неготовым, пока модель недоступна"),
+    recheck: bool = Query(False, description="Проверить модель заново, а не вернуть результат последней проверки"),
+) -> JSONResponse:
+    """
+    Готовность сервиса. Дашборд готов сразу после старта, состояние модели
+    (pending, ready, unavailable) возвращается отдельно и влияет на код
+    ответа только с require_llm
+    """
+    llm = await probe_llm() if recheck else get_llm_readiness()
+    ready = not require_llm or llm["status"] == "ready"
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "success" if ready else "error", "data": {"ready": ready, "llm": llm}},
+    )
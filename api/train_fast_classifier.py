@@ -0,0 +1,101 @@
+"""Обучение локального классификатора на размеченных отзывах из базы.
+
+Запуск из корня репозитория:
+
+    python -m api.train_fast_classifier --epochs 3 --holdout 0.1
+
+Часть отзывов откладывается для проверки: печатается скорость
+предсказания, доля отзывов выше порога уверенности и согласие с
+разметкой LLM — на всех отложенных отзывах и только на уверенных.
+Модель сохраняется в FAST_CLASSIFIER_PATH.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from api.core.database import read_session_maker
+from api.core.db.review_crud import get_labeled_reviews
+from api.core.fast_classifier import FastClassifier, FastPrediction
+from api.core.settings import settings
+
+
+def _agreement(pairs: list[tuple[FastPrediction, list[str], list[str]]]) -> dict[str, float]:
+    """Согласие предсказаний с разметкой: F1-micro по темам, точное совпадение тем,
+    точность тональности на совпавших темах"""
+    tp = fp = fn = exact = sentiment_hits = sentiment_total = 0
+    for prediction, topics, sentiments in pairs:
+        expected = dict(zip(topics, sentiments))
+        predicted = dict(zip(prediction.topics, prediction.sentiments))
+        common = expected.keys() & predicted.keys()
+
+        tp += len(common)
+        fp += len(predicted.keys() - expected.keys())
+        fn += len(expected.keys() - predicted.keys())
+        exact += predicted.keys() == expected.keys()
+        sentiment_total += len(common)
+        sentiment_hits += sum(expected[topic] == predicted[topic] for topic in common)
+
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        "f1_micro": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        "exact_topics": exact / len(pairs) if pairs else 0.0,
+        "sentiment_accuracy": sentiment_hits / sentiment_total if sentiment_total else 0.0,
+    }
+
+
+async def _load_samples(limit: int) -> list[tuple[str, list[str], list[str]]]:
+    async with read_session_maker() as session:
+        labeled = await get_labeled_reviews(session, limit)
+    return [(text, topics, sentiments) for _, text, topics, sentiments in labeled]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Обучение локального классификатора тем и тональностей")
+    parser.add_argument("--output", default=settings.FAST_CLASSIFIER_PATH, help="Куда сохранить модель")
+    parser.add_argument("--limit", type=int, default=100000, help="Максимум отзывов из базы")
+    parser.add_argument("--holdout", type=float, default=0.1, help="Доля отзывов для проверки")
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--buckets", type=int, default=1 << 18, help="Размер пространства хэшей")
+    parser.add_argument("--threshold", type=float, default=settings.FAST_CLASSIFIER_THRESHOLD)
+    args = parser.parse_args()
+
+    samples = asyncio.run(_load_samples(args.limit))
+    random.Random(0).shuffle(samples)
+    split = int(len(samples) * (1 - args.holdout))
+    train, holdout = samples[:split], samples[split:]
+    print(f"Отзывов: {len(samples)} (обучение {len(train)}, проверка {len(holdout)})")
+
+    started = time.perf_counter()
+    model = FastClassifier.train(train, buckets=args.buckets, epochs=args.epochs)
+    print(f"Обучение: {time.perf_counter() - started:.1f} c, тем: {len(model.categories)}")
+
+    if holdout:
+        started = time.perf_counter()
+        predictions = [model.predict(text) for text, _, _ in holdout]
+        elapsed = time.perf_counter() - started
+        print(
+            f"Скорость: {len(holdout) / elapsed:.0f} отзывов/с, "
+            f"{elapsed / len(holdout) * 1e6:.0f} мкс на отзыв"
+        )
+
+        pairs = [(prediction, topics, sentiments) for prediction, (_, topics, sentiments) in zip(predictions, holdout)]
+        confident = [pair for pair in pairs if pair[0].confidence >= args.threshold]
+        print(f"Уверенных (>= {args.threshold}): {len(confident) / len(pairs):.1%} — уйдут мимо LLM")
+
+        for name, subset in (("все", pairs), ("уверенные", confident)):
+            metrics = _agreement(subset)
+            print(
+                f"Согласие с LLM ({name}): F1-micro по темам {metrics['f1_micro']:.3f}, "
+                f"точное совпадение тем {metrics['exact_topics']:.3f}, "
+                f"тональность {metrics['sentiment_accuracy']:.3f}"
+            )
+
+    model.save(args.output)
+    print(f"Модель сохранена: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
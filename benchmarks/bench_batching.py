@@ -0,0 +1,49 @@
+"""Отчёт о разбиении отзывов на батчи: фиксированный размер против бюджета токенов.
+
+Для каждого способа показывает число вызовов LLM, среднее число отзывов
+на вызов и оценку токенов текста на вызов. Запуск из корня репозитория:
+
+    python -m benchmarks.bench_batching path/to/reviews.json
+
+Файл — список объектов с полем "text" (формат transformed_reviews.json)
+или словарь id -> объект (формат парсеров).
+"""
+
+import json
+import statistics
+import sys
+
+from api.core.agent.utils import estimate_tokens
+from api.core.services.predict import pack_batches
+
+FIXED_BATCH_SIZE = 15
+
+
+def _load_texts(path: str) -> list[str]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    items = data.values() if isinstance(data, dict) else data
+    return [item["text"] for item in items if item.get("text")]
+
+
+def _report(name: str, texts: list[str], batches: list[list[int]]) -> None:
+    tokens = [sum(estimate_tokens(texts[i]) for i in batch) for batch in batches]
+    sizes = [len(batch) for batch in batches]
+    print(
+        f"{name:<12} вызовов: {len(batches):>6}  "
+        f"отзывов/вызов: {statistics.mean(sizes):>6.1f}  "
+        f"токенов/вызов: ср. {statistics.mean(tokens):>7.0f}, макс. {max(tokens):>7}"
+    )
+
+
+def main() -> None:
+    texts = _load_texts(sys.argv[1])
+    print(f"Отзывов: {len(texts)}, токенов текста: {sum(estimate_tokens(t) for t in texts)}\n")
+
+    fixed = [list(range(i, min(i + FIXED_BATCH_SIZE, len(texts)))) for i in range(0, len(texts), FIXED_BATCH_SIZE)]
+    _report(f"по {FIXED_BATCH_SIZE}", texts, fixed)
+    _report("по токенам", texts, pack_batches(texts))
+
+
+if __name__ == "__main__":
+    main()
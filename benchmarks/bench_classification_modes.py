@@ -0,0 +1,123 @@
+"""Сравнение режимов графа классификации на размеченной выборке.
+
+Прогоняет одни и те же батчи через двухэтапный граф (категории, затем
+тональности), combined-граф (всё одним вызовом) и pipelined-граф
+(тональности запускаются по мере разбора стрима категорий) в обоих
+форматах ответа модели (LLM_OUTPUT_FORMAT: json и compact) и печатает
+задержку на батч, расход токенов и качество относительно разметки:
+F1-micro по темам, точность тональности на верно найденных темах и
+F1-micro по парам (тема, тональность). Запуск из корня репозитория:
+
+    python -m benchmarks.bench_classification_modes api/transformed_reviews.json 200
+
+Файл — список объектов с полями "text", "review_topics" и "sentiments"
+(формат transformed_reviews.json). Второй аргумент — размер выборки.
+Запросы идут в настоящую модель из настроек.
+"""
+
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+
+from langchain_core.callbacks import get_usage_metadata_callback
+
+from api.core.agent import get_classification_agent
+from api.core.services.predict import get_classification_service, pack_batches
+from api.core.settings import settings
+
+
+def _load_sample(path: str, size: int) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    items = [item for item in data if item.get("text") and item.get("review_topics")]
+    random.Random(0).shuffle(items)
+    return items[:size]
+
+
+def _f1(tp: int, fp: int, fn: int) -> float:
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+
+async def _run_mode(mode: str, output_format: str, sample: list[dict], categories: list[str]) -> None:
+    settings.LLM_OUTPUT_FORMAT = output_format
+    agent = get_classification_agent(mode)
+    texts = [item["text"] for item in sample]
+    batches = pack_batches(texts)
+
+    latencies = []
+    predictions: list[dict[str, str]] = [{} for _ in sample]
+    failed = 0
+
+    with get_usage_metadata_callback() as usage:
+        for batch in batches:
+            started = time.perf_counter()
+            try:
+                result = await agent.ainvoke(
+                    {"reviews": [texts[i] for i in batch], "available_categories": categories}
+                )
+            except Exception as e:
+                failed += 1
+                print(f"[{mode}/{output_format}] батч не обработан: {e}")
+                continue
+            latencies.append(time.perf_counter() - started)
+
+            for position, i in enumerate(batch):
+                topics = result["categories"][position] if position < len(result["categories"]) else []
+                sentiments = result["sentiments"][position] if position < len(result["sentiments"]) else {}
+                predictions[i] = {topic: sentiments.get(topic, "нейтрально") for topic in topics}
+
+    topic_tp = topic_fp = topic_fn = 0
+    pair_tp = pair_fp = pair_fn = 0
+    sentiment_hits = sentiment_total = 0
+    for item, predicted in zip(sample, predictions):
+        expected = dict(zip(item["review_topics"], item["sentiments"]))
+        common = expected.keys() & predicted.keys()
+
+        topic_tp += len(common)
+        topic_fp += len(predicted.keys() - expected.keys())
+        topic_fn += len(expected.keys() - predicted.keys())
+
+        expected_pairs = set(expected.items())
+        predicted_pairs = set(predicted.items())
+        pair_tp += len(expected_pairs & predicted_pairs)
+        pair_fp += len(predicted_pairs - expected_pairs)
+        pair_fn += len(expected_pairs - predicted_pairs)
+
+        sentiment_total += len(common)
+        sentiment_hits += sum(expected[topic] == predicted[topic] for topic in common)
+
+    input_tokens = sum(u.get("input_tokens", 0) for u in usage.usage_metadata.values())
+    output_tokens = sum(u.get("output_tokens", 0) for u in usage.usage_metadata.values())
+
+    print(f"Режим {mode}, формат ответа {output_format}")
+    print(f"  батчей: {len(batches)}, ошибок: {failed}")
+    if latencies:
+        print(
+            f"  задержка на батч: ср. {statistics.mean(latencies):.2f} c, "
+            f"макс. {max(latencies):.2f} c, всего {sum(latencies):.1f} c"
+        )
+    print(f"  токены: вход {input_tokens}, выход {output_tokens}, всего {input_tokens + output_tokens}")
+    print(f"  токенов ответа на отзыв: {output_tokens / len(sample) if sample else 0.0:.1f}")
+    print(f"  F1-micro по темам: {_f1(topic_tp, topic_fp, topic_fn):.3f}")
+    print(f"  точность тональности на верных темах: {sentiment_hits / sentiment_total if sentiment_total else 0.0:.3f}")
+    print(f"  F1-micro по парам (тема, тональность): {_f1(pair_tp, pair_fp, pair_fn):.3f}\n")
+
+
+async def main() -> None:
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    sample = _load_sample(sys.argv[1], size)
+    categories = get_classification_service().available_categories
+    print(f"Отзывов в выборке: {len(sample)}\n")
+
+    for mode in ("two_stage", "combined", "pipelined"):
+        for output_format in ("json", "compact"):
+            await _run_mode(mode, output_format, sample, categories)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
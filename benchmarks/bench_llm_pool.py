@@ -0,0 +1,134 @@
+"""Пропускная способность пула бэкендов модели на локальных заглушках.
+
+Поднимает OpenAI-совместимые заглушки (/v1/chat/completions) с разной
+задержкой и прогоняет одинаковую нагрузку через пулы из 1, 2, ... N
+бэкендов. У каждого бэкенда своя квота запросов в минуту, поэтому
+пропускная способность должна расти с числом бэкендов, а более
+медленные заглушки — получать меньше запросов. Запуск из корня
+репозитория:
+
+    python -m benchmarks.bench_llm_pool --backends 4 --requests 40 --rpm 60
+
+Сеть и ключи провайдеров не нужны.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+
+from api.core.agent.utils import LLM
+from api.core.settings import LLMBackendSettings
+
+
+class _StubServer:
+    """Минимальный HTTP/1.1 сервер с ответом в формате chat.completion"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.requests = 0
+        self.port = 0
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                headers = dict(
+                    line.split(": ", 1) for line in head.decode("latin-1").split("\r\n")[1:] if ": " in line
+                )
+                length = int({k.lower(): v for k, v in headers.items()}.get("content-length", 0))
+                request = json.loads(await reader.readexactly(length)) if length else {}
+
+                self.requests += 1
+                await asyncio.sleep(self.latency)
+
+                body = json.dumps(
+                    {
+                        "id": f"stub-{self.requests}",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": request.get("model", "stub"),
+                        "choices": [
+                            {"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}
+                        ],
+                        "usage": {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11},
+                    }
+                ).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionError):
+            # Клиент закрыл keep-alive соединение или заглушка останавливается
+            pass
+        finally:
+            writer.close()
+
+
+async def _run_pool(servers: list[_StubServer], requests: int, rpm: int) -> None:
+    pool = LLM(
+        backends=[
+            LLMBackendSettings(
+                name=f"stub-{len(servers)}-{i}",
+                provider="openai",
+                model="stub",
+                api_key="stub",
+                base_url=f"http://127.0.0.1:{server.port}/v1",
+                requests_per_minute=rpm,
+                request_burst=1,
+            )
+            for i, server in enumerate(servers)
+        ]
+    )
+    before = [server.requests for server in servers]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(pool.ainvoke(f"Запрос {i}") for i in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    served = Counter({i: server.requests - count for i, (server, count) in enumerate(zip(servers, before))})
+    distribution = ", ".join(
+        f"{servers[i].latency:.2f} c: {served[i]} (EWMA {backend.latency_ewma:.2f} c)"
+        for i, backend in enumerate(pool.backends)
+    )
+    print(f"бэкендов: {len(servers)}  время: {elapsed:6.1f} c  запросов/с: {requests / elapsed:5.2f}")
+    print(f"  по бэкендам (задержка: запросов): {distribution}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Пропускная способность пула бэкендов модели")
+    parser.add_argument("--backends", type=int, default=4, help="Максимальный размер пула")
+    parser.add_argument("--requests", type=int, default=40, help="Запросов на каждый прогон")
+    parser.add_argument("--rpm", type=int, default=60, help="Квота запросов в минуту на бэкенд")
+    parser.add_argument("--latency", type=float, default=0.2, help="Задержка самой быстрой заглушки")
+    args = parser.parse_args()
+
+    # Каждая следующая заглушка медленнее предыдущей
+    servers = [_StubServer(args.latency * (i + 1)) for i in range(args.backends)]
+    for server in servers:
+        await server.start()
+
+    try:
+        size = 1
+        while size <= args.backends:
+            await _run_pool(servers[:size], args.requests, args.rpm)
+            size *= 2
+    finally:
+        for server in servers:
+            await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+"""Отчёт о сжатии промптов: прежняя разметка отзывов против компактной.
+
+Для каждого батча (pack_batches) считает оценку токенов промпта
+категорий с прежней разметкой (блок "N. Отзыв (ID=N):" и разделитель
+из 100 дефисов, сырой текст) и с компактной (строка "[N] текст" после
+clean_review_text), экономию на батч и долю промпта, которая совпадает
+у всех батчей и попадает под кэширование префикса у провайдера.
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_prompt_compaction path/to/reviews.json
+
+Файл — список объектов с полем "text" (формат transformed_reviews.json)
+или словарь id -> объект (формат парсеров).
+"""
+
+import json
+import statistics
+import sys
+
+from api.core.agent.prompts import CLASSIFY_CATEGORY_MULTIPLE_REVIEWS_PROMPT
+from api.core.agent.utils import estimate_tokens, format_reviews
+from api.core.services.predict import get_classification_service, pack_batches
+
+
+def _load_texts(path: str) -> list[str]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    items = data.values() if isinstance(data, dict) else data
+    return [item["text"] for item in items if item.get("text")]
+
+
+def _legacy_format_reviews(reviews: list[str]) -> str:
+    """Разметка отзывов до компактного формата"""
+    formatted_reviews = ""
+    for i, review in enumerate(reviews, 1):
+        formatted_reviews += f"\n{i}. Отзыв (ID={i}):\n{review}\n"
+        formatted_reviews += "-" * 100 + "\n"
+    return formatted_reviews
+
+
+def main() -> None:
+    texts = _load_texts(sys.argv[1])
+    categories = ", ".join(get_classification_service().available_categories)
+    batches = pack_batches(texts)
+
+    def prompt(reviews_block: str) -> int:
+        return estimate_tokens(
+            CLASSIFY_CATEGORY_MULTIPLE_REVIEWS_PROMPT.format(available_categories=categories, reviews=reviews_block)
+        )
+
+    legacy = [prompt(_legacy_format_reviews([texts[i] for i in batch])) for batch in batches]
+    compact = [prompt(format_reviews([texts[i] for i in batch])) for batch in batches]
+    saved = [old - new for old, new in zip(legacy, compact)]
+
+    prefix = CLASSIFY_CATEGORY_MULTIPLE_REVIEWS_PROMPT.split("{reviews}")[0].format(available_categories=categories)
+    prefix_tokens = estimate_tokens(prefix)
+
+    print(f"Отзывов: {len(texts)}, батчей: {len(batches)}\n")
+    print(f"{'':<12}{'ср. на батч':>14}{'макс.':>10}{'всего':>12}")
+    for name, values in (("прежний", legacy), ("компактный", compact), ("экономия", saved)):
+        print(f"{name:<12}{statistics.mean(values):>14.0f}{max(values):>10}{sum(values):>12}")
+    print(f"\nЭкономия: {sum(saved) / sum(legacy):.1%} токенов промпта категорий")
+    print(
+        f"Общий для всех батчей префикс: {prefix_tokens} токенов "
+        f"({prefix_tokens / statistics.mean(compact):.0%} среднего промпта)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Микробенчмарк накладных расходов Python на построение аналитических запросов.
+
+Сравнивает подготовку запроса для одного HTTP-запроса:
+- «до»: дерево select() собирается заново и ключ кэша компиляции
+  вычисляется для нового объекта (так работали функции review_crud раньше);
+- «после»: используется закэшированный объект запроса из review_crud.
+
+В обоих случаях скомпилированный SQL берётся из словаря, как это делает
+кэш компиляции движка SQLAlchemy. Отдельно показана полная компиляция без
+кэша. Запуск из корня репозитория:
+
+    python -m benchmarks.bench_review_crud
+"""
+
+import time
+import warnings
+
+from sqlalchemy.dialects.postgresql import asyncpg
+
+from api.core.db import review_crud
+
+warnings.filterwarnings("ignore")
+
+ITERATIONS = 2000
+
+dialect = asyncpg.dialect()
+
+BUILDERS = {
+    "get_reviews_stats": lambda: review_crud._reviews_stats_query("month"),
+    "get_topic_trends": lambda: review_crud._topic_trends_query("day"),
+    "get_sentiment_dynamics": lambda: review_crud._sentiment_dynamics_query("week"),
+    "get_topics_statistics": lambda: review_crud._topics_statistics_query("month"),
+    "get_topics_comparison": lambda: review_crud._topics_comparison_query(),
+    "get_topic_detail": lambda: review_crud._topic_detail_query("month"),
+}
+
+UNCACHED_BUILDERS = {
+    "get_reviews_stats": lambda: review_crud._reviews_stats_query.__wrapped__("month"),
+    "get_topic_trends": lambda: review_crud._topic_trends_query.__wrapped__("day"),
+    "get_sentiment_dynamics": lambda: review_crud._sentiment_dynamics_query.__wrapped__("week"),
+    "get_topics_statistics": lambda: review_crud._topics_statistics_query.__wrapped__("month"),
+    "get_topics_comparison": lambda: review_crud._topics_comparison_query.__wrapped__(),
+    "get_topic_detail": lambda: review_crud._topic_detail_query.__wrapped__("month"),
+}
+
+
+def _per_call_us(func) -> float:
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        func()
+    return (time.perf_counter() - start) / ITERATIONS * 1_000_000
+
+
+def _with_compiled_cache(builder):
+    cache = {}
+
+    def run():
+        stmt = builder()
+        key = stmt._generate_cache_key().key
+        if key not in cache:
+            cache[key] = stmt.compile(dialect=dialect)
+        return cache[key]
+
+    return run
+
+
+def main() -> None:
+    print(f"{'функция':<26}{'без кэша':>12}{'до':>12}{'после':>12}{'ускорение':>12}")
+    for name in BUILDERS:
+        no_cache = _per_call_us(lambda: UNCACHED_BUILDERS[name]().compile(dialect=dialect))
+        before = _per_call_us(_with_compiled_cache(UNCACHED_BUILDERS[name]))
+        after = _per_call_us(_with_compiled_cache(BUILDERS[name]))
+        print(
+            f"{name:<26}{no_cache:>10.1f}мкс{before:>10.1f}мкс{after:>10.1f}мкс{before / after:>11.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
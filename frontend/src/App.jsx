@@ -20,6 +20,7 @@ function App() {
   const [isLoadingPredictions, setIsLoadingPredictions] = useState(false)
   const [predictionsError, setPredictionsError] = useState(null)
   const [predictionsResponse, setPredictionsResponse] = useState(null)
+  const [predictionsProgress, setPredictionsProgress] = useState(null)
   const [availableTopics, setAvailableTopics] = useState([])
   const [isLoadingTopics, setIsLoadingTopics] = useState(false)
   const [topicsError, setTopicsError] = useState(null)
@@ -232,61 +233,23 @@ function App() {
     }
   }
 
-  // Функция для загрузки данных тональности
-  const fetchSentimentData = async (topicId) => {
+  // Функция для загрузки данных тональности и статистики по теме одним запросом
+  const fetchTopicDetailData = async (topicId) => {
     if (topicId === 'Все') {
       setSentimentData(null)
-      return
-    }
-
-    setIsLoadingSentiment(true)
-    setSentimentError(null)
-    try {
-      const dateRangeAndMode = getDateRangeAndMode()
-      console.log('Sentiment API date range and mode:', dateRangeAndMode)
-      
-      const response = await fetch('http://localhost:8000/api/topics/comparison', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          start_date: dateRangeAndMode.start_date,
-          end_date: dateRangeAndMode.end_date,
-          mode: dateRangeAndMode.mode,
-          topics: [topicId]
-        })
-      })
-      
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`)
-      }
-      
-      const data = await response.json()
-      console.log('Sentiment API response:', data)
-      setSentimentData(data)
-    } catch (error) {
-      console.error('Error fetching sentiment data:', error)
-      setSentimentError(error.message)
-    } finally {
-      setIsLoadingSentiment(false)
-    }
-  }
-
-  // Функция для загрузки данных статистики по темам
-  const fetchTopicsStatisticsData = async (topicId) => {
-    if (topicId === 'Все') {
       setTopicsStatisticsData(null)
       return
     }
 
+    setIsLoadingSentiment(true)
     setIsLoadingTopicsStatistics(true)
+    setSentimentError(null)
     setTopicsStatisticsError(null)
     try {
       const dateRangeAndMode = getDateRangeAndMode()
-      console.log('Topics Statistics API date range and mode:', dateRangeAndMode)
+      console.log('Topic detail API date range and mode:', dateRangeAndMode)
       
-      const response = await fetch('http://localhost:8000/api/topics/statistics', {
+      const response = await fetch(`http://localhost:8000/api/topics/${encodeURIComponent(topicId)}/detail`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -294,8 +257,7 @@ function App() {
         body: JSON.stringify({
           start_date: dateRangeAndMode.start_date,
           end_date: dateRangeAndMode.end_date,
-          mode: dateRangeAndMode.mode,
-          topics: [topicId]
+          mode: dateRangeAndMode.mode
         })
       })
       
@@ -304,12 +266,24 @@ function App() {
       }
       
       const data = await response.json()
-      console.log('Topics Statistics API response:', data)
-      setTopicsStatisticsData(data)
+      console.log('Topic detail API response:', data)
+      // Раскладываем ответ в прежние форматы /topics/comparison и /topics/statistics
+      setSentimentData({
+        status: data.status,
+        data: data.data.comparison ? [data.data.comparison] : [],
+        meta: data.meta
+      })
+      setTopicsStatisticsData({
+        status: data.status,
+        data: data.data.statistics,
+        meta: data.meta
+      })
     } catch (error) {
-      console.error('Error fetching topics statistics data:', error)
+      console.error('Error fetching topic detail data:', error)
+      setSentimentError(error.message)
       setTopicsStatisticsError(error.message)
     } finally {
+      setIsLoadingSentiment(false)
       setIsLoadingTopicsStatistics(false)
     }
   }
@@ -340,16 +314,14 @@ function App() {
 
   // Загружаем данные тональности и статистики при изменении selectedClass
   useEffect(() => {
-    fetchSentimentData(selectedClass)
-    fetchTopicsStatisticsData(selectedClass)
+    fetchTopicDetailData(selectedClass)
     // Данные дашборда уже загружены, просто перерисовываем график с фильтрацией по кластеру
   }, [selectedClass])
 
   // Перезагружаем данные при изменении временного диапазона
   useEffect(() => {
     fetchDashboardData()
-    fetchSentimentData(selectedClass)
-    fetchTopicsStatisticsData(selectedClass)
+    fetchTopicDetailData(selectedClass)
   }, [selectedTimeRange, customDateRange])
 
   // Функции для работы с файлами
@@ -370,14 +342,16 @@ function App() {
             // Если это массив, проверяем каждый элемент
             predictData = jsonData.map((item, index) => ({
               id: item.id || index + 1,
-              text: item.text || item.content || item.review || String(item)
+              text: item.text || item.content || item.review || String(item),
+              rating: item.rating ?? item.grade ?? null
             }))
           } else if (typeof jsonData === 'object' && jsonData !== null) {
             // Если это объект, пытаемся найти массив данных
             const dataArray = jsonData.data || jsonData.reviews || jsonData.items || [jsonData]
             predictData = dataArray.map((item, index) => ({
               id: item.id || index + 1,
-              text: item.text || item.content || item.review || String(item)
+              text: item.text || item.content || item.review || String(item),
+              rating: item.rating ?? item.grade ?? null
             }))
           } else {
             throw new Error('Неподдерживаемый формат JSON файла')
@@ -396,13 +370,14 @@ function App() {
             console.warn('Некоторые элементы не содержат текста:', invalidItems)
           }
           
-          // Отправляем данные на API /api/predict
+          // Отправляем данные на API /api/predict/stream (NDJSON, результаты по мере готовности)
           setIsLoadingPredictions(true)
           setPredictionsError(null)
           setPredictionsResponse(null) // Очищаем предыдущий ответ при загрузке нового файла
+          setPredictionsProgress({ completed: 0, total: predictData.length })
           
           try {
-            const response = await fetch('http://localhost:8000/api/predict', {
+            const response = await fetch('http://localhost:8000/api/predict/stream', {
               method: 'POST',
               headers: {
                 'Content-Type': 'application/json',
@@ -424,7 +399,40 @@ function App() {
               throw new Error(errorMessage)
             }
             
-            const predictionsData = await response.json()
+            const streamReader = response.body.getReader()
+            const decoder = new TextDecoder()
+            const predictions = []
+            let meta = null
+            let buffer = ''
+            
+            const handleEvent = (event) => {
+              if (event.type === 'results') {
+                predictions.push(...event.predictions)
+                setPredictionsProgress({ completed: event.completed, total: event.total })
+                setPredictionsResponse({ predictions: [...predictions] })
+              } else if (event.type === 'done') {
+                meta = event.meta
+              } else if (event.type === 'error') {
+                throw new Error(event.detail)
+              }
+            }
+            
+            while (true) {
+              const { done, value } = await streamReader.read()
+              if (done) break
+              buffer += decoder.decode(value, { stream: true })
+              const lines = buffer.split('\n')
+              buffer = lines.pop()
+              for (const line of lines) {
+                if (line.trim()) handleEvent(JSON.parse(line))
+              }
+            }
+            if (buffer.trim()) handleEvent(JSON.parse(buffer))
+            
+            // Порядок как в исходном файле: батчи завершаются в произвольном порядке
+            const order = new Map(predictData.map((item, index) => [item.id, index]))
+            predictions.sort((a, b) => order.get(a.id) - order.get(b.id))
+            const predictionsData = { predictions, meta }
             console.log('Predictions response:', predictionsData)
             
             // Сохраняем ответ от API для скачивания
@@ -452,6 +460,7 @@ function App() {
             alert('Ошибка при отправке данных на сервер: ' + apiError.message)
           } finally {
             setIsLoadingPredictions(false)
+            setPredictionsProgress(null)
           }
           
         } catch (error) {
@@ -1084,8 +1093,7 @@ function App() {
               onClick={() => {
                 setSelectedTimeRange('custom')
                 fetchDashboardData()
-                fetchSentimentData(selectedClass)
-                fetchTopicsStatisticsData(selectedClass)
+                fetchTopicDetailData(selectedClass)
               }}
               style={{
                 padding: '6px 12px',
@@ -1287,7 +1295,9 @@ function App() {
                 <span className="file-upload__icon">📁</span>
                 <span className="file-upload__text">
                   {isLoadingPredictions 
-                    ? 'Обработка...' 
+                    ? (predictionsProgress
+                      ? `Обработка... ${predictionsProgress.completed} из ${predictionsProgress.total}`
+                      : 'Обработка...')
                     : testingData 
                       ? 'Файл загружен' 
                       : 'Выберите JSON файл'}
@@ -1,5 +1,6 @@
 """Граф агента для классификации отзывов."""
 
+from langchain_core.messages import AIMessage
 from langgraph.graph import END, START, StateGraph
 
 from lct_gazprombank.agent.prompts import (
@@ -7,8 +8,10 @@ from lct_gazprombank.agent.prompts import (
     CLASSIFY_SENTIMENT_MULTIPLE_REVIEWS_PROMPT,
 )
 from lct_gazprombank.agent.state import ClassificationState
+from lct_gazprombank.core import settings
 from lct_gazprombank.agent.utils import (
     format_reviews,
+    estimate_tokens,
     format_reviews_with_categories,
     llm,
     parse_review_categories,
@@ -16,6 +19,26 @@ from lct_gazprombank.agent.utils import (
 )
 
 
+async def _invoke_with_rate_limit(state: ClassificationState, prompt: str) -> AIMessage:
+    """Вызов модели с резервированием запроса и токенов в общем rate limiter
+
+    Args:
+        state (ClassificationState): Состояние агента (может содержать rate_limiter)
+        prompt (str): Промпт
+
+    Returns:
+        AIMessage: Ответ модели
+    """
+    rate_limiter = state.get("rate_limiter")
+    if not rate_limiter:
+        return await llm.ainvoke(prompt)
+
+    reservation = await rate_limiter.acquire(estimate_tokens(prompt) + settings.COMPLETION_TOKENS_ESTIMATE)
+    response = await llm.ainvoke(prompt)
+    reservation.settle(response)
+    return response
+
+
 async def classify_category(state: ClassificationState) -> ClassificationState:
     """Классификация категорий для каждого отзыва
 
@@ -25,10 +48,6 @@ async def classify_category(state: ClassificationState) -> ClassificationState:
     Returns:
         ClassificationState: Обновленное состояние с категориями
     """
-    rate_limiter = state.get("rate_limiter")
-    if rate_limiter:
-        await rate_limiter.acquire()
-
     reviews = state["reviews"]
     formatted_reviews = format_reviews(reviews)
     available_categories = state["available_categories"]
@@ -39,7 +58,7 @@ async def classify_category(state: ClassificationState) -> ClassificationState:
         available_categories=formatted_available_categories,
     )
 
-    response = await llm.ainvoke(prompt)
+    response = await _invoke_with_rate_limit(state, prompt)
     categories = parse_review_categories(response)
 
     return {"categories": categories}
@@ -54,17 +73,13 @@ async def classify_sentiments(state: ClassificationState) -> ClassificationState
     Returns:
         ClassificationState: Обновленное состояние с тональностями
     """
-    rate_limiter = state.get("rate_limiter")
-    if rate_limiter:
-        await rate_limiter.acquire()
-
     reviews = state["reviews"]
     categories = state["categories"]
     reviews_with_categories = format_reviews_with_categories(reviews, categories)
 
     prompt = CLASSIFY_SENTIMENT_MULTIPLE_REVIEWS_PROMPT.format(reviews_with_categories=reviews_with_categories)
 
-    response = await llm.ainvoke(prompt)
+    response = await _invoke_with_rate_limit(state, prompt)
     sentiments = parse_review_sentiments(response)
 
     return {"sentiments": sentiments}
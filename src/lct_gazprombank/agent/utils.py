@@ -2,9 +2,9 @@
 
 import asyncio
 import json
+import math
 import re
 import time
-from collections import deque
 
 from langchain_core.messages import AIMessage
 from langchain_openai import ChatOpenAI
@@ -12,36 +12,127 @@ from langchain_openai import ChatOpenAI
 from lct_gazprombank.core import settings
 
 
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов в тексте
+
+    Args:
+        text (str): Текст промпта или ответа
+
+    Returns:
+        int: Оценка количества токенов
+    """
+    return math.ceil(len(text) / settings.CHARS_PER_TOKEN)
+
+
+# Копия api/core/rate_limit.py: сервис не импортирует пакет api. Изменения
+# вносятся в обе копии, tests/test_rate_limiter.py прогоняется на обеих.
+class RateLimitReservation:
+    """Зарезервированный у RateLimiter бюджет одного вызова модели"""
+
+    def __init__(self, limiter: "RateLimiter", estimated_tokens: int):
+        self._limiter = limiter
+        self.estimated_tokens = estimated_tokens
+
+    def settle(self, response: AIMessage | None) -> None:
+        """Скорректировать списанный бюджет по фактическому расходу токенов
+
+        Args:
+            response (AIMessage | None): Ответ модели с usage_metadata
+        """
+        usage = getattr(response, "usage_metadata", None)
+        if not usage or usage.get("total_tokens") is None:
+            return
+        self._limiter._tokens += self.estimated_tokens - usage["total_tokens"]
+        self._limiter._tokens = min(self._limiter._tokens, self._limiter.token_capacity)
+
+
 class RateLimiter:
-    """Rate limiter для ограничения количества запросов в минуту"""
+    """Token bucket по количеству запросов и токенов в минуту
 
-    def __init__(self, max_requests_per_minute: int):
+    Бюджет списывается сразу при вызове acquire (допускается уход в минус),
+    после чего вызывающий спит ровно столько, сколько нужно для погашения
+    долга. Учёт выполняется синхронно, поэтому блокировка не нужна и сон
+    никого не задерживает: следующие вызовы видят уже увеличенный долг и
+    выстраиваются в очередь за ним.
+    """
+
+    def __init__(
+        self,
+        max_requests_per_minute: int,
+        max_tokens_per_minute: int | None = None,
+        request_burst: int | None = None,
+        token_burst: int | None = None,
+    ):
         """Инициализация rate limiter
 
         Args:
             max_requests_per_minute (int): Максимальное количество запросов в минуту
+            max_tokens_per_minute (int | None): Максимальное количество токенов в минуту (None — без ограничения)
+            request_burst (int | None): Размер всплеска запросов (по умолчанию — минутная квота)
+            token_burst (int | None): Размер всплеска токенов (по умолчанию — минутная квота)
+        """
+        self.request_rate = max_requests_per_minute / 60
+        self.request_capacity = request_burst or max_requests_per_minute
+        self.token_rate = max_tokens_per_minute / 60 if max_tokens_per_minute else None
+        self.token_capacity = (token_burst or max_tokens_per_minute) if max_tokens_per_minute else math.inf
+
+        self._requests = float(self.request_capacity)
+        self._tokens = float(self.token_capacity)
+        self._updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated_at
+        self._updated_at = now
+
+        self._requests = min(self.request_capacity, self._requests + elapsed * self.request_rate)
+        if self.token_rate is not None:
+            self._tokens = min(self.token_capacity, self._tokens + elapsed * self.token_rate)
+
+    async def acquire(self, estimated_tokens: int = 0) -> RateLimitReservation:
+        """Зарезервировать запрос и оценку токенов, дождавшись бюджета
+
+        Args:
+            estimated_tokens (int): Оценка токенов промпта и ответа
+
+        Returns:
+            RateLimitReservation: Резерв для корректировки по фактическому расходу
+        """
+        self._refill()
+        self._requests -= 1
+        if self.token_rate is not None:
+            self._tokens -= estimated_tokens
+
+        wait_time = max(0.0, -self._requests / self.request_rate)
+        if self.token_rate is not None:
+            wait_time = max(wait_time, -self._tokens / self.token_rate)
+
+        if wait_time > 0:
+            try:
+                await asyncio.sleep(wait_time)
+            except asyncio.CancelledError:
+                # Вызов так и не состоялся — возвращаем бюджет
+                self._requests += 1
+                if self.token_rate is not None:
+                    self._tokens += estimated_tokens
+                raise
+
+        return RateLimitReservation(self, estimated_tokens)
+
+    def wait_time(self, estimated_tokens: int = 0) -> float:
+        """Сколько прождал бы acquire, вызванный сейчас (бюджет не списывается)
+
+        Args:
+            estimated_tokens (int): Оценка токенов промпта и ответа
+
+        Returns:
+            float: Секунды ожидания
         """
-        self.max_requests = max_requests_per_minute
-        self.requests = deque()
-        self._lock = asyncio.Lock()
-
-    async def acquire(self):
-        """Ожидание возможности сделать запрос с учетом rate limit"""
-        async with self._lock:
-            now = time.time()
-
-            while self.requests and self.requests[0] < now - 60:
-                self.requests.popleft()
-
-            if len(self.requests) >= self.max_requests:
-                sleep_time = 60 - (now - self.requests[0])
-                if sleep_time > 0:
-                    await asyncio.sleep(sleep_time)
-                    now = time.time()
-                    while self.requests and self.requests[0] < now - 60:
-                        self.requests.popleft()
-
-            self.requests.append(time.time())
+        self._refill()
+        wait_time = max(0.0, (1 - self._requests) / self.request_rate)
+        if self.token_rate is not None:
+            wait_time = max(wait_time, (estimated_tokens - self._tokens) / self.token_rate)
+        return wait_time
 
 
 def format_reviews(reviews: list[str]) -> str:
@@ -11,7 +11,15 @@ class Settings(BaseSettings):
 
     BATCH_SIZE: int = 15
     MAX_CONCURRENT_REQUESTS: int = 10
+    MAX_QUEUED_BATCHES: int = 200
     RATE_LIMIT_PER_MINUTE: int = 20
+    RATE_LIMIT_BURST: int | None = None
+    TOKENS_PER_MINUTE_LIMIT: int | None = None
+    TOKEN_LIMIT_BURST: int | None = None
+
+    # Оценка токенов для резервирования бюджета до вызова модели
+    CHARS_PER_TOKEN: float = 3.0
+    COMPLETION_TOKENS_ESTIMATE: int = 600
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -3,7 +3,7 @@
 from fastapi import APIRouter, HTTPException
 
 from lct_gazprombank.schemas import PredictRequest, PredictResponse
-from lct_gazprombank.services import get_classification_service
+from lct_gazprombank.services import SchedulerSaturatedError, get_classification_service, get_scheduler
 
 router = APIRouter()
 
@@ -30,7 +30,19 @@ async def predict(request: PredictRequest) -> PredictResponse:
 
         return PredictResponse(predictions=result)
 
+    except SchedulerSaturatedError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)}) from e
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Неверный формат данных: {str(e)}") from e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка обработки: {str(e)}") from e
+
+
+@router.get("/predict/scheduler")
+async def predict_scheduler_stats() -> dict:
+    """Метрики очереди классификации
+
+    Returns:
+        dict: Глубина очереди, время ожидания, количество отказов
+    """
+    return get_scheduler().stats()
@@ -1,3 +1,4 @@
 from .predict import get_classification_service
+from .scheduler import SchedulerSaturatedError, get_scheduler
 
-__all__ = ["get_classification_service"]
+__all__ = ["get_classification_service", "get_scheduler", "SchedulerSaturatedError"]
@@ -0,0 +1,21 @@
+"""Общие настройки тестов.
+
+Модули api читают параметры базы из окружения при импорте; движки
+создаются лениво, поэтому для юнит-тестов достаточно любых значений.
+Настройкам сервиса src нужен ключ OpenRouter, к сети тесты не обращаются.
+"""
+
+import os
+
+for name, value in {
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_USER": "test",
+    "DB_PASS": "test",
+    "DB_NAME": "test",
+    "OPENROUTER_API_KEY": "test",
+}.items():
+    os.environ.setdefault(name, value)
+
+# Ручной сценарий проверки запущенного сервиса, не юнит-тест
+collect_ignore = ["test_api.py"]
@@ -0,0 +1,30 @@
+from api.core.agent.utils import clean_review_text, llm_model_id
+from api.core.services.cache import classification_cache_key, normalize_text
+from api.core.settings import LLMBackendSettings, settings
+
+
+def _backend(name: str, model: str) -> LLMBackendSettings:
+    return LLMBackendSettings(name=name, provider="openai", model=model, api_key="stub")
+
+
+def test_model_id_names_every_model_in_pool(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BACKENDS", [_backend("a", "m1"), _backend("b", "m2"), _backend("c", "m1")])
+
+    assert llm_model_id() == "openai:m1+openai:m2"
+
+
+def test_pool_change_changes_cache_key(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BACKENDS", [_backend("a", "m1")])
+    single = classification_cache_key("отзыв", "t", "p", llm_model_id())
+
+    monkeypatch.setattr(settings, "LLM_BACKENDS", [_backend("a", "m1"), _backend("b", "m2")])
+    mixed = classification_cache_key("отзыв", "t", "p", llm_model_id())
+
+    assert single != mixed
+
+
+def test_cache_key_follows_prompt_normalization():
+    raw = "  <p>Хороший&nbsp;вклад</p>\n\n  "
+    # Тексты, одинаковые в промпте, дают один ключ
+    assert normalize_text(raw) == clean_review_text(raw).casefold()
+    assert classification_cache_key(raw, "t", "p", "m") == classification_cache_key("хороший вклад", "t", "p", "m")
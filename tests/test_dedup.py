@@ -0,0 +1,59 @@
+import asyncio
+
+from api.core.services import dedup
+from api.core.services.dedup import NearDuplicateIndex
+
+TEXT = "Оформил вклад в отделении, менеджер быстро всё объяснил и помог с приложением"
+
+
+class _Session:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def _index() -> NearDuplicateIndex:
+    return NearDuplicateIndex(
+        threshold=0.85, num_perm=64, bands=16, min_shingles=5, max_entries=100, retry_seconds=30.0
+    )
+
+
+def test_query_waits_for_hydration_and_retries_after_db_error(monkeypatch):
+    state = {"fail": True, "calls": 0}
+
+    async def get_labeled_reviews(session, limit):
+        state["calls"] += 1
+        if state["fail"]:
+            raise ConnectionError("db down")
+        return [(1, TEXT, ["Вклады"], ["положительно"])]
+
+    monkeypatch.setattr(dedup, "get_labeled_reviews", get_labeled_reviews)
+
+    async def scenario():
+        index = _index()
+        # Пока индекс не загружен, совпадений нет даже для добавленных отзывов
+        index.add(TEXT, 2, ["Вклады"], ["положительно"])
+        assert index.query(TEXT) is None
+
+        assert await index.hydrate(_Session) is False
+        assert not index.ready
+
+        # Повтор после ошибки откладывается на паузу
+        index.start_hydration(_Session)
+        assert index._hydrate_task is None
+        assert state["calls"] == 1
+
+        state["fail"] = False
+        index._retry_at = 0.0
+        index.start_hydration(_Session)
+        await index._hydrate_task
+        assert index.ready
+
+        match = index.query(TEXT)
+        assert match is not None
+        # Отзыв, добавленный во время загрузки, новее загруженного из базы
+        assert list(e.source_review_id for e in index._entries.values()) == [1, 2]
+
+    asyncio.run(scenario())
@@ -0,0 +1,63 @@
+import asyncio
+
+from api.core.schemas import ReviewOutput
+from api.core.services import jobs
+from api.core.services.jobs import ClassificationJobRunner
+from api.core.settings import settings
+
+
+class _Session:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def test_heartbeat_renews_lease_while_chunk_waits(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_LEASE_SECONDS", 0.03)
+    touches = []
+    saved = []
+    finished = []
+    pending = [[(0, 10, "отзыв", None)], []]
+
+    async def get_pending_job_items(session, job_id, limit):
+        return pending.pop(0)
+
+    async def save_job_results(session, job_id, results):
+        saved.extend(results)
+        return len(results)
+
+    async def touch_job(session, job_id):
+        touches.append(job_id)
+
+    async def finish_job(session, job_id, status, error=None):
+        finished.append(status)
+
+    class Service:
+        async def predict_stream(self, reviews):
+            # Батч долго ждёт слота планировщика
+            await asyncio.sleep(0.1)
+            yield [(0, ReviewOutput(id=10, topics=["Вклады"], sentiments=["положительно"]))]
+
+    monkeypatch.setattr(jobs, "write_session_maker", _Session)
+    monkeypatch.setattr(jobs, "get_pending_job_items", get_pending_job_items)
+    monkeypatch.setattr(jobs, "save_job_results", save_job_results)
+    monkeypatch.setattr(jobs, "touch_job", touch_job)
+    monkeypatch.setattr(jobs, "finish_job", finish_job)
+    monkeypatch.setattr(jobs, "get_classification_service", Service)
+
+    async def scenario():
+        await ClassificationJobRunner(workers=1)._process("job")
+        touched = len(touches)
+        await asyncio.sleep(0.05)
+        # После завершения задачи heartbeat остановлен
+        assert len(touches) == touched
+        return touched
+
+    touched = asyncio.run(scenario())
+
+    assert touched >= 2
+    assert set(touches) == {"job"}
+    assert [position for position, *_ in saved] == [0]
+    assert [status.value for status in finished] == ["completed"]
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from api.core.agent.utils import LLM
+from api.core.settings import LLMBackendSettings, settings
+
+
+class _FakeModel:
+    def __init__(self, name: str, latency: float):
+        self.name = name
+        self.latency = latency
+        self.calls = 0
+
+    async def ainvoke(self, prompt, *args, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return AIMessage(content=self.name)
+
+
+def _pool(latencies: list[float], **limits) -> LLM:
+    pool = LLM(
+        backends=[
+            LLMBackendSettings(
+                name=f"b{i}", provider="openai", model="stub", api_key="stub", base_url="http://127.0.0.1:9/v1", **limits
+            )
+            for i in range(len(latencies))
+        ]
+    )
+    for i, (backend, latency) in enumerate(zip(pool.backends, latencies)):
+        backend.llm = _FakeModel(f"b{i}", latency)
+        backend.latency_ewma = 0.01
+    # Порог дубля — 0.1 с: задержки прошлых вызовов
+    pool._latencies.extend([0.1] * settings.LLM_HEDGE_MIN_SAMPLES)
+    pool._calls = 100
+    return pool
+
+
+@pytest.fixture
+def hedging(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_DELAY", 0.1)
+    monkeypatch.setattr(settings, "LLM_HEDGE_BUDGET_RATIO", 1.0)
+
+
+def test_slow_backend_is_hedged(hedging):
+    pool = _pool([2.0, 0.01])
+
+    result = asyncio.run(asyncio.wait_for(pool.ainvoke("отзыв", hedge=True), timeout=1))
+
+    assert result.content == "b1"
+    assert pool._hedges == 1
+
+
+def test_waiting_for_own_quota_is_not_hedged(hedging):
+    # Одна заявка в секунду: второй вызов полсекунды ждёт квоту, но сам ответ быстрый
+    pool = _pool([0.01], requests_per_minute=120, request_burst=1)
+
+    async def scenario():
+        await pool.ainvoke("первый")
+        return await pool.ainvoke("второй", hedge=True)
+
+    result = asyncio.run(scenario())
+
+    assert result.content == "b0"
+    assert pool._hedges == 0
+    assert pool.backends[0].llm.calls == 2
+
+
+def test_hedging_disabled_for_regular_calls(hedging):
+    pool = _pool([0.3, 0.01])
+
+    result = asyncio.run(pool.ainvoke("отзыв"))
+
+    assert result.content == "b0"
+    assert pool._hedges == 0
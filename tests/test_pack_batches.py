@@ -0,0 +1,34 @@
+from api.core.services.predict import pack_batches
+from api.core.settings import settings
+
+
+def test_packs_short_reviews_in_input_order():
+    texts = ["коротко"] * 5
+
+    assert pack_batches(texts, token_budget=1000, max_batch_size=2, long_review_tokens=100) == [[0, 1], [2, 3], [4]]
+
+
+def test_splits_batch_on_token_budget():
+    # 30 символов ~ 10 токенов
+    texts = ["а" * 30] * 4
+
+    assert pack_batches(texts, token_budget=25, max_batch_size=10, long_review_tokens=100) == [[0, 1], [2, 3]]
+
+
+def test_isolates_long_reviews_beyond_prompt_truncation():
+    long_text = "слово " * int(40000 * settings.CHARS_PER_TOKEN / 6)
+    texts = [long_text, "коротко", long_text, "коротко", long_text, "коротко"]
+
+    batches = pack_batches(texts)
+
+    assert settings.REVIEW_MAX_TOKENS < settings.LONG_REVIEW_TOKENS
+    assert [0] in batches and [2] in batches and [4] in batches
+    assert [1, 3, 5] in batches
+
+
+def test_long_review_threshold_ignores_markup():
+    # Разметка и пробелы не попадают в промпт и не делают отзыв длинным
+    texts = ["<p>" + " " * 1000 + "текст</p>"]
+
+    assert pack_batches(texts, long_review_tokens=100) == [[0]]
+    assert pack_batches(texts + texts, long_review_tokens=100) == [[0, 1]]
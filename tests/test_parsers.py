@@ -0,0 +1,194 @@
+import asyncio
+import json
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from api.core.agent import graph
+from api.core.agent.utils import (
+    IncrementalCompactParser,
+    IncrementalReviewsParser,
+    category_numbers,
+    compact_lines,
+    parse_compact_categories,
+    parse_compact_combined,
+    parse_compact_sentiments,
+    parse_review_categories,
+)
+
+AVAILABLE = ["Вклады", "Ипотека", "Кредиты", "Прочее"]
+
+
+def _feed_in_chunks(parser, text: str, size: int) -> list[dict]:
+    items = []
+    for start in range(0, len(text), size):
+        items += parser.feed(text[start : start + size])
+    return items + parser.close()
+
+
+CATEGORIES_ANSWER = (
+    "```json\n"
+    + json.dumps(
+        {
+            "reviews": [
+                {"review_id": 1, "categories": ["Вклады"]},
+                {"review_id": "2", "categories": ["Ипотека", "Прочее"], "note": "скобка } в строке"},
+            ]
+        },
+        ensure_ascii=False,
+    )
+    + "\n```"
+)
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, len(CATEGORIES_ANSWER)])
+def test_incremental_reviews_parser_matches_full_parse(size):
+    items = _feed_in_chunks(IncrementalReviewsParser(), CATEGORIES_ANSWER, size)
+
+    assert items == [
+        {"review_id": 1, "categories": ["Вклады"]},
+        {"review_id": 2, "categories": ["Ипотека", "Прочее"]},
+    ]
+    assert parse_review_categories(AIMessage(content=CATEGORIES_ANSWER)) == {
+        1: ["Вклады"],
+        2: ["Ипотека", "Прочее"],
+    }
+
+
+def test_incremental_reviews_parser_yields_items_before_stream_ends():
+    parser = IncrementalReviewsParser()
+
+    assert parser.feed('{"reviews": [{"review_id": 1, "categories": []}, {"review_id": 2') == [
+        {"review_id": 1, "categories": []}
+    ]
+    assert parser.feed(', "categories": ["Вклады"]}]}') == [{"review_id": 2, "categories": ["Вклады"]}]
+
+
+@pytest.mark.parametrize(
+    "item",
+    [
+        '{"categories": ["Вклады"]}',
+        '{"review_id": "первый", "categories": ["Вклады"]}',
+        '{"review_id": 1}',
+        '{"review_id": 1, "categories": "Вклады"}',
+        '{"review_id": 1, "categories": [{"name": "Вклады"}]}',
+        '{"review_id": 1, "categories": ["Вклады"],}',
+    ],
+)
+def test_incremental_reviews_parser_rejects_malformed_items(item):
+    with pytest.raises(ValueError):
+        IncrementalReviewsParser().feed('{"reviews": [' + item + "]}")
+
+
+class _StreamingLLM:
+    def __init__(self, stream: str, answer: str):
+        self._stream = stream
+        self._answer = answer
+
+    async def astream(self, prompt):
+        for start in range(0, len(self._stream), 5):
+            yield AIMessageChunk(content=self._stream[start : start + 5])
+
+    async def ainvoke(self, prompt, *args, **kwargs):
+        return AIMessage(content=self._answer)
+
+
+def test_pipelined_node_raises_value_error_on_malformed_stream(monkeypatch):
+    llm = _StreamingLLM('{"reviews": [{"id": 1, "categories": ["Вклады"]}]}', "")
+    monkeypatch.setattr(graph, "get_llm", lambda: llm)
+    monkeypatch.setattr(graph.settings, "LLM_OUTPUT_FORMAT", "json")
+
+    with pytest.raises(ValueError):
+        asyncio.run(graph.classify_pipelined({"reviews": ["отзыв"], "available_categories": ["Вклады"]}))
+
+
+def test_pipelined_node_classifies_streamed_reviews(monkeypatch):
+    llm = _StreamingLLM(
+        '{"reviews": [{"review_id": 1, "categories": ["вклады"]}]}',
+        '{"reviews": [{"review_id": 1, "sentiments": {"Вклады": "положительно"}}]}',
+    )
+    monkeypatch.setattr(graph, "get_llm", lambda: llm)
+    monkeypatch.setattr(graph.settings, "LLM_OUTPUT_FORMAT", "json")
+
+    result = asyncio.run(graph.classify_pipelined({"reviews": ["отзыв"], "available_categories": ["Вклады"]}))
+
+    assert result == {"categories": [["Вклады"]], "sentiments": [{"Вклады": "положительно"}]}
+
+
+def test_compact_lines_skip_fences_noise_and_repeats():
+    text = "```\nОтвет:\n1: 1,3\n[2] - 2п\n1: 4\n```"
+
+    assert compact_lines(text) == {1: "1,3", 2: "2п"}
+
+
+def test_compact_categories_decode_to_names():
+    response = AIMessage(content="1: 1,3\n2: -\n3: 2, 2, 9")
+
+    assert parse_compact_categories(response, available_categories=AVAILABLE) == {
+        1: ["Вклады", "Кредиты"],
+        2: [],
+        # Повтор и несуществующий номер отбрасываются
+        3: ["Ипотека"],
+    }
+
+
+def test_compact_sentiments_decode_codes():
+    response = AIMessage(content="1: 1п,3о\n2: 2н\n3: 4 положительно")
+
+    assert parse_compact_sentiments(response, available_categories=AVAILABLE) == {
+        1: {"Вклады": "положительно", "Кредиты": "отрицательно"},
+        2: {"Ипотека": "нейтрально"},
+        3: {"Прочее": "положительно"},
+    }
+
+
+def test_compact_combined_matches_json_shape():
+    response = AIMessage(content="1: 2о, 1п\n2: 4н")
+
+    assert parse_compact_combined(response, available_categories=AVAILABLE) == {
+        1: (["Ипотека", "Вклады"], {"Ипотека": "отрицательно", "Вклады": "положительно"}),
+        2: (["Прочее"], {"Прочее": "нейтрально"}),
+    }
+
+
+@pytest.mark.parametrize("parse", [parse_compact_categories, parse_compact_sentiments, parse_compact_combined])
+def test_compact_parsers_reject_answers_without_lines(parse):
+    with pytest.raises(ValueError):
+        parse(AIMessage(content='{"reviews": []}'), available_categories=AVAILABLE)
+
+
+def test_category_numbers_round_trip():
+    assert category_numbers(["кредиты", "Вклады", "Другое"], AVAILABLE) == ["3", "1", "Другое"]
+
+
+@pytest.mark.parametrize("size", [1, 2, 5, 100])
+def test_incremental_compact_parser_streams_lines(size):
+    text = "```\n1: 1,3\n2: 2\n1: 4\n3: 4"
+    items = _feed_in_chunks(IncrementalCompactParser(AVAILABLE), text, size)
+
+    assert items == [
+        {"review_id": 1, "categories": ["Вклады", "Кредиты"]},
+        {"review_id": 2, "categories": ["Ипотека"]},
+        {"review_id": 3, "categories": ["Прочее"]},
+    ]
+
+
+def test_incremental_compact_parser_waits_for_line_end():
+    parser = IncrementalCompactParser(AVAILABLE)
+
+    assert parser.feed("1: 1") == []
+    assert parser.feed(",2\n2: ") == [{"review_id": 1, "categories": ["Вклады", "Ипотека"]}]
+    assert parser.close() == [{"review_id": 2, "categories": []}]
+
+
+def test_pipelined_node_with_compact_output(monkeypatch):
+    llm = _StreamingLLM("1: 2\n2: 1,3", "1: 2о\n2: 1п,3н")
+    monkeypatch.setattr(graph, "get_llm", lambda: llm)
+    monkeypatch.setattr(graph.settings, "LLM_OUTPUT_FORMAT", "compact")
+
+    result = asyncio.run(graph.classify_pipelined({"reviews": ["первый", "второй"], "available_categories": AVAILABLE}))
+
+    assert result == {
+        "categories": [["Ипотека"], ["Вклады", "Кредиты"]],
+        "sentiments": [{"Ипотека": "отрицательно"}, {"Вклады": "положительно", "Кредиты": "нейтрально"}],
+    }
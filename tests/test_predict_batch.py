@@ -0,0 +1,72 @@
+import asyncio
+
+from api.core.schemas import ReviewInput, ReviewOutput
+from api.core.services.predict import ClassificationService
+from api.core.settings import settings
+
+
+def _service(classify):
+    service = ClassificationService(available_categories=["Вклады", "Прочее"], scheduler=None)
+    service._classify_batch = classify
+    return service
+
+
+def test_bisect_isolates_unparseable_review(monkeypatch):
+    monkeypatch.setattr(settings, "PARSE_RETRY_ATTEMPTS", 1)
+    calls = []
+    running = 0
+    max_running = 0
+
+    async def classify(reviews):
+        nonlocal running, max_running
+        calls.append([review.id for review in reviews])
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0)
+        running -= 1
+        if any(review.text == "сломанный" for review in reviews):
+            raise ValueError("не разобрать")
+        return [ReviewOutput(id=review.id, topics=["Вклады"], sentiments=["положительно"]) for review in reviews]
+
+    reviews = [ReviewInput(id=i, text="сломанный" if i == 5 else f"отзыв {i}") for i in range(8)]
+    outputs = asyncio.run(_service(classify)._predict_batch(reviews))
+
+    assert [output.id for output in outputs] == list(range(8))
+    assert [output.status for output in outputs] == ["ok"] * 5 + ["error"] + ["ok"] * 2
+    assert "не разобрать" in outputs[5].error
+    # Деление идёт последовательно внутри одного слота планировщика
+    assert max_running == 1
+    assert calls[0] == list(range(8)) and [5] in calls
+
+
+def test_retries_before_bisecting(monkeypatch):
+    monkeypatch.setattr(settings, "PARSE_RETRY_ATTEMPTS", 2)
+    attempts = 0
+
+    async def classify(reviews):
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise ValueError("не разобрать")
+        return [ReviewOutput(id=review.id, topics=["Прочее"], sentiments=["нейтрально"]) for review in reviews]
+
+    reviews = [ReviewInput(id=i, text=f"отзыв {i}") for i in range(4)]
+    outputs = asyncio.run(_service(classify)._predict_batch(reviews))
+
+    assert attempts == 2
+    assert all(output.status == "ok" for output in outputs)
+
+
+def test_non_parse_error_marks_batch_without_bisecting():
+    calls = 0
+
+    async def classify(reviews):
+        nonlocal calls
+        calls += 1
+        raise RuntimeError("503")
+
+    reviews = [ReviewInput(id=i, text=f"отзыв {i}") for i in range(4)]
+    outputs = asyncio.run(_service(classify)._predict_batch(reviews))
+
+    assert calls == 1
+    assert all(output.status == "error" and "503" in output.error for output in outputs)
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from api.core import rate_limit
+from lct_gazprombank.agent import utils as src_utils
+
+
+# У сервиса src своя копия token bucket: обе должны вести себя одинаково
+@pytest.fixture(params=[rate_limit.RateLimiter, src_utils.RateLimiter], ids=["api", "src"])
+def RateLimiter(request):
+    return request.param
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Замороженное время и запись запрошенных пауз вместо сна"""
+    state = {"now": 1000.0, "sleeps": []}
+
+    async def sleep(seconds):
+        state["sleeps"].append(seconds)
+
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: state["now"])
+    monkeypatch.setattr(rate_limit.asyncio, "sleep", sleep)
+    return state
+
+
+def test_burst_then_waits_for_request_debt(RateLimiter, clock):
+    limiter = RateLimiter(max_requests_per_minute=60, request_burst=2)
+
+    async def scenario():
+        for _ in range(4):
+            await limiter.acquire()
+
+    asyncio.run(scenario())
+
+    assert clock["sleeps"] == pytest.approx([1.0, 2.0])
+
+
+def test_waits_for_token_debt(RateLimiter, clock):
+    limiter = RateLimiter(max_requests_per_minute=600, max_tokens_per_minute=600, token_burst=100)
+
+    asyncio.run(limiter.acquire(estimated_tokens=150))
+
+    # Долг 50 токенов при 10 токенах в секунду
+    assert clock["sleeps"] == pytest.approx([5.0])
+
+
+def test_refill_is_capped_by_burst(RateLimiter, clock):
+    limiter = RateLimiter(max_requests_per_minute=60, request_burst=1)
+    clock["now"] += 3600
+
+    asyncio.run(limiter.acquire())
+    asyncio.run(limiter.acquire())
+
+    assert clock["sleeps"] == pytest.approx([1.0])
+
+
+def test_settle_refunds_overestimate(RateLimiter, clock):
+    limiter = RateLimiter(max_requests_per_minute=600, max_tokens_per_minute=600, token_burst=100)
+
+    reservation = asyncio.run(limiter.acquire(estimated_tokens=100))
+    assert limiter.wait_time(estimated_tokens=40) == pytest.approx(4.0)
+
+    reservation.settle(AIMessage(content="", usage_metadata={"input_tokens": 30, "output_tokens": 10, "total_tokens": 40}))
+
+    assert limiter.wait_time(estimated_tokens=40) == pytest.approx(0.0)
+
+
+def test_settle_charges_underestimate(RateLimiter, clock):
+    limiter = RateLimiter(max_requests_per_minute=600, max_tokens_per_minute=600, token_burst=100)
+
+    reservation = asyncio.run(limiter.acquire(estimated_tokens=10))
+    reservation.settle(AIMessage(content="", usage_metadata={"input_tokens": 100, "output_tokens": 20, "total_tokens": 120}))
+
+    # Фактически потрачено на 20 токенов больше бюджета
+    assert limiter.wait_time() == pytest.approx(2.0)
+
+
+def test_cancelled_wait_returns_budget(RateLimiter, clock, monkeypatch):
+    limiter = RateLimiter(max_requests_per_minute=60, request_burst=1)
+    asyncio.run(limiter.acquire())
+
+    async def cancelled_sleep(seconds):
+        raise asyncio.CancelledError()
+
+    monkeypatch.setattr(rate_limit.asyncio, "sleep", cancelled_sleep)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(limiter.acquire())
+
+    assert limiter.wait_time() == pytest.approx(1.0)
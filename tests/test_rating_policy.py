@@ -0,0 +1,34 @@
+from api.core.services.rating_policy import learn_rating_sentiments
+from api.core.settings import settings
+
+
+COUNTS = [
+    (1, "отрицательно", 950),
+    (1, "нейтрально", 50),
+    (2, "отрицательно", 990),
+    (2, "нейтрально", 10),
+    (4, "положительно", 500),
+    (5, "положительно", 300),
+    (5, "отрицательно", 100),
+]
+
+
+def test_only_extreme_ratings_are_candidates():
+    mapping = learn_rating_sentiments(COUNTS, min_precision=0.9, min_support=200, ratings={1, 5})
+
+    # Оценки 2 и 4 проходят пороги, но не входят в кандидаты; у 5 мала доля
+    assert mapping == {1: "отрицательно"}
+
+
+def test_candidates_are_configurable():
+    mapping = learn_rating_sentiments(COUNTS, min_precision=0.9, min_support=200, ratings={1, 2, 4, 5})
+
+    assert mapping == {1: "отрицательно", 2: "отрицательно", 4: "положительно"}
+
+
+def test_min_support():
+    assert learn_rating_sentiments(COUNTS, min_precision=0.9, min_support=2000, ratings={1, 5}) == {}
+
+
+def test_default_candidates_are_one_and_five_stars():
+    assert settings.RATING_POLICY_RATINGS == {1, 5}
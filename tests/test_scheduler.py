@@ -0,0 +1,156 @@
+import asyncio
+
+import pytest
+
+from api.core import scheduling
+from lct_gazprombank.services import scheduler as src_scheduling
+
+
+# У сервиса src своя копия планировщика: обе должны вести себя одинаково
+@pytest.fixture(params=[scheduling, src_scheduling], ids=["api", "src"])
+def impl(request):
+    return request.param
+
+
+def test_round_robin_between_requests(impl):
+    async def scenario():
+        scheduler = impl.ClassificationScheduler(max_concurrency=1, max_queue_size=100)
+        order = []
+
+        def job(name):
+            async def run():
+                order.append(name)
+                await asyncio.sleep(0)
+                return name
+
+            return run
+
+        big = await scheduler.submit([job(f"big{i}") for i in range(4)])
+        small = await scheduler.submit([job("small0"), job("small1")])
+        await asyncio.gather(*big, *small)
+        return order
+
+    order = asyncio.run(scenario())
+
+    assert order.index("small0") < order.index("big2")
+    assert order.index("small1") < order.index("big3")
+
+
+def test_rejects_when_queue_is_full(impl):
+    async def scenario():
+        scheduler = impl.ClassificationScheduler(max_concurrency=1, max_queue_size=3)
+        release = asyncio.Event()
+
+        async def blocked():
+            await release.wait()
+
+        first = await scheduler.submit([blocked] * 3)
+        with pytest.raises(impl.SchedulerSaturatedError) as error:
+            await scheduler.submit([blocked] * 2)
+        release.set()
+        await asyncio.gather(*first)
+        return error.value, scheduler.stats()
+
+    error, stats = asyncio.run(scenario())
+
+    assert error.retry_after >= 1
+    assert stats["rejected_requests"] == 1
+
+
+def test_empty_queue_accepts_oversized_request(impl):
+    async def scenario():
+        scheduler = impl.ClassificationScheduler(max_concurrency=2, max_queue_size=1)
+
+        async def job():
+            return 1
+
+        return await scheduler.run([job] * 5)
+
+    assert asyncio.run(scenario()) == [1] * 5
+
+
+def test_cancelled_error_inside_job_keeps_worker_alive(impl):
+    async def scenario():
+        scheduler = impl.ClassificationScheduler(max_concurrency=1, max_queue_size=10)
+
+        async def cancelled():
+            raise asyncio.CancelledError()
+
+        async def ok():
+            return "ok"
+
+        failed, = await scheduler.submit([cancelled])
+        done, = await scheduler.submit([ok])
+        result = await asyncio.wait_for(done, timeout=1)
+        return failed, result, [worker.done() for worker in scheduler._workers]
+
+    failed, result, workers_done = asyncio.run(scenario())
+
+    assert isinstance(failed.exception(), RuntimeError)
+    assert result == "ok"
+    assert workers_done == [False]
+
+
+def test_cancelled_worker_cancels_its_job(impl):
+    async def scenario():
+        scheduler = impl.ClassificationScheduler(max_concurrency=1, max_queue_size=10)
+        started = asyncio.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.sleep(10)
+
+        future, = await scheduler.submit([slow])
+        await started.wait()
+        worker, = scheduler._workers
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+        return future
+
+    assert asyncio.run(scenario()).cancelled()
+
+
+def test_cancelling_future_interrupts_running_job(impl):
+    async def scenario():
+        scheduler = impl.ClassificationScheduler(max_concurrency=1, max_queue_size=10)
+        started = asyncio.Event()
+        interrupted = asyncio.Event()
+
+        async def slow():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                interrupted.set()
+                raise
+
+        async def ok():
+            return "ok"
+
+        future, = await scheduler.submit([slow])
+        await started.wait()
+        future.cancel()
+        await asyncio.wait_for(interrupted.wait(), timeout=1)
+
+        result = await asyncio.wait_for(scheduler.run([ok]), timeout=1)
+        return result, scheduler.stats()
+
+    result, stats = asyncio.run(scenario())
+
+    assert result == ["ok"]
+    assert stats["cancelled_batches"] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_empty_submit_does_not_break_workers(impl):
+    async def scenario():
+        scheduler = impl.ClassificationScheduler(max_concurrency=1, max_queue_size=10)
+
+        async def ok():
+            return "ok"
+
+        empty = await scheduler.submit([])
+        result = await asyncio.wait_for(scheduler.run([ok]), timeout=1)
+        return empty, result, scheduler.stats()["queued_requests"]
+
+    assert asyncio.run(scenario()) == ([], ["ok"], 0)